@@ -1,22 +1,22 @@
-from .currencybeacon import CurrencyBeaconAdapter, CurrencyBeaconTimeSeriesAdapter
-from .other_provider import OtherProviderAdapter, OtherProviderTimeSeriesAdapter
+from . import currencybeacon, other_provider
+from .registry import adapter_registry
+
+# Provider names match Provider.name
+adapter_registry.add("CurrencyBeacon", "rate", currencybeacon.CurrencyBeaconAdapter, currencybeacon.CAPABILITIES)
+adapter_registry.add("CurrencyBeacon", "time_series", currencybeacon.CurrencyBeaconTimeSeriesAdapter, currencybeacon.CAPABILITIES)
+adapter_registry.add("OtherProvider", "rate", other_provider.OtherProviderAdapter, other_provider.CAPABILITIES)
+adapter_registry.add("OtherProvider", "time_series", other_provider.OtherProviderTimeSeriesAdapter, other_provider.CAPABILITIES)
 
 class AdapterFactory:
     @staticmethod
     def get_adapter(provider: str):
-        if provider == "CurrencyBeacon":
-            return CurrencyBeaconAdapter()
-        elif provider == "OtherProvider":
-            return OtherProviderAdapter()
-        else:
-            raise ValueError("Unknown provider")
+        return adapter_registry.get(provider, "rate")
+
+    @staticmethod
+    def get_capabilities(provider: str):
+        return adapter_registry.capabilities(provider)
 
 class TimeSeriesAdapterFactory:
     @staticmethod
     def get_time_series_adapter(provider: str):
-        if provider == "CurrencyBeacon":
-            return CurrencyBeaconTimeSeriesAdapter()
-        elif provider == "OtherProvider":
-            return OtherProviderTimeSeriesAdapter()
-        else:
-            raise ValueError("Unknown provider")
+        return adapter_registry.get(provider, "time_series")
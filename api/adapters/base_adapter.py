@@ -1,12 +1,61 @@
+import asyncio
 from abc import ABC, abstractmethod
 from datetime import date
 from typing import Dict
 
+
+class RateLimited(Exception):
+    """
+    The provider answered 429 Too Many Requests.
+    """
+
+    def __init__(self, provider: str, retry_after: float = None):
+        super().__init__(f"{provider} rate limit exceeded")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class ProviderError(Exception):
+    """
+    The provider answered with an error status (after the transport's retries).
+    """
+
+    def __init__(self, provider: str, status_code: int, detail: str = ""):
+        super().__init__(f"{provider} answered {status_code}: {detail[:200]}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+def check_status(provider: str, response):
+    """
+    Raise RateLimited for a 429 and ProviderError for any other status than 200.
+    """
+    if response.status_code == 429:
+        raise RateLimited(provider, retry_after(response))
+    if response.status_code != 200:
+        raise ProviderError(provider, response.status_code, response.text)
+
+
+def retry_after(response):
+    """
+    Seconds from a numeric Retry-After header, if any.
+    """
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
 class CurrencyExchangeAdapter(ABC):
     @abstractmethod
     def get_exchange_rate(self, source_currency: str, exchanged_currency: str, valuation_date: date) -> Dict:
         pass
 
+    async def aget_exchange_rate(self, source_currency: str, exchanged_currency: str, valuation_date: date) -> Dict:
+        """
+        Asyncio variant; adapters without a native one run the blocking call in a thread.
+        """
+        return await asyncio.to_thread(self.get_exchange_rate, source_currency, exchanged_currency, valuation_date)
+
 
 class TimeSeriesAdapter(ABC):
     """
@@ -18,4 +67,10 @@ class TimeSeriesAdapter(ABC):
         """
         Fetch exchange rate time series from provider.
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def aget_time_series(self, source_currency, start_date, end_date):
+        """
+        Asyncio variant; adapters without a native one run the blocking call in a thread.
+        """
+        return await asyncio.to_thread(self.get_time_series, source_currency, start_date, end_date)
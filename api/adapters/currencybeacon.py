@@ -1,46 +1,82 @@
-import requests
 from datetime import date
 from .base_adapter import CurrencyExchangeAdapter
-from .base_adapter import TimeSeriesAdapter
+from .base_adapter import TimeSeriesAdapter, check_status
+from .registry import ProviderCapabilities
+from .transport import get_transport
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("currency_app")
+
 BASE_URL = os.getenv("CURRENCY_BEACON_BASE_URL")
 API_KEY = os.getenv("CURRENCY_BEACON_API_KEY")
 
+CAPABILITIES = ProviderCapabilities(
+    point_rate=True,
+    multi_symbol=True,
+    time_series=True,
+    max_time_series_days=int(os.getenv("CURRENCY_BEACON_TIME_SERIES_CHUNK_DAYS", 90)),
+)
+
 
 class CurrencyBeaconAdapter(CurrencyExchangeAdapter):
 
+    def __init__(self):
+        self.transport = get_transport("CurrencyBeacon", BASE_URL)
 
     def get_exchange_rate(self, source_currency: str, exchanged_currencies: str, valuation_date: date):
+        return self._rates(self.transport.get(
+            "historical", params=self._params(source_currency, exchanged_currencies, valuation_date),
+        ))
+
+    async def aget_exchange_rate(self, source_currency: str, exchanged_currencies: str, valuation_date: date):
+        return self._rates(await self.transport.asynchronous.get(
+            "historical", params=self._params(source_currency, exchanged_currencies, valuation_date),
+        ))
 
-        symbols = ",".join(exchanged_currencies)
+    @staticmethod
+    def _params(source_currency, exchanged_currencies, valuation_date):
+        return {
+            "api_key": API_KEY,
+            "date": str(valuation_date),
+            "base": source_currency,
+            "symbols": ",".join(exchanged_currencies),
+        }
 
-        response = requests.get(
-            f"{BASE_URL}historical?api_key={API_KEY}&date={valuation_date}&base={source_currency}&symbols={symbols}"
-            )        
-        
-        if response.status_code == 200:
-            data = response.json()
-            print('data:',data)
-            return data.get("rates", {})  # Extract only the rates dictionary
-        else:
-            print(f"Error fetching data: {response.status_code} - {response.text}")
-            return {}
+    @staticmethod
+    def _rates(response):
+        check_status("CurrencyBeacon", response)
+        return response.json().get("rates", {})  # Extract only the rates dictionary
 
 class CurrencyBeaconTimeSeriesAdapter(TimeSeriesAdapter):
 
+    def __init__(self):
+        self.transport = get_transport("CurrencyBeacon", BASE_URL)
 
     def get_time_series(self, source_currency: str, start_date: str, end_date: str):
-        response = requests.get(
-            f"{BASE_URL}timeseries?api_key={API_KEY}&start_date={start_date}&end_date={end_date}&base={source_currency}"
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("response", {})  # Extract time series rates
-        else:
-            print(f"Error fetching time series data: {response.status_code} - {response.text}")
-            return {}
\ No newline at end of file
+        """
+        One call, for a range of at most CAPABILITIES.max_time_series_days.
+        """
+        return self._rates(self.transport.get("timeseries", params=self._params(source_currency, start_date, end_date)))
+
+    async def aget_time_series(self, source_currency: str, start_date: str, end_date: str):
+        return self._rates(await self.transport.asynchronous.get(
+            "timeseries", params=self._params(source_currency, start_date, end_date),
+        ))
+
+    @staticmethod
+    def _params(source_currency, start_date, end_date):
+        return {
+            "api_key": API_KEY,
+            "start_date": start_date,
+            "end_date": end_date,
+            "base": source_currency,
+        }
+
+    @staticmethod
+    def _rates(response):
+        check_status("CurrencyBeacon", response)
+        return response.json().get("response", {})  # Extract time series rates
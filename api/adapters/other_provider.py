@@ -1,36 +1,81 @@
-import requests
 from datetime import date
-from .base_adapter import CurrencyExchangeAdapter, TimeSeriesAdapter
+from .base_adapter import CurrencyExchangeAdapter, TimeSeriesAdapter, check_status
+from .registry import ProviderCapabilities
+from .transport import get_transport
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("currency_app")
+
 BASE_URL = os.getenv("OTHER_PROVIDER_BASE_URL")
 API_KEY = os.getenv("OTHER_PROVIDER_API_KEY")
 
+# A point rate response holds every rate of the base currency, so one call serves all symbols
+CAPABILITIES = ProviderCapabilities(
+    point_rate=True,
+    multi_symbol=True,
+    time_series=True,
+    max_time_series_days=int(os.getenv("OTHER_PROVIDER_TIME_SERIES_CHUNK_DAYS", 365)),
+)
+
 class OtherProviderAdapter(CurrencyExchangeAdapter):
 
-    def get_exchange_rate(self, source_currency: str, exchanged_currency: str, valuation_date: date):
-        response = requests.get(f"{self.BASE_URL}?api_key={self.API_KEY}&date={valuation_date}&base_currency={source_currency}")
-        if response.status_code == 200:
-            data = response.json()
-            return {"rate": data["exchange_rates"].get(exchanged_currency)}
-        return {"rate": None}
+    def __init__(self):
+        self.transport = get_transport("OtherProvider", BASE_URL)
+
+    def get_exchange_rate(self, source_currency: str, exchanged_currencies: str, valuation_date: date):
+        response = self.transport.get("", params=self._params(source_currency, valuation_date))
+        return self._rates(response, exchanged_currencies)
+
+    async def aget_exchange_rate(self, source_currency: str, exchanged_currencies: str, valuation_date: date):
+        response = await self.transport.asynchronous.get("", params=self._params(source_currency, valuation_date))
+        return self._rates(response, exchanged_currencies)
+
+    @staticmethod
+    def _params(source_currency, valuation_date):
+        return {
+            "api_key": API_KEY,
+            "date": str(valuation_date),
+            "base_currency": source_currency,
+        }
+
+    @staticmethod
+    def _rates(response, exchanged_currencies):
+        check_status("OtherProvider", response)
+        exchange_rates = response.json().get("exchange_rates", {})
+        return {code: exchange_rates[code] for code in exchanged_currencies if exchange_rates.get(code) is not None}
 
 
 
 class OtherProviderTimeSeriesAdapter(TimeSeriesAdapter):
 
+    def __init__(self):
+        self.transport = get_transport("OtherProvider", BASE_URL)
 
     def get_time_series(self, source_currency: str, start_date: str, end_date: str):
-        response = requests.get(
-            f"{self.BASE_URL}timeseries?api_key={self.API_KEY}&start_date={start_date}&end_date={end_date}&base={source_currency}"
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("rates", {})  # Extract time series rates
-        else:
-            print(f"Error fetching time series data: {response.status_code} - {response.text}")
-            return {}
\ No newline at end of file
+        """
+        One call, for a range of at most CAPABILITIES.max_time_series_days.
+        """
+        return self._rates(self.transport.get("timeseries", params=self._params(source_currency, start_date, end_date)))
+
+    async def aget_time_series(self, source_currency: str, start_date: str, end_date: str):
+        return self._rates(await self.transport.asynchronous.get(
+            "timeseries", params=self._params(source_currency, start_date, end_date),
+        ))
+
+    @staticmethod
+    def _params(source_currency, start_date, end_date):
+        return {
+            "api_key": API_KEY,
+            "start_date": start_date,
+            "end_date": end_date,
+            "base": source_currency,
+        }
+
+    @staticmethod
+    def _rates(response):
+        check_status("OtherProvider", response)
+        return response.json().get("rates", {})  # Extract time series rates
@@ -0,0 +1,70 @@
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger("currency_app")
+
+
+class ProviderCapabilities(NamedTuple):
+    """
+    What a provider's API can do, used by the services to plan their calls.
+    """
+    point_rate: bool = True  # rates for a single valuation date
+    multi_symbol: bool = True  # several exchanged currencies in one call
+    time_series: bool = False
+    max_time_series_days: Optional[int] = None  # longest date range of one time series call
+    requests_per_minute: Optional[int] = None
+    requests_per_day: Optional[int] = None
+
+
+class AdapterRegistry:
+    """
+    Adapter classes registered by provider name and kind ("rate" or "time_series").
+    Each adapter is instantiated once and reused, so its HTTP pool is shared by all calls.
+    """
+
+    def __init__(self):
+        self._classes = {}
+        self._capabilities = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, kind: str, adapter_class, capabilities: ProviderCapabilities):
+        """
+        Register an adapter class under a provider name.
+        """
+        self._classes[(name, kind)] = adapter_class
+        self._capabilities[name] = capabilities
+
+    def register(self, name: str, kind: str, capabilities: ProviderCapabilities):
+        """
+        Class decorator variant of `add`.
+        """
+        def decorator(adapter_class):
+            self.add(name, kind, adapter_class, capabilities)
+            return adapter_class
+        return decorator
+
+    def get(self, name: str, kind: str):
+        """
+        The shared adapter instance, or None for an unknown provider.
+        """
+        key = (name, kind)
+        with self._lock:
+            adapter = self._instances.get(key)
+            if adapter is None:
+                adapter_class = self._classes.get(key)
+                if adapter_class is None:
+                    logger.warning("No %s adapter registered for provider %s", kind, name)
+                    return None
+                adapter = self._instances[key] = adapter_class()
+            return adapter
+
+    def capabilities(self, name: str) -> ProviderCapabilities:
+        return self._capabilities.get(name, ProviderCapabilities())
+
+    def names(self) -> list:
+        return sorted({name for name, _ in self._classes})
+
+
+adapter_registry = AdapterRegistry()
@@ -0,0 +1,174 @@
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # AsyncProviderTransport then runs the blocking transport in threads
+    httpx = None
+
+load_dotenv()
+
+CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("PROVIDER_READ_TIMEOUT", 10))
+MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", 2))
+RETRY_BACKOFF = float(os.getenv("PROVIDER_RETRY_BACKOFF", 0.3))
+POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", 10))
+MAX_CONCURRENCY = int(os.getenv("PROVIDER_MAX_CONCURRENCY", 4))
+ASYNC_POOL_SIZE = int(os.getenv("PROVIDER_ASYNC_POOL_SIZE", 100))
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class ProviderTransport:
+    """
+    Pooled HTTP client for one provider: keep-alive connections, connect/read
+    timeouts and bounded retries with exponential backoff on transient errors.
+    """
+
+    def __init__(self, base_url: str, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_retries: int = MAX_RETRIES, backoff_factor: float = RETRY_BACKOFF,
+                 pool_size: int = POOL_SIZE, max_concurrency: int = MAX_CONCURRENCY):
+        self.base_url = base_url or ""
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.asynchronous = AsyncProviderTransport(self)
+
+    def get(self, path: str, params: dict = None) -> requests.Response:
+        return self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+
+    def map(self, func, items) -> list:
+        """
+        Call `func` for every item concurrently, at most `max_concurrency` at a time.
+        Results are returned in the order of `items`; the first exception is re-raised.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncProviderTransport:
+    """
+    Asyncio counterpart of a ProviderTransport, used by the async views. With httpx installed,
+    requests go through one httpx.AsyncClient per event loop (keep-alive connections, the same
+    timeouts and retries) and an in-flight request holds no thread. Without httpx the blocking
+    transport runs in a pool of `pool_size` threads.
+    """
+
+    def __init__(self, transport: ProviderTransport, pool_size: int = ASYNC_POOL_SIZE):
+        self.transport = transport
+        self.pool_size = pool_size
+        # An AsyncClient's connections belong to the loop that opened them
+        self._clients = weakref.WeakKeyDictionary()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _run_blocking(self, func, *args):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="provider")
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            connect_timeout, read_timeout = self.transport.timeout
+            # The client ignores its own limits= when given a transport, so they go to the transport
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                transport=httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                    retries=self.transport.max_retries,  # connection errors
+                ),
+            )
+        return client
+
+    async def get(self, path: str, params: dict = None):
+        if httpx is None:
+            return await self._run_blocking(self.transport.get, path, params)
+
+        url = f"{self.transport.base_url}{path}"
+        for attempt in range(self.transport.max_retries + 1):
+            response = await self._client().get(url, params=params)
+            if response.status_code not in RETRY_STATUSES or attempt == self.transport.max_retries:
+                return response
+            await asyncio.sleep(self.transport.backoff_factor * 2 ** attempt)
+
+    async def map(self, coro_func, items) -> list:
+        """
+        Await `coro_func(item)` for every item, at most `max_concurrency` at a time.
+        Results are returned in the order of `items`; the first exception is re-raised.
+        """
+        semaphore = asyncio.Semaphore(self.transport.max_concurrency)
+
+        async def run(item):
+            async with semaphore:
+                return await coro_func(item)
+
+        return await asyncio.gather(*(run(item) for item in items))
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(provider: str, base_url: str, **kwargs) -> ProviderTransport:
+    """
+    Return the shared transport of a provider, creating it on first use.
+    """
+    with _transports_lock:
+        transport = _transports.get(provider)
+        if transport is None or transport.base_url != (base_url or ""):
+            transport = ProviderTransport(base_url, **kwargs)
+            _transports[provider] = transport
+        return transport
+
+
+def split_date_range(start_date, end_date, max_days: int) -> list:
+    """
+    Split an inclusive date range into consecutive (start, end) chunks of at most `max_days` days
+    (a single chunk when `max_days` is None). Dates are returned as YYYY-MM-DD strings.
+    """
+    if not isinstance(start_date, date):
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    if not isinstance(end_date, date):
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    if max_days is None:
+        return [(start_date.isoformat(), end_date.isoformat())]
+
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=max_days - 1), end_date)
+        chunks.append((chunk_start.isoformat(), chunk_end.isoformat()))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
@@ -1,6 +1,20 @@
+import os
+
 from django.apps import AppConfig
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import signals
+        from django.conf import settings
+
+        signals.connect()
+
+        # Map the rate archive before workers fork, so they share its pages
+        path = settings.RATE_ARCHIVE["PATH"]
+        if path and os.path.exists(path):
+            from api.rate_archive import rate_archive
+            rate_archive.load(path)
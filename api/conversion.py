@@ -0,0 +1,77 @@
+from decimal import Context, Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+
+# ISO 4217 minor units of the currencies that do not use 2 decimal places
+MINOR_UNITS = {
+    # no minor unit
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0,
+    "RWF": 0, "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    # thousandths
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    # ten-thousandths
+    "CLF": 4, "UYW": 4,
+}
+DEFAULT_MINOR_UNITS = 2
+
+# Largest amount accepted, as in a DecimalField(max_digits=30, decimal_places=6)
+AMOUNT_MAX_DIGITS = 30
+AMOUNT_DECIMAL_PLACES = 6
+
+# Exact for any amount * rate within the amount and rate_value limits (30 + 18 digits)
+_CONTEXT = Context(prec=50, rounding=settings.CONVERSION_ROUNDING)
+
+
+@lru_cache(maxsize=None)
+def quantum(currency_code: str) -> Decimal:
+    """
+    Smallest unit of a currency, e.g. Decimal("0.01") for EUR and Decimal("1") for JPY.
+    """
+    return Decimal(1).scaleb(-MINOR_UNITS.get(currency_code, DEFAULT_MINOR_UNITS))
+
+
+def parse_amount(value) -> Decimal:
+    """
+    A finite Decimal within AMOUNT_MAX_DIGITS and AMOUNT_DECIMAL_PLACES from a request
+    parameter; raises ValueError otherwise.
+    """
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value}")
+    _, digits, exponent = amount.as_tuple()
+    decimal_places = max(-exponent, 0)
+    whole_digits = max(len(digits) + exponent, 0)
+    if decimal_places > AMOUNT_DECIMAL_PLACES or whole_digits > AMOUNT_MAX_DIGITS - AMOUNT_DECIMAL_PLACES:
+        raise ValueError(
+            f"Invalid amount: {value}, at most {AMOUNT_MAX_DIGITS - AMOUNT_DECIMAL_PLACES} digits before "
+            f"and {AMOUNT_DECIMAL_PLACES} after the decimal point are allowed"
+        )
+    return amount
+
+
+def round_amount(amount: Decimal, currency_code: str) -> Decimal:
+    """
+    Round to the minor unit of the currency with CONVERSION_ROUNDING.
+    """
+    return amount.quantize(quantum(currency_code), context=_CONTEXT)
+
+
+def convert(amount: Decimal, rate_value: Decimal, exchanged_currency: str) -> Decimal:
+    """
+    amount * rate in exact Decimal arithmetic, rounded once to the exchanged currency's minor unit.
+    """
+    return _CONTEXT.multiply(amount, rate_value).quantize(quantum(exchanged_currency), context=_CONTEXT)
+
+
+def convert_many(amounts, rate_values, exchanged_currencies) -> list:
+    """
+    convert() for aligned sequences; a missing rate gives None.
+    """
+    return [
+        None if rate_value is None else convert(Decimal(amount), rate_value, exchanged_currency)
+        for amount, rate_value, exchanged_currency in zip(amounts, rate_values, exchanged_currencies)
+    ]
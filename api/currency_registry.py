@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from api.models import Currency
+
+
+class CurrencyInfo(NamedTuple):
+    id: int
+    code: str
+    name: str
+    symbol: str
+
+
+class CurrencyRegistry:
+    """
+    Process-wide code <-> id <-> metadata map of every Currency, loaded with one query.
+
+    It is invalidated by the Currency post_save/post_delete signals (see api.signals) and
+    reloaded after CURRENCY_REGISTRY_TTL seconds, which bounds staleness for changes made in
+    other processes or through bulk operations that do not send signals.
+    """
+
+    def __init__(self):
+        self._by_code = None
+        self._by_id = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _maps(self):
+        with self._lock:
+            if self._by_code is None or time.monotonic() - self._loaded_at > settings.CURRENCY_REGISTRY_TTL:
+                currencies = [CurrencyInfo(*row) for row in Currency.objects.values_list("id", "code", "name", "symbol")]
+                self._by_code = {currency.code: currency for currency in currencies}
+                self._by_id = {currency.id: currency for currency in currencies}
+                self._loaded_at = time.monotonic()
+            return self._by_code, self._by_id
+
+    async def aload(self):
+        """
+        Load the maps if they are missing or stale, from async code: the accessors below then
+        answer from memory instead of querying on the event loop.
+        """
+        await sync_to_async(self._maps)()
+
+    def get(self, code: str):
+        return self._maps()[0].get(code)
+
+    def get_by_id(self, currency_id: int):
+        return self._maps()[1].get(currency_id)
+
+    def exists(self, code: str) -> bool:
+        return code in self._maps()[0]
+
+    def id_for(self, code: str):
+        currency = self.get(code)
+        return currency.id if currency else None
+
+    def codes(self) -> set:
+        return set(self._maps()[0])
+
+    def ids_by_code(self) -> dict:
+        return {code: currency.id for code, currency in self._maps()[0].items()}
+
+    def codes_by_id(self) -> dict:
+        return {currency_id: currency.code for currency_id, currency in self._maps()[1].items()}
+
+    def invalidate(self):
+        with self._lock:
+            self._by_code = None
+            self._by_id = None
+
+
+currency_registry = CurrencyRegistry()
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from api.metrics import PROVIDER_CALLS, PROVIDER_CALL_SECONDS, record
+from providers.health import health_registry
+from providers.quota import QuotaExceeded
+
+logger = logging.getLogger("currency_app")
+
+
+class ProviderSkipped(Exception):
+    """
+    Raised instead of calling a provider that cannot serve the call (open circuit, missing
+    capability): no request was made, so nothing is recorded in its health.
+    """
+
+
+def _record_call(provider, started: float, outcome: str):
+    elapsed = time.perf_counter() - started
+    health = health_registry.get(provider.name)
+    if outcome == "error":
+        health.record_failure(elapsed)
+    else:
+        health.record_success(elapsed)
+    PROVIDER_CALLS.inc(provider=provider.name, outcome=outcome)
+    PROVIDER_CALL_SECONDS.observe(elapsed, provider=provider.name)
+    record("provider", elapsed)
+
+
+def _claim(provider):
+    # Claims the half-open trial, so only a provider that is actually called uses it up
+    health = health_registry.get(provider.name)
+    if not health.allow_request():
+        PROVIDER_CALLS.inc(provider=provider.name, outcome="circuit_open")
+        raise ProviderSkipped(f"{provider.name} circuit is open")
+    return health
+
+
+def timed_call(provider, call):
+    """
+    Run `call(provider)` and record its latency and outcome in the provider's health and metrics.
+    A call shed by the quota manager or skipped by `call` never reached the provider and is not timed.
+    """
+    health = _claim(provider)
+    started = time.perf_counter()
+    try:
+        result = call(provider)
+    except ProviderSkipped:
+        health.release_trial()
+        raise
+    except QuotaExceeded:
+        health.release_trial()
+        PROVIDER_CALLS.inc(provider=provider.name, outcome="shed")
+        raise
+    except Exception:
+        _record_call(provider, started, "error")
+        raise
+    _record_call(provider, started, "success" if result else "empty")
+    return result
+
+
+async def atimed_call(provider, acall):
+    """
+    Asyncio variant of `timed_call` for `await acall(provider)`.
+    """
+    health = _claim(provider)
+    started = time.perf_counter()
+    try:
+        result = await acall(provider)
+    except ProviderSkipped:
+        health.release_trial()
+        raise
+    except QuotaExceeded:
+        health.release_trial()
+        PROVIDER_CALLS.inc(provider=provider.name, outcome="shed")
+        raise
+    except Exception:
+        _record_call(provider, started, "error")
+        raise
+    _record_call(provider, started, "success" if result else "empty")
+    return result
+
+
+def sequential_calls(providers, call):
+    """
+    Call providers one at a time, yielding (provider, result) lazily so the caller can stop
+    at the first useful answer. A failing provider is logged and skipped.
+    """
+    for provider in providers:
+        try:
+            yield provider, timed_call(provider, call)
+        except ProviderSkipped as e:
+            logger.debug("Skipping provider %s: %s", provider.name, e)
+        except Exception as e:
+            logger.error("Error fetching from provider %s: %s", provider.name, e)
+
+
+async def asequential_calls(providers, acall):
+    """
+    Asyncio variant of `sequential_calls` for a coroutine function `acall(provider)`.
+    """
+    for provider in providers:
+        try:
+            yield provider, await atimed_call(provider, acall)
+        except ProviderSkipped as e:
+            logger.debug("Skipping provider %s: %s", provider.name, e)
+        except Exception as e:
+            logger.error("Error fetching from provider %s: %s", provider.name, e)
+
+
+def hedge_delay(provider) -> float:
+    """
+    Seconds to wait on a provider before hedging to the next one: its p95 latency once
+    enough samples are collected, otherwise the configured default.
+    """
+    config = settings.PROVIDER_DISPATCH
+    health = health_registry.get(provider.name)
+    if health.sample_count >= config["MIN_SAMPLES"]:
+        return health.latency_percentile(config["HEDGE_PERCENTILE"])
+    return config["HEDGE_DELAY"]
+
+
+async def hedged_call(providers, call):
+    """
+    Call providers (ordered by priority) in hedged mode: start the first one and, each time the
+    last launched provider has not answered within its hedging delay, also start the next one.
+    The first truthy answer wins and the remaining calls are cancelled; when several answers
+    arrive together, the provider with the best priority wins.
+    `call(provider)` is either a coroutine function, awaited on the running loop, or a
+    blocking function, which runs in a worker thread.
+    Returns (provider, result), or (None, None) if no provider answered.
+    """
+    pending = list(providers)
+    running = {}
+
+    def launch_next():
+        provider = pending.pop(0)
+        if asyncio.iscoroutinefunction(call):
+            task = asyncio.ensure_future(atimed_call(provider, call))
+        else:
+            task = asyncio.ensure_future(asyncio.to_thread(timed_call, provider, call))
+        running[task] = provider
+        return provider
+
+    try:
+        last_launched = launch_next() if pending else None
+        while running:
+            timeout = hedge_delay(last_launched) if pending else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            answers = []
+            for task in done:
+                provider = running.pop(task)
+                try:
+                    result = task.result()
+                except ProviderSkipped as e:
+                    logger.debug("Skipping provider %s: %s", provider.name, e)
+                    continue
+                except Exception as e:
+                    logger.error("Error fetching from provider %s: %s", provider.name, e)
+                    continue
+                if result:
+                    answers.append((provider, result))
+
+            if answers:
+                return min(answers, key=lambda answer: answer[0].priority)
+
+            if pending and (not done or not running):
+                last_launched = launch_next()
+                if not done:
+                    logger.info("Hedging provider call to %s", last_launched.name)
+        return None, None
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def dispatch(providers, call):
+    """
+    Synchronous entry point for the hedged dispatcher, for use from WSGI code paths.
+    """
+    return async_to_sync(hedged_call)(providers, call)
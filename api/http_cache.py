@@ -0,0 +1,83 @@
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.timezone import localdate
+
+from api.currency_registry import currency_registry
+from api.models import CurrencyExchangeRate
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag over the values a response is built from.
+    """
+    return quote_etag(hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _window(source_currency: str, start_date: str, end_date: str):
+    return CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_registry.id_for(source_currency),
+        valuation_date__range=[start_date, end_date],
+    )
+
+
+def time_series_validators(source_currency: str, start_date: str, end_date: str, *variant):
+    """
+    (etag, last_modified timestamp) of the stored rates of a time series window, from a single
+    aggregate query. Any insert, update or delete of a row in the window changes the ETag.
+    """
+    stats = _window(source_currency, start_date, end_date).aggregate(
+        rows=Count("id"), last_id=Max("id"), last_modified=Max("updated_at"),
+    )
+    return _validators(stats, source_currency, start_date, end_date, *variant)
+
+
+async def atime_series_validators(source_currency: str, start_date: str, end_date: str, *variant):
+    """
+    Asyncio variant of `time_series_validators`.
+    """
+    stats = await _window(source_currency, start_date, end_date).aaggregate(
+        rows=Count("id"), last_id=Max("id"), last_modified=Max("updated_at"),
+    )
+    return _validators(stats, source_currency, start_date, end_date, *variant)
+
+
+def _validators(stats: dict, source_currency: str, start_date: str, end_date: str, *variant):
+    last_modified = int(stats["last_modified"].timestamp()) if stats["last_modified"] else None
+    etag = make_etag(source_currency, start_date, end_date, stats["rows"], stats["last_id"], stats["last_modified"], *variant)
+    return etag, last_modified
+
+
+def not_modified(request, etag: str, last_modified: int = None, last_date=None):
+    """
+    A 304 response when the request's If-None-Match/If-Modified-Since validators still match.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_cache_headers(response, etag, last_modified, last_date)
+    return response
+
+
+def set_cache_headers(response, etag: str, last_modified: int = None, last_date=None):
+    """
+    Add the validators and a Cache-Control max-age: long when every date of the response is in
+    the past (historical rates do not change), short when it includes today or later.
+    """
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+
+    if isinstance(last_date, str):
+        last_date = datetime.strptime(last_date, "%Y-%m-%d").date()
+    historical = last_date is not None and last_date < localdate()
+    config = settings.RATE_HTTP_CACHE
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=config["HISTORICAL_MAX_AGE"] if historical else config["CURRENT_MAX_AGE"],
+    )
+    return response
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import localdate
+
+from api.rate_archive import append_archive, write_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the stored exchange rates into the memory-mapped rate archive. By default new "
+        "dates are appended to an existing archive; it is rewritten when currencies changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.RATE_ARCHIVE["PATH"],
+                            help="Archive file (default: RATE_ARCHIVE_PATH)")
+        parser.add_argument("--until", help="Last date to export, YYYY-MM-DD (default: yesterday)")
+        parser.add_argument("--refresh-days", type=int, default=1,
+                            help="Rewrite this many of the last archived dates when appending")
+        parser.add_argument("--full", action="store_true", help="Rewrite the whole archive")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("No archive path: pass --path or set RATE_ARCHIVE_PATH")
+
+        if options["until"]:
+            try:
+                until = datetime.strptime(options["until"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--until must be in YYYY-MM-DD format")
+        else:
+            # Today's rates may still change, so only past dates are archived
+            until = localdate() - timedelta(days=1)
+
+        if options["full"]:
+            written = write_archive(path, until)
+        else:
+            written = append_archive(path, until, options["refresh_days"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} dates up to {until} to {path}"))
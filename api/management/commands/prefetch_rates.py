@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.timezone import localdate
+
+from api.currency_registry import currency_registry
+from api.models import CurrencyExchangeRate
+from api.services import fetch_exchange_rate_coalesced
+
+logger = logging.getLogger("currency_app")
+
+
+class Command(BaseCommand):
+    help = (
+        "Prefetch exchange rates for the configured base currencies against every stored "
+        "currency, so the request path is served from the DB/cache."
+    )
+
+    def add_arguments(self, parser):
+        config = settings.RATE_PREFETCH
+        parser.add_argument(
+            "--base", nargs="*", default=config["BASE_CURRENCIES"],
+            help="Base currencies to prefetch (default: RATE_PREFETCH_BASE_CURRENCIES, or every currency)",
+        )
+        parser.add_argument("--days", type=int, default=config["BACKFILL_DAYS"],
+                            help="Also backfill this many past days")
+        parser.add_argument("--concurrency", type=int, default=config["CONCURRENCY"],
+                            help="Maximum number of provider calls in flight")
+        parser.add_argument("--interval", type=int, default=0,
+                            help="Repeat every INTERVAL seconds instead of running once")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        while True:
+            self.prefetch(options["base"], options["days"], options["concurrency"])
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def prefetch(self, base_currencies, days, concurrency):
+        codes = sorted(currency_registry.codes())
+        unknown = set(base_currencies or []) - set(codes)
+        if unknown:
+            raise CommandError(f"Unknown base currencies: {', '.join(sorted(unknown))}")
+
+        bases = base_currencies or codes
+        today = localdate()
+        jobs = [
+            (base, [code for code in codes if code != base], today - timedelta(days=offset))
+            for offset in range(days + 1)
+            for base in bases
+        ]
+        jobs = [job for job in jobs if job[1] and not self.is_stored(*job)]
+        self.stdout.write(f"Prefetching {len(jobs)} base/date combinations with concurrency {concurrency}")
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            fetched = sum(executor.map(lambda job: self.fetch(*job), jobs))
+
+        self.stdout.write(self.style.SUCCESS(f"Fetched {fetched} of {len(jobs)} base/date combinations"))
+
+    @staticmethod
+    def is_stored(base, exchanged_currencies, valuation_date) -> bool:
+        return CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_registry.id_for(base),
+            valuation_date=valuation_date,
+        ).count() >= len(exchanged_currencies)
+
+    @staticmethod
+    def fetch(base, exchanged_currencies, valuation_date) -> bool:
+        """
+        One multi-symbol provider call per base/date; the services store the result.
+        """
+        try:
+            return bool(fetch_exchange_rate_coalesced(base, exchanged_currencies, valuation_date))
+        except Exception as e:
+            logger.error("Prefetch failed for %s on %s: %s", base, valuation_date, e)
+            return False
+        finally:
+            connections.close_all()
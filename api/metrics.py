@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Stage durations of the request being served, for its Server-Timing header
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    values = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels
+    )
+    return "{" + values + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, kept per worker process.
+    """
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, key, value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics) with optional labels.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[position] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            all_series = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(all_series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", key + (("le", le),), cumulative
+            yield f"{self.name}_sum", key, series[-1]
+            yield f"{self.name}_count", key, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "currency_http_requests_total", "HTTP requests by view, method and status.", ("view", "method", "status"),
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "currency_http_request_duration_seconds", "HTTP request duration by view.", ("view",),
+)
+STAGE_SECONDS = registry.histogram(
+    "currency_stage_duration_seconds", "Time spent per stage of the conversion and time series paths.", ("stage",),
+)
+PROVIDER_CALLS = registry.counter(
+    "currency_provider_calls_total", "Provider calls by provider and outcome.", ("provider", "outcome"),
+)
+PROVIDER_CALL_SECONDS = registry.histogram(
+    "currency_provider_call_duration_seconds", "Provider call duration by provider.", ("provider",),
+)
+RATE_LOOKUPS = registry.counter(
+    "currency_rate_lookups_total", "Exchange rate lookups by the layer that answered them.", ("source",),
+)
+
+
+def record(stage: str, seconds: float):
+    """
+    Add a stage duration to the stage histogram and to the current request's Server-Timing.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time a block (or, used as a decorator, a function) as `stage`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def start_request_timings():
+    """
+    Collect stage timings for the current request; returns the dict and a token to reset.
+    """
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def stop_request_timings(token):
+    _request_timings.reset(token)
@@ -0,0 +1,57 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS, record, start_request_timings, stop_request_timings
+
+
+class ServerTimingMiddleware:
+    """
+    Count and time every request, and report the stages recorded while serving it
+    (DB lookup, provider calls, storage, serialization) in a Server-Timing header.
+    Runs natively in both modes, so async views are not pushed into a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request_timings()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings, token = start_request_timings()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings: dict, elapsed: float):
+        view = request.resolver_match.view_name if request.resolver_match else "unresolved"
+        HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        HTTP_REQUEST_SECONDS.observe(elapsed, view=view)
+
+        timings["total"] = elapsed
+        response["Server-Timing"] = ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that as serialization
+        started = time.perf_counter()
+        response.add_post_render_callback(lambda rendered: record("serialize", time.perf_counter() - started))
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='currencyexchangerate',
+            name='rate_value',
+            field=models.DecimalField(decimal_places=6, max_digits=18),
+        ),
+        migrations.AlterField(
+            model_name='currencyexchangerate',
+            name='source_currency',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='exchanges', to='api.currency'),
+        ),
+        migrations.AddIndex(
+            model_name='currencyexchangerate',
+            index=models.Index(fields=['source_currency', 'valuation_date', 'exchanged_currency', 'rate_value'], name='rate_source_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_rate_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currencyexchangerate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
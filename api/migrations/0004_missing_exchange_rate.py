@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_rate_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissingExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exchanged_currency_code', models.CharField(blank=True, max_length=3)),
+                ('valuation_date', models.DateField()),
+                ('source_currency', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.currency')),
+            ],
+            options={
+                'unique_together': {('source_currency', 'valuation_date', 'exchanged_currency_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.utils.timezone import localdate
+
+from api.currency_registry import currency_registry
+from api.models import MissingExchangeRate
+
+# exchanged_currency_code of the rows standing for every exchanged currency of a source and date
+EVERY_CURRENCY = ""
+
+
+def _to_date(valuation_date):
+    if isinstance(valuation_date, date):
+        return valuation_date
+    return datetime.strptime(valuation_date, "%Y-%m-%d").date()
+
+
+class MissingRates:
+    """
+    Rates providers were asked for and answered without, kept in the MissingExchangeRate table
+    so that no worker process requests them again, before or after a restart. A None exchanged
+    currency stands for every exchanged currency of the source on that date. Rates of today and
+    later are never recorded missing, as they may still be published; storing a rate forgets
+    what was recorded missing for its source and date (see bulk_store_rates).
+    """
+
+    def add(self, source_currency: str, exchanged_currency, valuation_date):
+        self.add_many(source_currency, [(exchanged_currency, valuation_date)])
+
+    def add_many(self, source_currency: str, keys):
+        """
+        Record the (exchanged_currency, valuation_date) keys of the source as missing.
+        """
+        source_currency_id = currency_registry.id_for(source_currency)
+        today = localdate()
+        rows = [
+            MissingExchangeRate(
+                source_currency_id=source_currency_id,
+                exchanged_currency_code=exchanged_currency or EVERY_CURRENCY,
+                valuation_date=_to_date(valuation_date),
+            )
+            for exchanged_currency, valuation_date in keys
+            if _to_date(valuation_date) < today
+        ]
+        if source_currency_id is not None and rows:
+            MissingExchangeRate.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def contains(self, source_currency: str, exchanged_currency, valuation_date) -> bool:
+        """
+        Whether providers had no rate for the key (or for the whole source and date).
+        """
+        return MissingExchangeRate.objects.filter(
+            source_currency_id=currency_registry.id_for(source_currency),
+            valuation_date=_to_date(valuation_date),
+            exchanged_currency_code__in={EVERY_CURRENCY, exchanged_currency or EVERY_CURRENCY},
+        ).exists()
+
+    def window(self, source_currency: str, start_date, end_date):
+        """
+        `is_missing(date_str, currency=None)` for the dates of the window, answered from one query.
+        """
+        missing = {
+            (valuation_date.isoformat(), exchanged_currency_code)
+            for valuation_date, exchanged_currency_code in MissingExchangeRate.objects.filter(
+                source_currency_id=currency_registry.id_for(source_currency),
+                valuation_date__range=[_to_date(start_date), _to_date(end_date)],
+            ).values_list("valuation_date", "exchanged_currency_code")
+        }
+        return lambda date_str, currency=None: (
+            (date_str, EVERY_CURRENCY) in missing or bool(currency) and (date_str, currency) in missing
+        )
+
+    def forget(self, source_currency: str, exchanged_currencies, valuation_dates):
+        """
+        Drop what was recorded missing for the stored (exchanged currency, date) combinations.
+        """
+        valuation_dates = {_to_date(valuation_date) for valuation_date in valuation_dates}
+        if valuation_dates:
+            MissingExchangeRate.objects.filter(
+                source_currency_id=currency_registry.id_for(source_currency),
+                valuation_date__in=valuation_dates,
+                exchanged_currency_code__in={EVERY_CURRENCY, *exchanged_currencies},
+            ).delete()
+
+    async def aadd(self, source_currency: str, exchanged_currency, valuation_date):
+        await sync_to_async(self.add)(source_currency, exchanged_currency, valuation_date)
+
+    async def acontains(self, source_currency: str, exchanged_currency, valuation_date) -> bool:
+        return await sync_to_async(self.contains)(source_currency, exchanged_currency, valuation_date)
+
+
+missing_rates = MissingRates()
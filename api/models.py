@@ -9,13 +9,39 @@ class Currency(models.Model):
         return self.code
 
 class CurrencyExchangeRate(models.Model):
-    source_currency = models.ForeignKey(Currency, related_name='exchanges', on_delete=models.CASCADE)
+    # source_currency is the leading column of both composite indexes below
+    source_currency = models.ForeignKey(Currency, related_name='exchanges', on_delete=models.CASCADE, db_index=False)
     exchanged_currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
     valuation_date = models.DateField(db_index=True)
-    rate_value = models.DecimalField(db_index=True, decimal_places=6, max_digits=18)
+    rate_value = models.DecimalField(decimal_places=6, max_digits=18)
+    # Source of the HTTP Last-Modified/ETag validators of the rate endpoints
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('source_currency', 'exchanged_currency', 'valuation_date')
+        indexes = [
+            # Covers time series range queries (source + date range, ordered by date)
+            # without touching the table.
+            models.Index(
+                fields=['source_currency', 'valuation_date', 'exchanged_currency', 'rate_value'],
+                name='rate_source_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.source_currency.code} to {self.exchanged_currency.code} on {self.valuation_date}: {self.rate_value}"
+
+class MissingExchangeRate(models.Model):
+    # Rates providers answered without (weekends, holidays, currencies they do not publish),
+    # shared by every worker so they are not requested again. An empty exchanged_currency_code
+    # stands for every exchanged currency of the source on that date.
+    source_currency = models.ForeignKey(Currency, related_name='+', on_delete=models.CASCADE, db_index=False)
+    exchanged_currency_code = models.CharField(max_length=3, blank=True)
+    valuation_date = models.DateField()
+
+    class Meta:
+        # Also covers the lookups of a source over a date range
+        unique_together = ('source_currency', 'valuation_date', 'exchanged_currency_code')
+
+    def __str__(self):
+        return f"{self.source_currency.code} to {self.exchanged_currency_code or '*'} on {self.valuation_date}: missing"
@@ -0,0 +1,385 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, localcontext
+
+from django.conf import settings
+
+from api.models import CurrencyExchangeRate
+from api.rate_cache import DateGenerations
+from api.rate_matrix import RATE_QUANTUM
+
+logger = logging.getLogger("currency_app")
+
+# File layout (little-endian):
+#   header    magic, version, scale exponent, currency count, source count, first date ordinal, date count,
+#             export time (every block reflects the rates stored up to then)
+#   codes     currency count x 4 bytes, ASCII codes padded with NUL
+#   sources   source count x uint32, positions of the source currencies in the codes
+#   padding   to a multiple of 8 bytes
+#   blocks    date count x (source count x currency count) int64 rates scaled by 10**scale,
+#             one block per consecutive date from the first date; MISSING where no rate is stored
+MAGIC = b"RATEARC1"
+VERSION = 2
+HEADER = struct.Struct("<8sIIIIIId")
+DATE_COUNT_OFFSET = struct.calcsize("<8sIIIII")
+MISSING = -(2 ** 63)
+SCALE = -RATE_QUANTUM.as_tuple().exponent
+
+
+def _to_date(valuation_date):
+    if isinstance(valuation_date, date):
+        return valuation_date
+    return datetime.strptime(valuation_date, "%Y-%m-%d").date()
+
+
+class ArchiveLayout:
+    """
+    Currency index and block geometry of an archive file.
+    """
+
+    def __init__(self, codes, source_positions, start_date, date_count=0, exported_at=0.0):
+        self.codes = list(codes)
+        self.source_positions = list(source_positions)
+        self.start_date = start_date
+        self.date_count = date_count
+        self.exported_at = exported_at
+        self.index = {code: position for position, code in enumerate(self.codes)}
+        self.source_index = {self.codes[position]: row for row, position in enumerate(self.source_positions)}
+        self.block_size = len(self.source_positions) * len(self.codes)
+        header_size = HEADER.size + 4 * len(self.codes) + 4 * len(self.source_positions)
+        self.data_offset = (header_size + 7) // 8 * 8
+
+    @property
+    def end_date(self):
+        return self.start_date + timedelta(days=self.date_count - 1)
+
+    def header_bytes(self) -> bytes:
+        header = HEADER.pack(
+            MAGIC, VERSION, SCALE, len(self.codes), len(self.source_positions),
+            self.start_date.toordinal(), self.date_count, self.exported_at,
+        )
+        header += b"".join(code.encode("ascii").ljust(4, b"\0") for code in self.codes)
+        header += struct.pack(f"<{len(self.source_positions)}I", *self.source_positions)
+        return header.ljust(self.data_offset, b"\0")
+
+    @classmethod
+    def read(cls, buffer):
+        magic, version, scale, currency_count, source_count, start_ordinal, date_count, exported_at = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION or scale != SCALE:
+            raise ValueError("not a rate archive of this version")
+        offset = HEADER.size
+        codes = [bytes(buffer[offset + 4 * i:offset + 4 * i + 4]).rstrip(b"\0").decode("ascii") for i in range(currency_count)]
+        offset += 4 * currency_count
+        source_positions = struct.unpack_from(f"<{source_count}I", buffer, offset)
+        return cls(codes, source_positions, date.fromordinal(start_ordinal), date_count, exported_at)
+
+    @classmethod
+    def read_file(cls, handle):
+        header = handle.read(HEADER.size)
+        _, _, _, currency_count, source_count, _, _, _ = HEADER.unpack(header)
+        return cls.read(header + handle.read(4 * currency_count + 4 * source_count))
+
+
+def _current_layout(start_date):
+    """
+    Layout for the currencies and source currencies stored in the DB right now.
+    """
+    from api.currency_registry import currency_registry
+
+    codes_by_id = currency_registry.codes_by_id()
+    codes = sorted(codes_by_id.values())
+    index = {code: position for position, code in enumerate(codes)}
+    source_ids = CurrencyExchangeRate.objects.values_list("source_currency_id", flat=True).distinct()
+    source_positions = sorted(index[codes_by_id[source_id]] for source_id in source_ids)
+    return ArchiveLayout(codes, source_positions, start_date)
+
+
+def _blocks(layout: ArchiveLayout, start_date, end_date):
+    """
+    Yield the int64 block of every date of the range, built from one date-ordered query.
+    """
+    from api.currency_registry import currency_registry
+
+    codes_by_id = currency_registry.codes_by_id()
+    scale = 10 ** SCALE
+    rows = CurrencyExchangeRate.objects.filter(
+        valuation_date__range=[start_date, end_date],
+    ).order_by("valuation_date").values_list("valuation_date", "source_currency_id", "exchanged_currency_id", "rate_value")
+
+    current = start_date
+    block = array("q", [MISSING]) * layout.block_size
+    for valuation_date, source_id, exchanged_id, rate_value in rows.iterator(chunk_size=5000):
+        while current < valuation_date:
+            yield block
+            current += timedelta(days=1)
+            block = array("q", [MISSING]) * layout.block_size
+        row = layout.source_index.get(codes_by_id.get(source_id))
+        column = layout.index.get(codes_by_id.get(exchanged_id))
+        if row is not None and column is not None:
+            block[row * len(layout.codes) + column] = int(rate_value * scale)
+    while current <= end_date:
+        yield block
+        current += timedelta(days=1)
+        block = array("q", [MISSING]) * layout.block_size
+
+
+def _write_blocks(handle, blocks):
+    for block in blocks:
+        if sys.byteorder != "little":
+            block.byteswap()
+        handle.write(block.tobytes())
+
+
+def write_archive(path: str, until) -> int:
+    """
+    Export every stored date up to `until` into a new archive, replacing `path` atomically.
+    Returns the number of dates written.
+    """
+    until = _to_date(until)
+    # Taken before the reads, so rates stored while exporting count as newer than the archive
+    exported_at = time.time()
+    first_date = CurrencyExchangeRate.objects.order_by("valuation_date").values_list("valuation_date", flat=True).first()
+    if first_date is None or first_date > until:
+        return 0
+
+    layout = _current_layout(first_date)
+    layout.date_count = (until - first_date).days + 1
+    layout.exported_at = exported_at
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as handle:
+        handle.write(layout.header_bytes())
+        _write_blocks(handle, _blocks(layout, first_date, until))
+    os.replace(temporary_path, path)
+    return layout.date_count
+
+
+def append_archive(path: str, until, refresh_days: int = 1) -> int:
+    """
+    Append the dates after the archive's last date up to `until`, and rewrite in place its last
+    `refresh_days` dates and every earlier date with rates stored after the previous export.
+    Falls back to write_archive when the currencies or source currencies changed.
+    Returns the number of dates written.
+    """
+    until = _to_date(until)
+    exported_at = time.time()
+    if not os.path.exists(path):
+        return write_archive(path, until)
+
+    try:
+        with open(path, "rb") as handle:
+            layout = ArchiveLayout.read_file(handle)
+    except (ValueError, struct.error):
+        # Written by another version
+        return write_archive(path, until)
+    current = _current_layout(layout.start_date)
+    if current.codes != layout.codes or current.source_positions != layout.source_positions:
+        return write_archive(path, until)
+
+    with open(path, "r+b") as handle:
+        from_date = max(layout.start_date, layout.end_date - timedelta(days=max(refresh_days, 0) - 1))
+        if layout.date_count == 0:
+            from_date = layout.start_date
+        if from_date > until:
+            return 0
+
+        changed_dates = _changed_dates(layout.start_date, from_date - timedelta(days=1), layout.exported_at)
+        for changed_date in changed_dates:
+            handle.seek(layout.data_offset + (changed_date - layout.start_date).days * layout.block_size * 8)
+            _write_blocks(handle, _blocks(layout, changed_date, changed_date))
+        handle.seek(layout.data_offset + (from_date - layout.start_date).days * layout.block_size * 8)
+        _write_blocks(handle, _blocks(layout, from_date, until))
+        handle.flush()
+        # The date count is updated last, so readers never see a block that is not written yet
+        date_count = max(layout.date_count, (until - layout.start_date).days + 1)
+        handle.seek(DATE_COUNT_OFFSET)
+        handle.write(struct.pack("<Id", date_count, exported_at))
+    return len(changed_dates) + (until - from_date).days + 1
+
+
+def _changed_dates(start_date, end_date, since: float) -> list:
+    """
+    Dates of the range with rates stored (inserted or updated) after the `since` timestamp.
+    """
+    if start_date > end_date:
+        return []
+    return list(CurrencyExchangeRate.objects.filter(
+        valuation_date__range=[start_date, end_date],
+        updated_at__gt=datetime.fromtimestamp(since, tz=timezone.utc),
+    ).order_by("valuation_date").values_list("valuation_date", flat=True).distinct())
+
+
+class RateArchive:
+    """
+    Read-only memory map of an archive file. All worker processes mapping the same file share
+    its pages, and historical lookups are served without touching the DB. The file is remapped
+    when it has been replaced or has grown (checked at most every RELOAD_INTERVAL seconds).
+    Dates with rates stored after the export are skipped until the next export: those stored
+    before the file was mapped are found with one query on the first lookup, later ones through
+    the invalidation generations shared with the rate cache (RATE_CACHE["SHARED_PATH"]), so a
+    store in any worker process takes effect in every one.
+    """
+
+    def __init__(self, generations: DateGenerations = None):
+        self.path = None
+        self.layout = None
+        self.generations = generations or DateGenerations(settings.RATE_CACHE.get("SHARED_PATH"))
+        self._mmap = None
+        self._view = None
+        self._rates = None
+        self._stat = None
+        self._checked_at = 0
+        self._stale_dates = None  # dates stored between the export and the mapping, None until checked
+        self._date_generations = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._rates is not None
+
+    def load(self, path: str) -> bool:
+        if sys.byteorder != "little":
+            logger.warning("Rate archive %s not loaded: big-endian hosts are not supported", path)
+            return False
+        with self._lock:
+            try:
+                with open(path, "rb") as handle:
+                    mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                    stat = os.fstat(handle.fileno())
+                layout = ArchiveLayout.read(mapping)
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning("Rate archive %s not loaded: %s", path, e)
+                return False
+
+            available = (len(mapping) - layout.data_offset) // (layout.block_size * 8 or 1)
+            layout.date_count = min(layout.date_count, available)
+            date_generations = array("q", (
+                self.generations.current((layout.start_date + timedelta(days=offset)).isoformat())
+                for offset in range(layout.date_count)
+            ))
+            view = memoryview(mapping)
+            rates = view[layout.data_offset:layout.data_offset + layout.date_count * layout.block_size * 8].cast("q")
+            # A previous mapping is not closed here: concurrent lookups may still be reading it
+            self.path, self.layout, self._stat = path, layout, (stat.st_ino, stat.st_size)
+            self._mmap, self._view, self._rates = mapping, view, rates
+            self._checked_at = time.monotonic()
+            self._stale_dates, self._date_generations = None, date_generations
+        logger.info("Rate archive loaded from %s: %s to %s", path, layout.start_date, layout.end_date)
+        return True
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < settings.RATE_ARCHIVE["RELOAD_INTERVAL"]:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_ino, stat.st_size) != self._stat:
+            self.load(self.path)
+
+    def _stale(self, valuation_date, offset: int) -> bool:
+        stale_dates = self._stale_dates
+        if stale_dates is None:
+            # Not done in load(), which runs at startup before the DB may be used
+            layout = self.layout
+            stale_dates = self._stale_dates = set(_changed_dates(layout.start_date, layout.end_date, layout.exported_at))
+        date_generations = self._date_generations
+        return (
+            valuation_date in stale_dates or offset >= len(date_generations)
+            or date_generations[offset] != self.generations.current(valuation_date.isoformat())
+        )
+
+    def _position(self, valuation_date):
+        if self._rates is None:
+            return None
+        self._refresh()
+        layout = self.layout
+        valuation_date = _to_date(valuation_date)
+        offset = (valuation_date - layout.start_date).days
+        if not 0 <= offset < layout.date_count or self._stale(valuation_date, offset):
+            return None
+        return offset * layout.block_size
+
+    def _value(self, position: int):
+        scaled = self._rates[position]
+        return None if scaled == MISSING else Decimal(scaled).scaleb(-SCALE)
+
+    def rate(self, source_currency: str, exchanged_currency: str, valuation_date, inverse: bool = True):
+        """
+        Archived rate, or (with inverse) the inverse of the archived opposite rate; None when not archived.
+        """
+        block = self._position(valuation_date)
+        if block is None:
+            return None
+        layout = self.layout
+        exchanged_position = layout.index.get(exchanged_currency)
+        source_row = layout.source_index.get(source_currency)
+        if source_row is not None and exchanged_position is not None:
+            rate_value = self._value(block + source_row * len(layout.codes) + exchanged_position)
+            if rate_value is not None:
+                return rate_value
+        if not inverse:
+            return None
+
+        inverse_row = layout.source_index.get(exchanged_currency)
+        source_position = layout.index.get(source_currency)
+        if inverse_row is not None and source_position is not None:
+            inverse = self._value(block + inverse_row * len(layout.codes) + source_position)
+            if inverse:
+                with localcontext() as ctx:
+                    ctx.prec = 28
+                    return (1 / inverse).quantize(RATE_QUANTUM)
+        return None
+
+    def row(self, source_currency: str, valuation_date) -> dict:
+        """
+        Archived rates of a source currency on a date as {exchanged_currency: Decimal}.
+        """
+        block = self._position(valuation_date)
+        source_row = self.layout.source_index.get(source_currency) if block is not None else None
+        if source_row is None:
+            return {}
+        start = block + source_row * len(self.layout.codes)
+        rates = {}
+        for position, code in enumerate(self.layout.codes):
+            rate_value = self._value(start + position)
+            if rate_value is not None:
+                rates[code] = rate_value
+        return rates
+
+    def covers(self, start_date, end_date) -> bool:
+        if self._rates is None:
+            return False
+        self._refresh()
+        layout = self.layout
+        start_date, end_date = _to_date(start_date), _to_date(end_date)
+        if not (layout.start_date <= start_date and end_date <= layout.end_date):
+            return False
+        first = (start_date - layout.start_date).days
+        return not any(
+            self._stale(start_date + timedelta(days=offset - first), offset)
+            for offset in range(first, first + (end_date - start_date).days + 1)
+        )
+
+    def invalidate(self, valuation_dates):
+        """
+        Stop serving dates whose rates were just stored, in every process mapping the archive.
+        """
+        self.generations.bump(_to_date(valuation_date).isoformat() for valuation_date in valuation_dates)
+
+    def close(self):
+        if self._rates is not None:
+            self._rates.release()
+            self._view.release()
+            self._mmap.close()
+        self._rates = self._view = self._mmap = self.layout = None
+
+
+rate_archive = RateArchive()
@@ -0,0 +1,255 @@
+import logging
+import mmap
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger("currency_app")
+
+
+def _date_key(valuation_date):
+    return valuation_date.isoformat() if hasattr(valuation_date, "isoformat") else str(valuation_date)
+
+
+class DateGenerations:
+    """
+    Per-date invalidation counters shared by all processes through a memory-mapped file, by
+    default next to the SQLite database so that every worker of a deployment maps the same one.
+    Dates map to one of SLOTS counters; dates sharing a slot are only invalidated together.
+    Without a path (or when the file cannot be mapped) the counters are process-local.
+    """
+
+    SLOTS = 4096
+
+    def __init__(self, path: str = None):
+        self.path = None
+        self._counters = array("q", [0]) * self.SLOTS
+        if path:
+            try:
+                with open(path, "a+b") as handle:
+                    if handle.seek(0, 2) < self.SLOTS * 8:
+                        handle.truncate(self.SLOTS * 8)
+                    self._mmap = mmap.mmap(handle.fileno(), self.SLOTS * 8)
+                self._counters = memoryview(self._mmap).cast("q")
+                self.path = path
+            except OSError as e:
+                logger.warning("Rate cache invalidation is process-local, %s not mapped: %s", path, e)
+
+    def _slot(self, date_key: str) -> int:
+        try:
+            return date.fromisoformat(date_key).toordinal() % self.SLOTS
+        except ValueError:
+            return 0
+
+    def current(self, date_key: str) -> int:
+        return self._counters[self._slot(date_key)]
+
+    def bump(self, date_keys):
+        for slot in {self._slot(date_key) for date_key in date_keys}:
+            self._counters[slot] += 1
+
+    def bump_all(self):
+        for slot in range(self.SLOTS):
+            self._counters[slot] += 1
+
+
+class LocalRateCacheBackend:
+    """
+    Process-local LRU store with a size bound and a per-entry TTL. Entries are stamped with the
+    generation of their date (the last element of every key), and deleting keys bumps the
+    generations of their dates, which drops the entries of those dates in every process.
+    A value read before the generation changed is not stored: pass the generation taken
+    before the read to `set`.
+    """
+
+    invalidates_dates = True
+
+    def __init__(self, max_size: int, ttl: int, generations: DateGenerations = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generations = generations or DateGenerations()
+        # Entries dropped for the size bound, for their TTL, and for a newer generation
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, generation = entry
+            if generation != self.generations.current(key[-1]):
+                del self._entries[key]
+                self.invalidations += 1
+                return None
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self, date_key: str):
+        return self.generations.current(date_key)
+
+    def set(self, key, value, ttl: int = None, generation: int = None):
+        with self._lock:
+            current = self.generations.current(key[-1])
+            if generation is not None and generation != current:
+                return  # Read before a write of the date; stamped with `generation` it would outlive it
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl), current)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self.generations.bump(key[-1] for key in keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generations.bump_all()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoRateCacheBackend:
+    """
+    Store backed by one of the aliases in ``settings.CACHES`` (locmem, file, ...).
+    Eviction is handled by the Django backend itself and is not counted here.
+    """
+
+    evictions = expirations = invalidations = 0
+    invalidates_dates = False
+
+    def __init__(self, alias: str, ttl: int):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _cache_key(key):
+        return "rate:" + ":".join(key)
+
+    def get(self, key):
+        return self.cache.get(self._cache_key(key))
+
+    def generation(self, date_key: str):
+        return None
+
+    def set(self, key, value, ttl: int = None, generation: int = None):
+        self.cache.set(self._cache_key(key), value, ttl or self.ttl)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self._cache_key(key) for key in keys])
+
+    def clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return 0
+
+
+class RateCache:
+    """
+    Exchange rate cache keyed on (source, target, valuation_date). Rates providers had none
+    for are not cached here but recorded in api.missing_rates, shared by every worker.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source_currency: str, exchanged_currency: str, valuation_date):
+        return (source_currency, exchanged_currency, _date_key(valuation_date))
+
+    def get(self, source_currency: str, exchanged_currency: str, valuation_date):
+        value = self.backend.get(self.key(source_currency, exchanged_currency, valuation_date))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def generation(self, valuation_date):
+        """
+        Invalidation generation of the date, taken before reading a rate from the archive or DB
+        and passed to `set` with it (None for backends without generations).
+        """
+        return self.backend.generation(_date_key(valuation_date))
+
+    def set(self, source_currency: str, exchanged_currency: str, valuation_date, rate_value, generation: int = None):
+        self.backend.set(
+            self.key(source_currency, exchanged_currency, valuation_date), Decimal(str(rate_value)), generation=generation,
+        )
+
+    def set_derived(self, source_currency: str, exchanged_currency: str, valuation_date, rate_value, generation: int = None):
+        """
+        Cache a cross rate. It can depend on any rate of its date, so it is only cached by
+        backends that drop whole dates on invalidation.
+        """
+        if self.backend.invalidates_dates:
+            self.set(source_currency, exchanged_currency, valuation_date, rate_value, generation)
+
+    def invalidate(self, source_currency: str, exchanged_currencies, valuation_dates):
+        """
+        Drop every (source, exchanged, date) combination from the cache, with the inverse rates
+        derived from it.
+        """
+        keys = []
+        for valuation_date in valuation_dates:
+            for exchanged_currency in exchanged_currencies:
+                keys.append(self.key(source_currency, exchanged_currency, valuation_date))
+                keys.append(self.key(exchanged_currency, source_currency, valuation_date))
+        self.backend.delete_many(keys)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+            "invalidations": self.backend.invalidations,
+            "shared_invalidation": bool(getattr(self.backend, "generations", None) and self.backend.generations.path),
+        }
+
+
+def build_rate_cache() -> RateCache:
+    config = getattr(settings, "RATE_CACHE", {})
+    backend_name = config.get("BACKEND", "local")
+    ttl = config.get("TTL", 3600)
+    if backend_name == "local":
+        backend = LocalRateCacheBackend(config.get("MAX_SIZE", 10000), ttl, DateGenerations(config.get("SHARED_PATH")))
+    else:
+        backend = DjangoRateCacheBackend(backend_name, ttl)
+    return RateCache(backend)
+
+
+rate_cache = build_rate_cache()
@@ -0,0 +1,215 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, localcontext
+
+from django.conf import settings
+
+from api.currency_registry import currency_registry
+from api.models import CurrencyExchangeRate
+from api.rate_cache import DateGenerations
+
+RATE_QUANTUM = Decimal(1).scaleb(-CurrencyExchangeRate._meta.get_field("rate_value").decimal_places)
+# Rates are held as int64 multiples of RATE_QUANTUM, exact for every rate_value the column can hold
+SCALE = -RATE_QUANTUM.as_tuple().exponent
+MISSING = -(2 ** 63)
+
+
+def _to_date(valuation_date):
+    if isinstance(valuation_date, date):
+        return valuation_date
+    return datetime.strptime(valuation_date, "%Y-%m-%d").date()
+
+
+def _quantize(rate_value) -> Decimal:
+    # Same scale as the rate_value column, so values match what the DB returns
+    return Decimal(str(rate_value)).quantize(RATE_QUANTUM)
+
+
+def _scaled(rate_value) -> int:
+    return int(_quantize(rate_value).scaleb(SCALE))
+
+
+def _rate(scaled: int) -> Decimal:
+    return Decimal(scaled).scaleb(-SCALE)
+
+
+class RateMatrixStore:
+    """
+    Bounded LRU of columnar rate matrix rows. A row holds the stored rates of one source
+    currency on one valuation date as an int64 array of rates scaled by 10**SCALE, with one
+    column per exchanged currency id and MISSING where no rate is stored; lookups rescale
+    them to Decimal exactly. Rows are loaded per source with one query over the (source, date)
+    index and are reloaded after TTL, or once their date's invalidation generation changes:
+    the counters are shared with the rate cache (RATE_CACHE["SHARED_PATH"]), so rates stored
+    by any worker process invalidate the rows of their dates in every process. Inverse
+    rates are derived on lookup.
+    """
+
+    def __init__(self, max_rows: int, ttl: int, generations: DateGenerations = None):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.generations = generations or DateGenerations()
+        self._columns = {}  # currency id -> column, append-only so loaded rows stay valid
+        self._rows = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.RATE_MATRIX["ENABLED"]
+
+    def _column(self, currency_id) -> int:
+        column = self._columns.get(currency_id)
+        if column is None:
+            column = self._columns[currency_id] = len(self._columns)
+        return column
+
+    def _fresh(self, key):
+        entry = self._rows.get(key)
+        if entry is None:
+            return None
+        loaded_at, generation, row = entry
+        if time.monotonic() - loaded_at > self.ttl or generation != self.generations.current(key[1].isoformat()):
+            del self._rows[key]
+            return None
+        self._rows.move_to_end(key)
+        return row
+
+    def _array(self, source_currency: str, valuation_date):
+        with self._lock:
+            row = self._fresh((source_currency, valuation_date))
+        if row is None:
+            row = self._load(source_currency, valuation_date, valuation_date)[valuation_date]
+        return row
+
+    def _load(self, source_currency: str, start_date, end_date) -> dict:
+        dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        # Taken before the query, so rates stored while it runs leave the rows stale
+        generations = {valuation_date: self.generations.current(valuation_date.isoformat()) for valuation_date in dates}
+        stored = []
+        source_id = currency_registry.id_for(source_currency)
+        if source_id is not None:
+            stored = list(CurrencyExchangeRate.objects.filter(
+                source_currency_id=source_id,
+                valuation_date__range=[start_date, end_date],
+            ).values_list("valuation_date", "exchanged_currency_id", "rate_value").iterator(chunk_size=5000))
+
+        loaded_at = time.monotonic()
+        with self._lock:
+            for _, exchanged_id, _ in stored:
+                self._column(exchanged_id)
+            rows = {valuation_date: array("q", [MISSING]) * len(self._columns) for valuation_date in dates}
+            for valuation_date, exchanged_id, rate_value in stored:
+                rows[valuation_date][self._columns[exchanged_id]] = _scaled(rate_value)
+            for valuation_date, row in rows.items():
+                key = (source_currency, valuation_date)
+                self._rows[key] = (loaded_at, generations[valuation_date], row)
+                self._rows.move_to_end(key)
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+        return rows
+
+    def _lookup(self, row, currency_code: str):
+        column = self._columns.get(currency_registry.id_for(currency_code))
+        if column is None or column >= len(row) or row[column] == MISSING:
+            return None
+        return row[column]
+
+    def _as_dict(self, row) -> dict:
+        codes_by_id = currency_registry.codes_by_id()
+        return {
+            codes_by_id[currency_id]: _rate(row[column])
+            for currency_id, column in self._columns.items()
+            if column < len(row) and row[column] != MISSING and currency_id in codes_by_id
+        }
+
+    def load(self, source_currency: str, start_date, end_date) -> dict:
+        """
+        Load the rows of a source currency for every valuation date of the inclusive range
+        with a single query; returns {valuation_date: {exchanged_currency: Decimal}}.
+        """
+        rows = self._load(source_currency, _to_date(start_date), _to_date(end_date))
+        return {valuation_date: self._as_dict(row) for valuation_date, row in rows.items()}
+
+    def row(self, source_currency: str, valuation_date) -> dict:
+        """
+        Stored rates of a source currency on one date as {exchanged_currency: Decimal}.
+        """
+        return self._as_dict(self._array(source_currency, _to_date(valuation_date)))
+
+    def rate(self, source_currency: str, exchanged_currency: str, valuation_date):
+        """
+        The stored rate, or the inverse of the stored opposite rate; None if neither exists.
+        """
+        return self.rates(source_currency, [exchanged_currency], valuation_date)[0]
+
+    def rates(self, source_currency: str, exchanged_currencies, valuation_date) -> list:
+        """
+        rate() for several exchanged currencies of one source and date, read from one row.
+        """
+        valuation_date = _to_date(valuation_date)
+        row = self._array(source_currency, valuation_date)
+        rate_values = []
+        for exchanged_currency in exchanged_currencies:
+            scaled = self._lookup(row, exchanged_currency)
+            if scaled is not None:
+                rate_values.append(_rate(scaled))
+                continue
+            inverse = self._lookup(self._array(exchanged_currency, valuation_date), source_currency)
+            if inverse:
+                with localcontext() as ctx:
+                    ctx.prec = 28
+                    rate_values.append((1 / _rate(inverse)).quantize(RATE_QUANTUM))
+            else:
+                rate_values.append(None)
+        return rate_values
+
+    def rows(self, source_currency: str, start_date, end_date) -> list:
+        """
+        (valuation_date, row) of every date in the range, loading the stale or missing span in one query.
+        """
+        start_date, end_date = _to_date(start_date), _to_date(end_date)
+        dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        with self._lock:
+            rows = {valuation_date: self._fresh((source_currency, valuation_date)) for valuation_date in dates}
+        missing = [valuation_date for valuation_date, row in rows.items() if row is None]
+        if missing:
+            rows.update(self._load(source_currency, missing[0], missing[-1]))
+        return [(valuation_date, self._as_dict(rows[valuation_date])) for valuation_date in dates]
+
+    def apply(self, source_currency: str, rows):
+        """
+        Invalidate the dates of newly stored (valuation_date, exchanged_currency, rate) rows
+        in every process, and refresh the rows of the source loaded in this one in place.
+        """
+        rows = [(_to_date(valuation_date), exchanged_currency, rate_value) for valuation_date, exchanged_currency, rate_value in rows]
+        dates = {valuation_date for valuation_date, _, _ in rows}
+        with self._lock:
+            self.generations.bump(valuation_date.isoformat() for valuation_date in dates)
+            for valuation_date, exchanged_currency, rate_value in rows:
+                key = (source_currency, valuation_date)
+                entry = self._rows.get(key)
+                if entry is None:
+                    continue
+                column = self._column(currency_registry.id_for(exchanged_currency))
+                row = entry[2]
+                if column >= len(row):
+                    row.extend([MISSING] * (column + 1 - len(row)))
+                row[column] = _scaled(rate_value)
+            for valuation_date in dates:
+                entry = self._rows.get((source_currency, valuation_date))
+                if entry is not None:
+                    self._rows[(source_currency, valuation_date)] = (
+                        entry[0], self.generations.current(valuation_date.isoformat()), entry[2],
+                    )
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+rate_matrix_store = RateMatrixStore(
+    settings.RATE_MATRIX["MAX_ROWS"], settings.RATE_MATRIX["TTL"], DateGenerations(settings.RATE_CACHE.get("SHARED_PATH")),
+)
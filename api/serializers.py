@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from django.conf import settings
+from api.conversion import AMOUNT_DECIMAL_PLACES, AMOUNT_MAX_DIGITS
 from api.models import Currency, CurrencyExchangeRate
 
 class CurrencySerializer(serializers.ModelSerializer):
@@ -9,4 +11,17 @@ class CurrencySerializer(serializers.ModelSerializer):
 class CurrencyExchangeRateSerializer(serializers.ModelSerializer):
     class Meta:
         model = CurrencyExchangeRate
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class ConversionSerializer(serializers.Serializer):
+    source_currency = serializers.CharField(max_length=3)
+    exchanged_currency = serializers.CharField(max_length=3)
+    amount = serializers.DecimalField(max_digits=AMOUNT_MAX_DIGITS, decimal_places=AMOUNT_DECIMAL_PLACES)
+    valuation_date = serializers.DateField(required=False)
+
+class BatchConversionSerializer(serializers.Serializer):
+    conversions = serializers.ListField(
+        child=ConversionSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_CONVERSION_MAX_ITEMS,
+    )
@@ -1,7 +1,23 @@
-from api.models import CurrencyExchangeRate, Currency
+from api.models import CurrencyExchangeRate
 from api.adapters.adapter_factory import AdapterFactory
+from api.dispatcher import ProviderSkipped, dispatch, sequential_calls
+from api.missing_rates import missing_rates
+from api.rate_cache import rate_cache
+from api.currency_registry import currency_registry
+from api.rate_matrix import RATE_QUANTUM, rate_matrix_store
+from api.rate_archive import rate_archive
+from api.services_ingestion import bulk_store_rates
+from api.singleflight import single_flight, process_lease
+from api.metrics import RATE_LOOKUPS, timed
 from providers.models import Provider
-from django.utils.timezone import now
+from providers.health import route_providers
+from providers.quota import quota_manager
+from currency_exchange.db_router import primary_reads
+from django.conf import settings
+from django.db.models import Q
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, localcontext
 import logging
 
 logger = logging.getLogger("currency_app")
@@ -10,111 +26,482 @@ def get_exchange_rate_from_db(source_currency, exchanged_currency, valuation_dat
     """
     Fetch exchange rate from the local database.
     """
-    logger.info(f"Fetching Exchange rate from DB for {source_currency} to {exchanged_currency} for date {valuation_date}")
+    logger.debug("Fetching Exchange rate from DB for %s to %s for date %s", source_currency, exchanged_currency, valuation_date)
+
+    source_currency_id = currency_registry.id_for(source_currency)
+    exchanged_currency_id = currency_registry.id_for(exchanged_currency)
+    if source_currency_id is None or exchanged_currency_id is None:
+        logger.warning("Unknown currency in %s to %s", source_currency, exchanged_currency)
+        return None
 
-    source_currency = Currency.objects.get(code=source_currency)
-    exchanged_currency = Currency.objects.get(code=exchanged_currency)
-    
     rate_data = CurrencyExchangeRate.objects.filter(
-        source_currency=source_currency,
-        exchanged_currency=exchanged_currency,
+        source_currency_id=source_currency_id,
+        exchanged_currency_id=exchanged_currency_id,
         valuation_date=valuation_date
     ).first()
 
     if rate_data:
-        logger.info(f"Exchange Rate: {rate_data.rate_value}")
+        logger.debug("Exchange Rate: %s", rate_data.rate_value)
         return rate_data
     else:
-        logger.warning(f"No exchange rate found in DB for {source_currency} to {exchanged_currency} on {valuation_date}")
+        logger.warning("No exchange rate found in DB for %s to %s on %s", source_currency, exchanged_currency, valuation_date)
         return None  # Explicitly return None if no data is found
 
 
 
+def load_rate_graph(valuation_date, currencies) -> dict:
+    """
+    Load the stored rates of a valuation date as a graph {source: {exchanged: rate}}.
+    Only edges touching `currencies` or a pivot currency are loaded, since those are the only
+    edges a cross rate path can use. Inverse edges are derived when no direct rate is stored.
+    """
+    ids_by_code = currency_registry.ids_by_code()
+    codes_by_id = currency_registry.codes_by_id()
+    node_ids = {ids_by_code[code] for code in set(currencies) | set(settings.RATE_PIVOT_CURRENCIES) if code in ids_by_code}
+    rates = CurrencyExchangeRate.objects.filter(
+        Q(source_currency_id__in=node_ids) | Q(exchanged_currency_id__in=node_ids),
+        valuation_date=valuation_date,
+    ).values_list("source_currency_id", "exchanged_currency_id", "rate_value")
+
+    graph = defaultdict(dict)
+    inverse_edges = []
+    for source_id, exchanged_id, rate_value in rates:
+        source_code, exchanged_code = codes_by_id.get(source_id), codes_by_id.get(exchanged_id)
+        if rate_value and source_code and exchanged_code:
+            graph[source_code][exchanged_code] = rate_value
+            inverse_edges.append((exchanged_code, source_code, rate_value))
+
+    with localcontext() as ctx:
+        ctx.prec = 28
+        for source_code, exchanged_code, rate_value in inverse_edges:
+            graph[source_code].setdefault(exchanged_code, 1 / rate_value)
+    return graph
+
+
+def find_cross_rate(graph: dict, source_currency: str, exchanged_currency: str):
+    """
+    Find the shortest path from source to exchanged currency that only goes through
+    pivot currencies and return the product of its rates, or None if there is no path.
+    """
+    pivots = set(settings.RATE_PIVOT_CURRENCIES)
+    rate_quantum = Decimal(1).scaleb(-CurrencyExchangeRate._meta.get_field("rate_value").decimal_places)
+
+    with localcontext() as ctx:
+        ctx.prec = 28
+        frontier = [(source_currency, Decimal(1))]
+        visited = {source_currency}
+        while frontier:
+            next_frontier = []
+            for currency, rate in frontier:
+                for neighbour, edge_rate in graph.get(currency, {}).items():
+                    if neighbour == exchanged_currency:
+                        return (rate * edge_rate).quantize(rate_quantum)
+                    if neighbour in pivots and neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append((neighbour, rate * edge_rate))
+            frontier = next_frontier
+    return None
+
+
+def get_cross_rate_from_db(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    Derive an exchange rate from the rates stored for the valuation date (triangulation).
+    """
+    graph = load_rate_graph(valuation_date, [source_currency, exchanged_currency])
+    cross_rate = find_cross_rate(graph, source_currency, exchanged_currency)
+    if cross_rate is not None:
+        logger.info("Derived cross rate %s to %s on %s: %s", source_currency, exchanged_currency, valuation_date, cross_rate)
+    return cross_rate
+
+
 def fetch_exchange_rate_from_provider(source_currency: str, exchanged_currencies: list, valuation_date):
     """
     Fetch exchange rates from the highest-priority active provider for multiple exchanged currencies.
+    Providers whose circuit breaker is open are skipped. Providers without multi-symbol support
+    are called once per exchanged currency, so among equal priorities multi-symbol providers
+    are preferred; every call is charged to the provider's quota.
+    Returns {} when providers answered without the rates and none failed, None otherwise, so
+    only genuine answers are remembered as missing rates.
     """
+    answered, failed = [], []
+
+    def call_cost(provider):
+        return 1 if AdapterFactory.get_capabilities(provider.name).multi_symbol else len(exchanged_currencies)
+
+    def call_provider(provider):
+        adapter = AdapterFactory.get_adapter(provider.name)
+        capabilities = AdapterFactory.get_capabilities(provider.name)
+        if not adapter or not capabilities.point_rate:
+            raise ProviderSkipped(f"{provider.name} has no point_rate support")
+
+        def fetch():
+            if capabilities.multi_symbol:
+                return adapter.get_exchange_rate(source_currency, exchanged_currencies, valuation_date)
+
+            rates = {
+                code: adapter.get_exchange_rate(source_currency, code, valuation_date).get("rate")
+                for code in exchanged_currencies
+            }
+            return {code: rate_value for code, rate_value in rates.items() if rate_value is not None}
+
+        try:
+            rate_data = quota_manager.call(provider, call_cost(provider), fetch, capabilities)
+        except Exception:
+            failed.append(provider.name)
+            raise
+        answered.append(provider.name)
+        return rate_data
+
     try:
-        providers = Provider.objects.filter(active=True).order_by('priority')
+        providers = route_providers(Provider.objects.filter(active=True).order_by('priority'), cost=call_cost)
+
+        if settings.PROVIDER_DISPATCH["MODE"] == "hedged":
+            provider, rate_data = dispatch(providers, call_provider)
+            answers = [(provider, rate_data)] if rate_data else []
+        else:
+            # Lazily evaluated, so providers are still called one at a time
+            answers = sequential_calls(providers, call_provider)
 
-        for provider in providers:
-            adapter = AdapterFactory.get_adapter(provider.name)
-            if adapter:
-                rate_data = adapter.get_exchange_rate(source_currency, exchanged_currencies, valuation_date)
-                logger.info(f"Exchange rates fetched from {provider.name}: {rate_data}")
+        for provider, rate_data in answers:
+            logger.info("Exchange rates fetched from %s: %s currencies", provider.name, len(rate_data or {}))
+            logger.debug("Exchange rates from %s: %s", provider.name, rate_data)
 
-                if rate_data:
-                    # Store data in the DB for future use
-                    store_exchange_rate(source_currency, exchanged_currencies, valuation_date, rate_data)
-                    return rate_data  # Return the fetched exchange rates
+            if rate_data:
+                # Store data in the DB for future use
+                store_exchange_rate(source_currency, exchanged_currencies, valuation_date, rate_data)
+                return rate_data  # Return the fetched exchange rates
 
-        logger.warning(f"No exchange rates found from providers for {source_currency} to {exchanged_currencies} on {valuation_date}")
-        return None  # No provider returned data
+        logger.warning("No exchange rates found from providers for %s to %s on %s", source_currency, exchanged_currencies, valuation_date)
+        return {} if answered and not failed else None  # No provider returned data
 
     except Exception as e:
-        logger.error(f"Error fetching exchange rate from providers: {e}")
+        logger.error("Error fetching exchange rate from providers: %s", e)
         return None  # Handle errors gracefully
 
 
+def fetch_exchange_rate_coalesced(source_currency: str, exchanged_currencies: list, valuation_date):
+    """
+    Fetch exchange rates from providers, sharing one in-flight fetch between concurrent misses
+    for the same source, symbols and date (across threads, and across worker processes when
+    leases are enabled).
+    """
+    key = f"rate:{source_currency}:{','.join(sorted(exchanged_currencies))}:{valuation_date}"
+
+    def fetch():
+        with process_lease(key) as waited:
+            if waited:
+                # Another worker held the lease and has probably stored the rates meanwhile,
+                # on the primary; the read alias may not have them yet
+                ids_by_code = currency_registry.ids_by_code()
+                codes_by_id = currency_registry.codes_by_id()
+                with primary_reads():
+                    stored_rates = {
+                        codes_by_id.get(exchanged_id): rate_value
+                        for exchanged_id, rate_value in CurrencyExchangeRate.objects.filter(
+                            source_currency_id=ids_by_code.get(source_currency),
+                            exchanged_currency_id__in=[ids_by_code.get(code) for code in exchanged_currencies],
+                            valuation_date=valuation_date,
+                        ).values_list("exchanged_currency_id", "rate_value")
+                    }
+                if set(exchanged_currencies) <= stored_rates.keys():
+                    return stored_rates
+            return fetch_exchange_rate_from_provider(source_currency, exchanged_currencies, valuation_date)
+
+    return single_flight.do(key, fetch)
+
+
 def store_exchange_rate(source_currency_code: str, exchanged_currency_codes: list, valuation_date, rate_data):
     """
     Store exchange rates for multiple exchanged currencies in the database.
     If an exchanged currency is not found in the database, it logs a warning and skips it.
     """
-    try:
-        source_currency = Currency.objects.get(code=source_currency_code)
-
-        for exchanged_currency_code in exchanged_currency_codes:
-            if exchanged_currency_code not in rate_data:
-                logger.warning(f"Skipping {exchanged_currency_code}: No rate data available.")
-                continue  # Skip this currency if there's no rate data
-
-            try:
-                exchanged_currency = Currency.objects.get(code=exchanged_currency_code)
-                
-                # Store or update the exchange rate
-                CurrencyExchangeRate.objects.update_or_create(
-                    source_currency=source_currency,
-                    exchanged_currency=exchanged_currency,
-                    valuation_date=valuation_date,
-                    defaults={'rate_value': rate_data[exchanged_currency_code]}
-                )
-                logger.info(f"Exchange rate stored in DB for {source_currency} to {exchanged_currency}")
-            except Currency.DoesNotExist:
-                logger.warning(f"Skipping {exchanged_currency_code}: Currency not found in DB.")
-
-    except Currency.DoesNotExist as e:
-        logger.error(f"Error storing exchange rate: {e}")
-
-
-def get_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date):
-    """
-    Get exchange rate from DB if available, else fetch from provider.
-    """
-    # 1. Check if the data exists in the database
-    existing_rate = get_exchange_rate_from_db(source_currency, exchanged_currency, valuation_date)
-    
-    if existing_rate:
-        return {
-            "source_currency": source_currency,
-            "exchanged_currency": exchanged_currency,
-            "valuation_date": valuation_date,
-            "rate_value": str(existing_rate.rate_value)
-        }
+    rows = []
+    for exchanged_currency_code in exchanged_currency_codes:
+        if exchanged_currency_code not in rate_data:
+            logger.warning("Skipping %s: No rate data available.", exchanged_currency_code)
+            continue  # Skip this currency if there's no rate data
+        rows.append((valuation_date, exchanged_currency_code, rate_data[exchanged_currency_code]))
+
+    # Store or update the exchange rates in one bulk upsert
+    bulk_store_rates(source_currency_code, rows)
+
+
+def get_exchange_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    Get the Decimal exchange rate from the rate cache or DB if available, else fetch it from
+    providers. Returns None if no rate can be found.
+    """
+    rate_value = get_stored_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is None:
+        rate_value = fetch_exchange_rate_value(source_currency, exchanged_currency, valuation_date)
+    return rate_value
+
+
+def get_stored_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    The Decimal exchange rate from stored data only (rate cache, archive, DB, derived from the
+    rates stored for the date); None when only providers could have it.
+    """
+    # 1. Check the in-process rate cache
+    cached_rate = rate_cache.get(source_currency, exchanged_currency, valuation_date)
+    if cached_rate is not None:
+        RATE_LOOKUPS.inc(source="cache")
+        return cached_rate
+    # Taken before the reads: a rate stored meanwhile must not be shadowed by the value read
+    generation = rate_cache.generation(valuation_date)
+
+    # 2. Check the memory-mapped archive of historical rates (inverses only after the DB's own rows)
+    archived_rate = rate_archive.rate(source_currency, exchanged_currency, valuation_date, inverse=False)
+    if archived_rate is not None:
+        RATE_LOOKUPS.inc(source="archive")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, archived_rate, generation)
+        return archived_rate
+
+    # 3. Check if the data exists in the database (through the in-memory rate matrix if enabled)
+    with timed("db"):
+        if rate_matrix_store.enabled:
+            existing_rate_value = rate_matrix_store.rate(source_currency, exchanged_currency, valuation_date)
+        else:
+            existing_rate = get_exchange_rate_from_db(source_currency, exchanged_currency, valuation_date)
+            existing_rate_value = existing_rate.rate_value if existing_rate else None
+
+    if existing_rate_value is not None:
+        RATE_LOOKUPS.inc(source="db")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, existing_rate_value, generation)
+        return existing_rate_value
     else:
-        logger.info(f"Exchange rate not found in DB")
+        logger.debug("Exchange rate not found in DB")
 
+    archived_rate = rate_archive.rate(source_currency, exchanged_currency, valuation_date)
+    if archived_rate is not None:
+        RATE_LOOKUPS.inc(source="archive")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, archived_rate, generation)
+        return archived_rate
 
-    # 2. Fetch from provider if not in DB
-    if isinstance(exchanged_currency, str):
-        exchanged_currency = [exchanged_currency]
-    rate_data = fetch_exchange_rate_from_provider(source_currency, exchanged_currency, valuation_date)
-    if rate_data:
-        return {
-            "source_currency": source_currency,
-            "exchanged_currency": exchanged_currency,
-            "valuation_date": valuation_date,
-            "rate_value": str(rate_data[exchanged_currency[0]])
-        }
+    # 4. Derive it from other rates stored for the same date
+    with timed("db"):
+        cross_rate = get_cross_rate_from_db(source_currency, exchanged_currency, valuation_date)
+    if cross_rate is not None:
+        RATE_LOOKUPS.inc(source="cross_rate")
+        rate_cache.set_derived(source_currency, exchanged_currency, valuation_date, cross_rate, generation)
+        return cross_rate
+    return None
+
+
+def fetch_exchange_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    The Decimal exchange rate from providers, for a rate get_stored_rate_value did not find;
+    None if providers had nothing for it, now or before.
+    """
+    # 5. Fetch from provider if not in DB, unless providers had nothing for it
+    if missing_rates.contains(source_currency, exchanged_currency, valuation_date):
+        RATE_LOOKUPS.inc(source="known_missing")
+        return None
+
+    rate_data = fetch_exchange_rate_coalesced(source_currency, [exchanged_currency], valuation_date)
+    if rate_data and rate_data.get(exchanged_currency) is not None:
+        RATE_LOOKUPS.inc(source="provider")
+        # Same scale as the stored rate_value
+        return Decimal(str(rate_data[exchanged_currency])).quantize(RATE_QUANTUM)
+    if rate_data is not None:
+        missing_rates.add(source_currency, exchanged_currency, valuation_date)
 
+    RATE_LOOKUPS.inc(source="miss")
     return None  # No data found anywhere
+
+
+def prior_rate_query(source_currency: str, exchanged_currency: str, valuation_date, max_staleness_days: int = None):
+    """
+    (valuation_date, rate_value) rows of the latest stored rates of the pair on or before the date,
+    at most max_staleness_days earlier, newest first: `valuation_date <= X ORDER BY valuation_date
+    DESC`, a backward range scan of the unique (source, exchanged, valuation_date) index.
+    """
+    valuation_date = valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)
+    if max_staleness_days is None:
+        max_staleness_days = settings.RATE_AS_OF["MAX_STALENESS_DAYS"]
+    return CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_registry.id_for(source_currency),
+        exchanged_currency_id=currency_registry.id_for(exchanged_currency),
+        valuation_date__lte=valuation_date,
+        valuation_date__gte=valuation_date - timedelta(days=max_staleness_days),
+    ).order_by("-valuation_date").values_list("valuation_date", "rate_value")
+
+
+def get_prior_rate(source_currency: str, exchanged_currency: str, valuation_date, max_staleness_days: int = None):
+    """
+    (valuation_date, rate_value) of the latest date before valuation_date, at most
+    max_staleness_days earlier, the pair has a rate on: stored, or derived from the rates
+    stored that day like on the exact-date path (inverse or through a pivot currency).
+    """
+    valuation_date = valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)
+    if max_staleness_days is None:
+        max_staleness_days = settings.RATE_AS_OF["MAX_STALENESS_DAYS"]
+    prior_rate = prior_rate_query(source_currency, exchanged_currency, valuation_date - timedelta(days=1),
+                                  max_staleness_days - 1).first()
+
+    # Later dates that only have the inverse or a cross rate of the pair
+    ids_by_code = currency_registry.ids_by_code()
+    node_ids = {ids_by_code.get(source_currency), ids_by_code.get(exchanged_currency)}
+    later_dates = CurrencyExchangeRate.objects.filter(
+        Q(source_currency_id__in=node_ids) | Q(exchanged_currency_id__in=node_ids),
+        valuation_date__gt=prior_rate[0] if prior_rate else valuation_date - timedelta(days=max_staleness_days + 1),
+        valuation_date__lt=valuation_date,
+    ).order_by("-valuation_date").values_list("valuation_date", flat=True).distinct()
+    for later_date in later_dates:
+        cross_rate = find_cross_rate(load_rate_graph(later_date, [source_currency, exchanged_currency]),
+                                     source_currency, exchanged_currency)
+        if cross_rate is not None:
+            return later_date, cross_rate
+    return prior_rate
+
+
+def get_exchange_rate_as_of(source_currency: str, exchanged_currency: str, valuation_date, max_staleness_days: int = None):
+    """
+    (effective_date, rate_value) of the rate used for the date: the date's own rate, looked up as
+    usual, else the latest rate at most max_staleness_days (RATE_AS_OF["MAX_STALENESS_DAYS"])
+    earlier (see get_prior_rate). Returns None if there is neither.
+    """
+    rate_value = get_exchange_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is not None:
+        return (valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)), rate_value
+
+    with timed("db"):
+        prior_rate = get_prior_rate(source_currency, exchanged_currency, valuation_date, max_staleness_days)
+    if prior_rate is not None:
+        RATE_LOOKUPS.inc(source="as_of")
+        logger.debug("Rate %s to %s on %s served as of %s", source_currency, exchanged_currency, valuation_date, prior_rate[0])
+    return prior_rate
+
+
+def get_stored_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date, as_of: bool = False):
+    """
+    (effective_date, rate_value) from stored data only, never calling providers, to validate
+    conditional requests with: the date's stored rate, else with as_of the latest earlier one
+    (see get_prior_rate). An as_of fallback is what get_exchange_rate_as_of returns unless a
+    provider still has the date's own rate. Returns None if nothing is stored.
+    """
+    rate_value = get_stored_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is not None:
+        return (valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)), rate_value
+    if as_of:
+        with timed("db"):
+            return get_prior_rate(source_currency, exchanged_currency, valuation_date)
+    return None
+
+
+def get_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date, as_of: bool = False):
+    """
+    Get exchange rate from the rate cache or DB if available, else fetch from provider.
+    With as_of, a date without a rate falls back to the latest earlier rate (see
+    get_exchange_rate_as_of); valuation_date is then the date of the rate used.
+    """
+    if as_of:
+        resolved = get_exchange_rate_as_of(source_currency, exchanged_currency, valuation_date)
+        if resolved is None:
+            return None
+        effective_date, rate_value = resolved
+    else:
+        effective_date = valuation_date
+        rate_value = get_exchange_rate_value(source_currency, exchanged_currency, valuation_date)
+        if rate_value is None:
+            return None
+    return {
+        "source_currency": source_currency,
+        "exchanged_currency": exchanged_currency,
+        "valuation_date": effective_date,
+        "rate_value": str(rate_value)
+    }
+
+
+def get_exchange_rates_bulk(rate_keys) -> dict:
+    """
+    Resolve many (source_currency, exchanged_currency, valuation_date) keys at once.
+    Cached and archived rates are served first, the rest is looked up with a single grouped DB query,
+    then taken from archived inverse rates or derived by triangulation, and whatever is still missing is fetched from providers
+    with one call per source/date.
+    Returns a dict mapping each resolved key to its Decimal rate.
+    """
+    rates = {}
+    missing = set()
+    for key in set(rate_keys):
+        cached_rate = rate_cache.get(*key)
+        if cached_rate is not None:
+            rates[key] = cached_rate
+        else:
+            missing.add(key)
+    generations = {valuation_date: rate_cache.generation(valuation_date) for _, _, valuation_date in missing}
+
+    if missing and rate_archive.loaded:
+        for rate_key in list(missing):
+            rate_value = rate_archive.rate(*rate_key, inverse=False)
+            if rate_value is not None:
+                rates[rate_key] = rate_value
+                rate_cache.set(*rate_key, rate_value, generations[rate_key[2]])
+                missing.discard(rate_key)
+
+    if missing and rate_matrix_store.enabled:
+        for rate_key in list(missing):
+            rate_value = rate_matrix_store.rate(*rate_key)
+            if rate_value is not None:
+                rates[rate_key] = rate_value
+                rate_cache.set(*rate_key, rate_value, generations[rate_key[2]])
+                missing.discard(rate_key)
+
+    elif missing:
+        with timed("db"):
+            ids_by_code = currency_registry.ids_by_code()
+            codes_by_id = currency_registry.codes_by_id()
+            stored_rates = CurrencyExchangeRate.objects.filter(
+                source_currency_id__in={ids_by_code.get(source) for source, _, _ in missing},
+                exchanged_currency_id__in={ids_by_code.get(exchanged) for _, exchanged, _ in missing},
+                valuation_date__in={valuation_date for _, _, valuation_date in missing},
+            ).values_list("source_currency_id", "exchanged_currency_id", "valuation_date", "rate_value")
+
+            for source_id, exchanged_id, valuation_date, rate_value in stored_rates:
+                rate_key = (codes_by_id.get(source_id), codes_by_id.get(exchanged_id), valuation_date)
+                if rate_key in missing:
+                    rates[rate_key] = rate_value
+                    rate_cache.set(*rate_key, rate_value, generations[rate_key[2]])
+                    missing.discard(rate_key)
+
+    if missing and rate_archive.loaded:
+        for rate_key in list(missing):
+            rate_value = rate_archive.rate(*rate_key)
+            if rate_value is not None:
+                rates[rate_key] = rate_value
+                rate_cache.set(*rate_key, rate_value, generations[rate_key[2]])
+                missing.discard(rate_key)
+
+    # Derive cross rates with one graph load per valuation date
+    missing_by_date = defaultdict(set)
+    for rate_key in missing:
+        missing_by_date[rate_key[2]].add(rate_key)
+
+    for valuation_date, date_keys in missing_by_date.items():
+        graph = load_rate_graph(valuation_date, {code for key in date_keys for code in key[:2]})
+        for rate_key in date_keys:
+            cross_rate = find_cross_rate(graph, rate_key[0], rate_key[1])
+            if cross_rate is not None:
+                rates[rate_key] = cross_rate
+                rate_cache.set_derived(*rate_key, cross_rate, generations[valuation_date])
+                missing.discard(rate_key)
+
+    # Group what is left per source/date so each provider call covers all symbols,
+    # skipping what providers had nothing for
+    provider_calls = defaultdict(set)
+    for source_currency, exchanged_currency, valuation_date in missing:
+        if not missing_rates.contains(source_currency, exchanged_currency, valuation_date):
+            provider_calls[(source_currency, valuation_date)].add(exchanged_currency)
+
+    for (source_currency, valuation_date), exchanged_currencies in provider_calls.items():
+        rate_data = fetch_exchange_rate_coalesced(source_currency, sorted(exchanged_currencies), valuation_date)
+        for exchanged_currency in exchanged_currencies:
+            if rate_data and rate_data.get(exchanged_currency) is not None:
+                # Same scale as the stored rate_value, as in get_exchange_rate_value
+                rates[(source_currency, exchanged_currency, valuation_date)] = Decimal(
+                    str(rate_data[exchanged_currency])
+                ).quantize(RATE_QUANTUM)
+            elif rate_data is not None:
+                missing_rates.add(source_currency, exchanged_currency, valuation_date)
+
+    return rates
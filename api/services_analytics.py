@@ -0,0 +1,137 @@
+from api.models import CurrencyExchangeRate
+from api.currency_registry import currency_registry
+from api.metrics import timed
+from api.rate_matrix import RATE_QUANTUM
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Min
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger("currency_app")
+
+INTERVALS = ("day", "week", "month")
+PERCENT_QUANTUM = Decimal("0.0001")
+
+
+def period_start(valuation_date, interval: str):
+    """
+    First day of the day/week (ISO, Monday)/month period containing the date.
+    """
+    if interval == "week":
+        return valuation_date - timedelta(days=valuation_date.weekday())
+    if interval == "month":
+        return valuation_date.replace(day=1)
+    return valuation_date
+
+
+def percent_change(old: Decimal, new: Decimal):
+    if not old:
+        return None
+    return str(((new - old) / old * 100).quantize(PERCENT_QUANTUM))
+
+
+def _rate(value: Decimal) -> str:
+    return str(value.quantize(RATE_QUANTUM))
+
+
+def _rates_query(source_currency: str, start_date: str, end_date: str, symbols=None):
+    rates = CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_registry.id_for(source_currency),
+        valuation_date__range=[start_date, end_date],
+    )
+    if symbols:
+        ids_by_code = currency_registry.ids_by_code()
+        rates = rates.filter(exchanged_currency_id__in=[ids_by_code[code] for code in symbols if code in ids_by_code])
+    return rates
+
+
+def get_rate_summary(source_currency: str, start_date: str, end_date: str, symbols=None) -> dict:
+    """
+    min/max/mean/count per exchanged currency, aggregated by the database in one query.
+    """
+    codes_by_id = currency_registry.codes_by_id()
+    aggregates = _rates_query(source_currency, start_date, end_date, symbols).values("exchanged_currency_id").annotate(
+        low=Min("rate_value"), high=Max("rate_value"), mean=Avg("rate_value"), count=Count("id"),
+    )
+    return {
+        codes_by_id[row["exchanged_currency_id"]]: {
+            "min": _rate(row["low"]),
+            "max": _rate(row["high"]),
+            "mean": _rate(Decimal(str(row["mean"]))),
+            "count": row["count"],
+        }
+        for row in aggregates
+    }
+
+
+@timed("db")
+def get_time_series_analytics(source_currency: str, start_date: str, end_date: str, symbols=None,
+                              interval: str = "day", moving_average: int = None) -> dict:
+    """
+    Reduce the stored time series of a source currency to, per exchanged currency:
+    a summary (min/max/mean from the database, first/last and percent change over the range),
+    OHLC bars resampled to the interval with the percent change of each close, and optionally
+    the moving average of the closes over `moving_average` periods.
+    Rows are read once in date order from a server-side iterator and never materialized.
+    Only stored rates are used; nothing is fetched from providers.
+    """
+    summary = get_rate_summary(source_currency, start_date, end_date, symbols)
+    if not summary:
+        return None
+
+    codes_by_id = currency_registry.codes_by_id()
+    rows = _rates_query(source_currency, start_date, end_date, symbols).order_by("valuation_date").values_list(
+        "valuation_date", "exchanged_currency_id", "rate_value",
+    )
+
+    bars = {code: [] for code in summary}
+    for valuation_date, exchanged_currency_id, rate_value in rows.iterator(chunk_size=settings.TIME_SERIES_STREAM_CHUNK_SIZE):
+        period = period_start(valuation_date, interval)
+        currency_bars = bars[codes_by_id[exchanged_currency_id]]
+        if currency_bars and currency_bars[-1][0] == period:
+            bar = currency_bars[-1]
+            bar[2] = max(bar[2], rate_value)
+            bar[3] = min(bar[3], rate_value)
+            bar[4] = rate_value
+        else:
+            currency_bars.append([period, rate_value, rate_value, rate_value, rate_value])
+
+    currencies = {}
+    for code, currency_bars in bars.items():
+        first, last = currency_bars[0][1], currency_bars[-1][4]
+        series = []
+        window, window_sum = deque(), Decimal(0)
+        previous_close = None
+        for period, open_rate, high, low, close in currency_bars:
+            point = {
+                "period": period.strftime("%Y-%m-%d"),
+                "open": _rate(open_rate),
+                "high": _rate(high),
+                "low": _rate(low),
+                "close": _rate(close),
+                "change_pct": percent_change(previous_close, close),
+            }
+            if moving_average:
+                window.append(close)
+                window_sum += close
+                if len(window) > moving_average:
+                    window_sum -= window.popleft()
+                point["moving_average"] = _rate(window_sum / moving_average) if len(window) == moving_average else None
+            series.append(point)
+            previous_close = close
+
+        currencies[code] = {
+            "summary": dict(summary[code], first=_rate(first), last=_rate(last), change_pct=percent_change(first, last)),
+            "series": series,
+        }
+
+    logger.debug("Time series analytics for %s: %s currencies, interval %s", source_currency, len(currencies), interval)
+    return {
+        "source_currency": source_currency,
+        "start_date": start_date,
+        "end_date": end_date,
+        "interval": interval,
+        "currencies": currencies,
+    }
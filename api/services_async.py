@@ -0,0 +1,364 @@
+from api.models import CurrencyExchangeRate
+from api.adapters.adapter_factory import AdapterFactory, TimeSeriesAdapterFactory
+from api.adapters.transport import MAX_CONCURRENCY, split_date_range
+from api.dispatcher import ProviderSkipped, asequential_calls, hedged_call
+from api.missing_rates import missing_rates
+from api.rate_cache import rate_cache
+from api.currency_registry import currency_registry
+from api.rate_matrix import RATE_QUANTUM, rate_matrix_store
+from api.rate_archive import rate_archive
+from api.services import get_cross_rate_from_db, get_prior_rate, store_exchange_rate
+from api.services_time_series import (
+    fill_as_of, filter_rate_data, get_time_series_from_archive, get_time_series_from_matrix, known_missing,
+    matrix_covers, ranges_to_fetch, rates_to_store, remember_empty_dates, store_time_series,
+)
+from api.singleflight import single_flight
+from api.metrics import RATE_LOOKUPS, timed
+from providers.models import Provider
+from providers.health import route_providers
+from providers.quota import quota_manager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from datetime import date
+from decimal import Decimal
+import asyncio
+import logging
+
+logger = logging.getLogger("currency_app")
+
+# Asyncio variants of the lookups in api.services and api.services_time_series, used by the
+# async views. Queries go through the async ORM and provider calls through the adapters' async
+# methods, so a request waiting on a provider does not hold a thread. Lookups that load a whole
+# date or window into memory (rate matrix, cross rates) and the upserts run in the ORM's thread.
+
+
+async def _active_providers(cost=None) -> list:
+    return route_providers(
+        [provider async for provider in Provider.objects.filter(active=True).order_by("priority")], cost=cost,
+    )
+
+
+async def aget_exchange_rate_from_db(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    The stored rate_value of a pair on a date, or None.
+    """
+    source_currency_id = currency_registry.id_for(source_currency)
+    exchanged_currency_id = currency_registry.id_for(exchanged_currency)
+    if source_currency_id is None or exchanged_currency_id is None:
+        logger.warning("Unknown currency in %s to %s", source_currency, exchanged_currency)
+        return None
+
+    return await CurrencyExchangeRate.objects.filter(
+        source_currency_id=source_currency_id,
+        exchanged_currency_id=exchanged_currency_id,
+        valuation_date=valuation_date,
+    ).values_list("rate_value", flat=True).afirst()
+
+
+async def afetch_exchange_rate_from_provider(source_currency: str, exchanged_currencies: list, valuation_date):
+    """
+    Asyncio variant of fetch_exchange_rate_from_provider. Providers without multi-symbol
+    support are called for every exchanged currency concurrently.
+    """
+    answered, failed = [], []
+
+    def call_cost(provider):
+        return 1 if AdapterFactory.get_capabilities(provider.name).multi_symbol else len(exchanged_currencies)
+
+    async def call_provider(provider):
+        adapter = AdapterFactory.get_adapter(provider.name)
+        capabilities = AdapterFactory.get_capabilities(provider.name)
+        if not adapter or not capabilities.point_rate:
+            raise ProviderSkipped(f"{provider.name} has no point_rate support")
+
+        async def fetch():
+            if capabilities.multi_symbol:
+                return await adapter.aget_exchange_rate(source_currency, exchanged_currencies, valuation_date)
+
+            answers = await asyncio.gather(*(
+                adapter.aget_exchange_rate(source_currency, code, valuation_date) for code in exchanged_currencies
+            ))
+            rates = {code: answer.get("rate") for code, answer in zip(exchanged_currencies, answers)}
+            return {code: rate_value for code, rate_value in rates.items() if rate_value is not None}
+
+        try:
+            rate_data = await quota_manager.acall(provider, call_cost(provider), fetch, capabilities)
+        except Exception:
+            failed.append(provider.name)
+            raise
+        answered.append(provider.name)
+        return rate_data
+
+    async def store(provider, rate_data):
+        logger.info("Exchange rates fetched from %s: %s currencies", provider.name, len(rate_data))
+        await sync_to_async(store_exchange_rate)(source_currency, exchanged_currencies, valuation_date, rate_data)
+        return rate_data
+
+    try:
+        providers = await _active_providers(cost=call_cost)
+
+        if settings.PROVIDER_DISPATCH["MODE"] == "hedged":
+            provider, rate_data = await hedged_call(providers, call_provider)
+            if rate_data:
+                return await store(provider, rate_data)
+        else:
+            async for provider, rate_data in asequential_calls(providers, call_provider):
+                if rate_data:
+                    return await store(provider, rate_data)
+
+        logger.warning("No exchange rates found from providers for %s to %s on %s", source_currency, exchanged_currencies, valuation_date)
+        return {} if answered and not failed else None
+
+    except Exception as e:
+        logger.error("Error fetching exchange rate from providers: %s", e)
+        return None
+
+
+async def afetch_exchange_rate_coalesced(source_currency: str, exchanged_currencies: list, valuation_date):
+    """
+    Share one in-flight provider fetch between concurrent misses on the same event loop.
+    Cross-process leases are not taken: waiting for one would block the loop.
+    """
+    key = f"rate:{source_currency}:{','.join(sorted(exchanged_currencies))}:{valuation_date}"
+    return await single_flight.ado(
+        key, lambda: afetch_exchange_rate_from_provider(source_currency, exchanged_currencies, valuation_date),
+    )
+
+
+async def aget_exchange_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    Asyncio variant of get_exchange_rate_value, with the same lookup order.
+    """
+    rate_value = await aget_stored_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is None:
+        rate_value = await afetch_exchange_rate_value(source_currency, exchanged_currency, valuation_date)
+    return rate_value
+
+
+async def aget_stored_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    Asyncio variant of get_stored_rate_value.
+    """
+    await currency_registry.aload()
+
+    # 1. Check the in-process rate cache
+    cached_rate = rate_cache.get(source_currency, exchanged_currency, valuation_date)
+    if cached_rate is not None:
+        RATE_LOOKUPS.inc(source="cache")
+        return cached_rate
+    generation = rate_cache.generation(valuation_date)
+
+    # 2. Check the memory-mapped archive of historical rates (inverses only after the DB's own rows)
+    archived_rate = rate_archive.rate(source_currency, exchanged_currency, valuation_date, inverse=False)
+    if archived_rate is not None:
+        RATE_LOOKUPS.inc(source="archive")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, archived_rate, generation)
+        return archived_rate
+
+    # 3. Check the database (through the in-memory rate matrix if enabled)
+    with timed("db"):
+        if rate_matrix_store.enabled:
+            existing_rate_value = await sync_to_async(rate_matrix_store.rate)(
+                source_currency, exchanged_currency, valuation_date
+            )
+        else:
+            existing_rate_value = await aget_exchange_rate_from_db(source_currency, exchanged_currency, valuation_date)
+
+    if existing_rate_value is not None:
+        RATE_LOOKUPS.inc(source="db")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, existing_rate_value, generation)
+        return existing_rate_value
+
+    archived_rate = rate_archive.rate(source_currency, exchanged_currency, valuation_date)
+    if archived_rate is not None:
+        RATE_LOOKUPS.inc(source="archive")
+        rate_cache.set(source_currency, exchanged_currency, valuation_date, archived_rate, generation)
+        return archived_rate
+
+    # 4. Derive it from other rates stored for the same date
+    with timed("db"):
+        cross_rate = await sync_to_async(get_cross_rate_from_db)(source_currency, exchanged_currency, valuation_date)
+    if cross_rate is not None:
+        RATE_LOOKUPS.inc(source="cross_rate")
+        rate_cache.set_derived(source_currency, exchanged_currency, valuation_date, cross_rate, generation)
+        return cross_rate
+    return None
+
+
+async def afetch_exchange_rate_value(source_currency: str, exchanged_currency: str, valuation_date):
+    """
+    Asyncio variant of fetch_exchange_rate_value.
+    """
+    # 5. Fetch from providers, unless they had nothing for it
+    if await missing_rates.acontains(source_currency, exchanged_currency, valuation_date):
+        RATE_LOOKUPS.inc(source="known_missing")
+        return None
+
+    rate_data = await afetch_exchange_rate_coalesced(source_currency, [exchanged_currency], valuation_date)
+    if rate_data and rate_data.get(exchanged_currency) is not None:
+        RATE_LOOKUPS.inc(source="provider")
+        return Decimal(str(rate_data[exchanged_currency])).quantize(RATE_QUANTUM)
+    if rate_data is not None:
+        await missing_rates.aadd(source_currency, exchanged_currency, valuation_date)
+
+    RATE_LOOKUPS.inc(source="miss")
+    return None
+
+
+async def aget_stored_exchange_rate(source_currency: str, exchanged_currency: str, valuation_date, as_of: bool = False):
+    """
+    Asyncio variant of get_stored_exchange_rate.
+    """
+    rate_value = await aget_stored_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is not None:
+        return (valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)), rate_value
+    if as_of:
+        with timed("db"):
+            return await sync_to_async(get_prior_rate)(source_currency, exchanged_currency, valuation_date)
+    return None
+
+
+async def aget_exchange_rate_as_of(source_currency: str, exchanged_currency: str, valuation_date,
+                                   max_staleness_days: int = None):
+    """
+    Asyncio variant of get_exchange_rate_as_of.
+    """
+    rate_value = await aget_exchange_rate_value(source_currency, exchanged_currency, valuation_date)
+    if rate_value is not None:
+        return (valuation_date if isinstance(valuation_date, date) else date.fromisoformat(valuation_date)), rate_value
+
+    with timed("db"):
+        prior_rate = await sync_to_async(get_prior_rate)(source_currency, exchanged_currency, valuation_date, max_staleness_days)
+    if prior_rate is not None:
+        RATE_LOOKUPS.inc(source="as_of")
+    return prior_rate
+
+
+async def aget_time_series_from_db(source_currency: str, start_date: str, end_date: str):
+    """
+    Asyncio variant of get_time_series_from_db; the rows are read with async iteration.
+    """
+    with timed("db"):
+        if rate_archive.covers(start_date, end_date):
+            return get_time_series_from_archive(source_currency, start_date, end_date)
+        if matrix_covers(start_date, end_date):
+            return await sync_to_async(get_time_series_from_matrix)(source_currency, start_date, end_date)
+
+        codes_by_id = currency_registry.codes_by_id()
+        rates = CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_registry.id_for(source_currency),
+            valuation_date__range=[start_date, end_date],
+        ).order_by("valuation_date").values_list("valuation_date", "exchanged_currency_id", "rate_value")
+
+        time_series_data = {}
+        async for valuation_date, exchanged_currency_id, rate_value in rates:
+            date_str = valuation_date.strftime("%Y-%m-%d")
+            time_series_data.setdefault(date_str, {})[codes_by_id[exchanged_currency_id]] = str(rate_value)
+
+    if not time_series_data:
+        return None
+    return {
+        "source_currency": source_currency,
+        "start_date": start_date,
+        "end_date": end_date,
+        "rates": time_series_data,
+    }
+
+
+async def afetch_time_series_from_provider(source_currency: str, start_date: str, end_date: str):
+    """
+    Asyncio variant of fetch_time_series_from_provider; the chunks of a range are awaited
+    concurrently, at most the transport's max_concurrency at a time.
+    """
+    answered, failed = [], []
+
+    async def call_provider(provider):
+        adapter = TimeSeriesAdapterFactory.get_time_series_adapter(provider.name)
+        capabilities = AdapterFactory.get_capabilities(provider.name)
+        if not adapter or not capabilities.time_series:
+            raise ProviderSkipped(f"{provider.name} has no time_series support")
+
+        chunks = split_date_range(start_date, end_date, capabilities.max_time_series_days)
+
+        async def fetch():
+            time_series = {}
+            for rates in await adapter.transport.asynchronous.map(
+                lambda chunk: adapter.aget_time_series(source_currency, *chunk), chunks,
+            ):
+                time_series.update(rates)
+            return time_series
+
+        try:
+            time_series = await quota_manager.acall(provider, len(chunks), fetch, capabilities)
+        except Exception:
+            failed.append(provider.name)
+            raise
+        answered.append(provider.name)
+        return time_series
+
+    try:
+        providers = await _active_providers()
+        if settings.PROVIDER_DISPATCH["MODE"] == "hedged":
+            _, rate_data = await hedged_call(providers, call_provider)
+            if rate_data:
+                return rate_data
+        else:
+            async for provider, rate_data in asequential_calls(providers, call_provider):
+                if rate_data:
+                    return rate_data
+    except Exception as e:
+        logger.error("Error fetching from providers: %s", e)
+    return {} if answered and not failed else None
+
+
+async def afetch_time_series_coalesced(source_currency: str, start_date: str, end_date: str):
+    """
+    Share one in-flight provider fetch of a range between concurrent requests on the same event loop.
+    """
+    key = f"timeseries:{source_currency}:{start_date}:{end_date}"
+    return await single_flight.ado(
+        key, lambda: afetch_time_series_from_provider(source_currency, start_date, end_date),
+    )
+
+
+async def afetch_time_series_data(source_currency: str, start_date: str, end_date: str, as_of: bool = False) -> dict:
+    """
+    Asyncio variant of fetch_time_series_data: the stored window, completed from providers for
+    the missing sub-ranges, which are fetched concurrently, at most PROVIDER_MAX_CONCURRENCY at a time.
+    """
+    await currency_registry.aload()
+    existing_rates = await aget_time_series_from_db(source_currency, start_date, end_date)
+    stored_rates = existing_rates["rates"] if existing_rates else {}
+
+    is_known_missing = await sync_to_async(known_missing)(source_currency, start_date, end_date)
+    missing_ranges = await sync_to_async(ranges_to_fetch)(stored_rates, start_date, end_date, is_known_missing)
+    stored_count = 0
+    if missing_ranges:
+        logger.info("Time series of %s missing in DB for %s ranges, fetching from provider...", source_currency, len(missing_ranges))
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def fetch_range(range_start, range_end):
+        async with semaphore:
+            return await afetch_time_series_coalesced(source_currency, range_start, range_end)
+
+    fetched = await asyncio.gather(*(fetch_range(range_start, range_end) for range_start, range_end in missing_ranges))
+    for (range_start, range_end), rate_data in zip(missing_ranges, fetched):
+        filtered_rate_data = filter_rate_data(source_currency, rate_data) if rate_data else {}
+        delta = rates_to_store(stored_rates, range_start, range_end, filtered_rate_data)
+        if delta:
+            await sync_to_async(store_time_series)(source_currency, range_start, range_end, delta)
+            stored_count += sum(len(currencies) for currencies in delta.values())
+        # After storing, which forgets what was recorded missing for the stored dates
+        if rate_data is not None:
+            await sync_to_async(remember_empty_dates)(source_currency, range_start, range_end, filtered_rate_data, stored_rates)
+
+    if stored_count:
+        existing_rates = await aget_time_series_from_db(source_currency, start_date, end_date)
+
+    time_series = existing_rates or {
+        "source_currency": source_currency,
+        "start_date": start_date,
+        "end_date": end_date,
+        "rates": {},
+    }
+    return await sync_to_async(fill_as_of)(time_series) if as_of else time_series
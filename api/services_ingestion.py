@@ -0,0 +1,89 @@
+from api.models import CurrencyExchangeRate
+from api.missing_rates import missing_rates
+from api.rate_cache import rate_cache
+from api.rate_matrix import rate_matrix_store
+from api.rate_archive import rate_archive
+from api.currency_registry import currency_registry
+from api.metrics import timed
+from django.conf import settings
+from django.db import transaction
+import logging
+from datetime import date, datetime
+
+logger = logging.getLogger("currency_app")
+
+UNIQUE_FIELDS = ["source_currency", "exchanged_currency", "valuation_date"]
+
+
+def _to_date(valuation_date):
+    if isinstance(valuation_date, date):
+        return valuation_date
+    return datetime.strptime(valuation_date, "%Y-%m-%d").date()
+
+
+@timed("store")
+def bulk_store_rates(source_currency_code: str, rows, batch_size: int = None) -> int:
+    """
+    Upsert exchange rates for one source currency in batches inside a single transaction.
+    `rows` is an iterable of (valuation_date, exchanged_currency_code, rate_value).
+    Unknown currencies are logged and skipped. Returns the number of rows written.
+    """
+    batch_size = batch_size or settings.RATE_INGESTION_BATCH_SIZE
+    currency_ids = currency_registry.ids_by_code()
+
+    source_currency_id = currency_ids.get(source_currency_code)
+    if source_currency_id is None:
+        logger.error("Error storing exchange rates: source currency %s not found in DB.", source_currency_code)
+        return 0
+
+    written = 0
+    pending = []
+    stored_codes = set()
+    stored_dates = set()
+    skipped_codes = set()
+    matrix_rows = [] if rate_matrix_store.enabled else None
+
+    def flush():
+        CurrencyExchangeRate.objects.bulk_create(
+            pending,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=UNIQUE_FIELDS,
+            update_fields=["rate_value", "updated_at"],
+        )
+        pending.clear()
+
+    with transaction.atomic():
+        for valuation_date, exchanged_currency_code, rate_value in rows:
+            exchanged_currency_id = currency_ids.get(exchanged_currency_code)
+            if exchanged_currency_id is None:
+                skipped_codes.add(exchanged_currency_code)
+                continue
+
+            valuation_date = _to_date(valuation_date)
+            pending.append(CurrencyExchangeRate(
+                source_currency_id=source_currency_id,
+                exchanged_currency_id=exchanged_currency_id,
+                valuation_date=valuation_date,
+                rate_value=rate_value,
+            ))
+            stored_codes.add(exchanged_currency_code)
+            stored_dates.add(valuation_date)
+            if matrix_rows is not None:
+                matrix_rows.append((valuation_date, exchanged_currency_code, rate_value))
+            written += 1
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+
+    for exchanged_currency_code in skipped_codes:
+        logger.warning("Skipping %s: Currency not found in DB.", exchanged_currency_code)
+
+    rate_cache.invalidate(source_currency_code, stored_codes, stored_dates)
+    missing_rates.forget(source_currency_code, stored_codes, stored_dates)
+    rate_archive.invalidate(stored_dates)
+    if matrix_rows:
+        rate_matrix_store.apply(source_currency_code, matrix_rows)
+    logger.info("Stored %s exchange rates in DB for %s", written, source_currency_code)
+    return written
@@ -1,47 +1,277 @@
-from api.models import CurrencyExchangeRate, Currency
-from api.adapters.adapter_factory import TimeSeriesAdapterFactory
+from api.models import CurrencyExchangeRate
+from api.adapters.adapter_factory import AdapterFactory, TimeSeriesAdapterFactory
+from api.adapters.transport import split_date_range
+from api.dispatcher import ProviderSkipped, dispatch, sequential_calls
+from api.services_ingestion import bulk_store_rates
+from api.rate_matrix import rate_matrix_store
+from api.rate_archive import rate_archive
+from api.missing_rates import missing_rates
+from api.currency_registry import currency_registry
+from api.singleflight import single_flight, process_lease
+from api.metrics import timed
 from providers.models import Provider
-from django.utils.timezone import now
+from providers.health import route_providers
+from providers.quota import quota_manager
+from currency_exchange.db_router import primary_reads
+from django.conf import settings
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 logger = logging.getLogger("currency_app")
 
-def fetch_time_series_data(source_currency: str, start_date: str, end_date: str) -> dict:
+# Days of the week providers publish no rates for (Saturday, Sunday)
+WEEKEND = (5, 6)
+
+def fetch_time_series_data(source_currency: str, start_date: str, end_date: str, as_of: bool = False) -> dict:
     """
-    Fetches time series exchange rates from DB or provider and filters them based on available currencies.
+    Fetches time series exchange rates from DB, completes the missing dates from the provider
+    and filters them based on available currencies. Only the missing sub-ranges are requested
+    from providers (see ranges_to_fetch) and only the missing rates are stored. Dates providers
+    had no rates for (weekends, holidays) are not requested again. With as_of, dates
+    without rates get those of the latest earlier date (see fill_as_of).
     """
     existing_rates = get_time_series_from_db(source_currency, start_date, end_date)
-    if existing_rates:
-        return existing_rates
-    
-    logger.info(f"Time series not found in DB, fetching from provider...")
-    rate_data = fetch_time_series_from_provider(source_currency, start_date, end_date)
-    filtered_rate_data = filter_rate_data(source_currency, rate_data) if rate_data else {}
-    if filtered_rate_data:
-        store_time_series(source_currency, start_date, end_date, filtered_rate_data)
+    stored_rates = existing_rates["rates"] if existing_rates else {}
 
-    return {
+    missing_ranges = ranges_to_fetch(stored_rates, start_date, end_date, known_missing(source_currency, start_date, end_date))
+
+    stored_count = 0
+    for range_start, range_end in missing_ranges:
+        logger.info("Time series missing in DB from %s to %s, fetching from provider...", range_start, range_end)
+        rate_data = fetch_time_series_coalesced(source_currency, range_start, range_end)
+        filtered_rate_data = filter_rate_data(source_currency, rate_data) if rate_data else {}
+
+        delta = rates_to_store(stored_rates, range_start, range_end, filtered_rate_data)
+        if delta:
+            store_time_series(source_currency, range_start, range_end, delta)
+            stored_count += sum(len(currencies) for currencies in delta.values())
+        # After storing, which forgets what was recorded missing for the stored dates
+        if rate_data is not None:
+            remember_empty_dates(source_currency, range_start, range_end, filtered_rate_data, stored_rates)
+
+    if stored_count:
+        existing_rates = get_time_series_from_db(source_currency, start_date, end_date)
+
+    time_series = existing_rates or {
         "source_currency": source_currency,
         "start_date": start_date,
         "end_date": end_date,
-        "rates": filtered_rate_data,
+        "rates": {},
     }
+    return fill_as_of(time_series) if as_of else time_series
+
+def known_missing(source_currency: str, start_date: str, end_date: str):
+    """
+    `is_known_missing(date_str, currency=None)` for find_missing_ranges, answered by the rates
+    recorded missing for the window.
+    """
+    return missing_rates.window(source_currency, start_date, end_date)
+
+def remember_empty_dates(source_currency: str, range_start: str, range_end: str, fetched_rates: dict, stored_rates=None):
+    """
+    Mark the dates of a range providers answered without rates for, and on the other dates the
+    currencies of the stored window they answered without, so they are not requested again.
+    """
+    stored_rates = stored_rates or {}
+    expected_currencies = set().union(*stored_rates.values()) if stored_rates else set()
+    current = date.fromisoformat(range_start)
+    last = date.fromisoformat(range_end)
+    empty = []
+    while current <= last:
+        date_str = current.isoformat()
+        fetched = fetched_rates.get(date_str, {})
+        if not fetched and date_str not in stored_rates:
+            empty.append((None, current))
+        else:
+            for currency in expected_currencies - fetched.keys() - stored_rates.get(date_str, {}).keys():
+                empty.append((currency, current))
+        current += timedelta(days=1)
+    missing_rates.add_many(source_currency, empty)
+
+def latest_rate_date(source_currency: str, until, since):
+    """
+    The latest date in [since, until] with rates of the source currency, from a backward scan
+    of the (source, valuation_date) index.
+    """
+    return CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_registry.id_for(source_currency),
+        valuation_date__lte=until,
+        valuation_date__gte=since,
+    ).order_by("-valuation_date").values_list("valuation_date", flat=True).first()
+
+def fill_as_of(time_series: dict, max_staleness_days: int = None) -> dict:
+    """
+    Give every date of the window without rates the rates of the latest earlier date with rates,
+    at most max_staleness_days (RATE_AS_OF["MAX_STALENESS_DAYS"]) before it; rates from before
+    the window are looked up in the DB. "effective_dates" maps the filled dates to the date
+    their rates are from.
+    """
+    if max_staleness_days is None:
+        max_staleness_days = settings.RATE_AS_OF["MAX_STALENESS_DAYS"]
+    staleness = timedelta(days=max_staleness_days)
+    source_currency, rates = time_series["source_currency"], time_series["rates"]
+    current = date.fromisoformat(time_series["start_date"])
+    last = date.fromisoformat(time_series["end_date"])
+
+    previous_date = previous_rates = None
+    if time_series["start_date"] not in rates:
+        previous_date = latest_rate_date(source_currency, current - timedelta(days=1), current - staleness)
+        if previous_date is not None:
+            previous_day = previous_date.isoformat()
+            previous_rates = (get_time_series_from_db(source_currency, previous_day, previous_day) or {"rates": {}})["rates"].get(previous_day)
+
+    filled_rates, effective_dates = {}, {}
+    while current <= last:
+        date_str = current.isoformat()
+        if date_str in rates:
+            previous_date, previous_rates = current, rates[date_str]
+            filled_rates[date_str] = previous_rates
+        elif previous_rates and current - previous_date <= staleness:
+            filled_rates[date_str] = previous_rates
+            effective_dates[date_str] = previous_date.isoformat()
+        current += timedelta(days=1)
+    return dict(time_series, rates=filled_rates, effective_dates=effective_dates)
+
+def rates_to_store(stored_rates: dict, range_start: str, range_end: str, fetched_rates: dict) -> dict:
+    """
+    Keep only the fetched rates of the range that are not stored yet.
+    """
+    delta = {}
+    for date_str, currencies in fetched_rates.items():
+        if not range_start <= date_str <= range_end:
+            continue
+        missing_currencies = {
+            cur: rate for cur, rate in currencies.items() if cur not in stored_rates.get(date_str, {})
+        }
+        if missing_currencies:
+            delta[date_str] = missing_currencies
+    return delta
+
+def fetch_time_series_coalesced(source_currency: str, start_date: str, end_date: str):
+    """
+    Fetch a time series range from providers, sharing one in-flight fetch between concurrent
+    requests for the same range (across threads, and across worker processes when leases are enabled).
+    """
+    key = f"timeseries:{source_currency}:{start_date}:{end_date}"
+
+    def fetch():
+        with process_lease(key) as waited:
+            if waited:
+                # Another worker held the lease and has probably stored the range meanwhile,
+                # on the primary; the read alias may not have it yet
+                with primary_reads():
+                    stored = get_time_series_from_db(source_currency, start_date, end_date)
+                if stored and not find_missing_ranges(stored["rates"], start_date, end_date):
+                    return stored["rates"]
+            return fetch_time_series_from_provider(source_currency, start_date, end_date)
+
+    return single_flight.do(key, fetch)
+
+def find_missing_ranges(stored_rates: dict, start_date: str, end_date: str, is_known_missing=None) -> list:
+    """
+    Return the contiguous (start, end) date ranges of the window that need provider data.
+    A date is missing when it has no rates, or lacks a currency stored on other dates of the window,
+    unless `is_known_missing(date_str)` (or `is_known_missing(date_str, currency)` for each lacking
+    currency) says providers have nothing for it.
+    """
+    expected_currencies = set().union(*stored_rates.values()) if stored_rates else set()
+    current = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last = datetime.strptime(end_date, "%Y-%m-%d").date()
 
+    missing_ranges = []
+    range_start = range_end = None
+    while current <= last:
+        date_str = current.strftime("%Y-%m-%d")
+        currencies = stored_rates.get(date_str)
+        if not currencies:
+            missing = not (is_known_missing and is_known_missing(date_str))
+        else:
+            missing = any(
+                not (is_known_missing and is_known_missing(date_str, currency))
+                for currency in expected_currencies.difference(currencies)
+            )
+        if missing:
+            if range_start is None:
+                range_start = date_str
+            range_end = date_str
+        elif range_start is not None:
+            missing_ranges.append((range_start, range_end))
+            range_start = None
+        current += timedelta(days=1)
+
+    if range_start is not None:
+        missing_ranges.append((range_start, range_end))
+    return missing_ranges
+
+def ranges_to_fetch(stored_rates: dict, start_date: str, end_date: str, is_known_missing=None) -> list:
+    """
+    The (start, end) ranges to request from providers to complete the window: its missing ranges
+    (see find_missing_ranges) without the weekends between stored dates, merged into spans of at
+    most provider_chunk_days() days, so a window with many gaps costs one request per chunk
+    rather than one per gap. Stored dates inside a span are fetched again but not stored.
+    """
+    missing_ranges = [
+        (range_start, range_end)
+        for range_start, range_end in find_missing_ranges(stored_rates, start_date, end_date, is_known_missing)
+        if not (stored_rates and is_weekend_gap(stored_rates, range_start, range_end))
+    ]
+    if len(missing_ranges) < 2:
+        return missing_ranges
+
+    max_days = provider_chunk_days()
+    spans = [missing_ranges[0]]
+    for range_start, range_end in missing_ranges[1:]:
+        span_start = spans[-1][0]
+        if max_days is None or (date.fromisoformat(range_end) - date.fromisoformat(span_start)).days < max_days:
+            spans[-1] = (span_start, range_end)
+        else:
+            spans.append((range_start, range_end))
+    return spans
+
+def is_weekend_gap(stored_rates: dict, range_start: str, range_end: str) -> bool:
+    """
+    Whether the range only holds weekend dates without any stored rates.
+    """
+    current = date.fromisoformat(range_start)
+    last = date.fromisoformat(range_end)
+    while current <= last:
+        if current.weekday() not in WEEKEND or stored_rates.get(current.isoformat()):
+            return False
+        current += timedelta(days=1)
+    return True
+
+def provider_chunk_days():
+    """
+    The shortest max_time_series_days of the active time series providers, None without a limit.
+    """
+    limits = []
+    for name in Provider.objects.filter(active=True).values_list("name", flat=True):
+        capabilities = AdapterFactory.get_capabilities(name)
+        if capabilities.time_series and capabilities.max_time_series_days:
+            limits.append(capabilities.max_time_series_days)
+    return min(limits) if limits else None
+
+@timed("db")
 def get_time_series_from_db(source_currency, start_date, end_date):
-    logger.info(f"Fetching time series from DB for {source_currency} from {start_date} to {end_date}")
-    source_currency_obj = Currency.objects.get(code=source_currency)
+    logger.debug("Fetching time series from DB for %s from %s to %s", source_currency, start_date, end_date)
+    if rate_archive.covers(start_date, end_date):
+        return get_time_series_from_archive(source_currency, start_date, end_date)
+
+    if matrix_covers(start_date, end_date):
+        return get_time_series_from_matrix(source_currency, start_date, end_date)
+
+    codes_by_id = currency_registry.codes_by_id()
     rates = CurrencyExchangeRate.objects.filter(
-        source_currency=source_currency_obj,
+        source_currency_id=currency_registry.id_for(source_currency),
         valuation_date__range=[start_date, end_date]
-    ).values("valuation_date", "exchanged_currency__code", "rate_value")
+    ).order_by("valuation_date").values_list("valuation_date", "exchanged_currency_id", "rate_value")
     
     time_series_data = {}
-    for rate in rates:
-        date_str = rate["valuation_date"].strftime("%Y-%m-%d")
-        time_series_data.setdefault(date_str, {})[rate["exchanged_currency__code"]] = str(rate["rate_value"])
+    for valuation_date, exchanged_currency_id, rate_value in rates:
+        date_str = valuation_date.strftime("%Y-%m-%d")
+        time_series_data.setdefault(date_str, {})[codes_by_id[exchanged_currency_id]] = str(rate_value)
     if time_series_data:
-        logger.info(f"Time Series data from DB: {time_series_data}")
+        logger.debug("Time Series data from DB: %s dates", len(time_series_data))
         time_series_data = {
         "source_currency": source_currency,
         "start_date": start_date,
@@ -53,23 +283,127 @@ def get_time_series_from_db(source_currency, start_date, end_date):
     else:
         return None
 
+def matrix_covers(start_date, end_date) -> bool:
+    """
+    Whether the window is served from the in-memory rate matrix rows.
+    """
+    if not rate_matrix_store.enabled:
+        return False
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+    return days <= rate_matrix_store.max_rows
+
+def iter_time_series_from_db(source_currency, start_date, end_date):
+    """
+    Yield (date, {currency: rate}) blocks in date order straight from a server-side iterator,
+    so memory use does not grow with the length of the range. Only stored rates are returned.
+    """
+    codes_by_id = currency_registry.codes_by_id()
+    rates = CurrencyExchangeRate.objects.filter(
+        source_currency_id=currency_registry.id_for(source_currency),
+        valuation_date__range=[start_date, end_date]
+    ).order_by("valuation_date").values_list("valuation_date", "exchanged_currency_id", "rate_value")
+
+    current_date, block = None, {}
+    for valuation_date, exchanged_currency_id, rate_value in rates.iterator(chunk_size=settings.TIME_SERIES_STREAM_CHUNK_SIZE):
+        exchanged_currency_code = codes_by_id[exchanged_currency_id]
+        if valuation_date != current_date:
+            if block:
+                yield current_date.strftime("%Y-%m-%d"), block
+            current_date, block = valuation_date, {}
+        block[exchanged_currency_code] = str(rate_value)
+    if block:
+        yield current_date.strftime("%Y-%m-%d"), block
+
+def get_time_series_from_matrix(source_currency, start_date, end_date):
+    """
+    Same result as get_time_series_from_db, served from the in-memory rate matrix rows.
+    """
+    time_series_data = {}
+    for valuation_date, rates in rate_matrix_store.rows(source_currency, start_date, end_date):
+        if rates:
+            time_series_data[valuation_date.strftime("%Y-%m-%d")] = {
+                code: str(rate_value) for code, rate_value in rates.items()
+            }
+    if not time_series_data:
+        return None
+    return {
+        "source_currency": source_currency,
+        "start_date": start_date,
+        "end_date": end_date,
+        "rates": time_series_data,
+    }
+
+def get_time_series_from_archive(source_currency, start_date, end_date):
+    """
+    Same result as get_time_series_from_db, served from the memory-mapped rate archive.
+    """
+    time_series_data = {}
+    current = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    while current <= end:
+        rates = rate_archive.row(source_currency, current)
+        if rates:
+            time_series_data[current.strftime("%Y-%m-%d")] = {
+                code: str(rate_value) for code, rate_value in rates.items()
+            }
+        current += timedelta(days=1)
+    if not time_series_data:
+        return None
+    return {
+        "source_currency": source_currency,
+        "start_date": start_date,
+        "end_date": end_date,
+        "rates": time_series_data,
+    }
+
 def fetch_time_series_from_provider(source_currency: str, start_date: str, end_date: str):
+    """
+    Ranges longer than a provider's max_time_series_days are split into chunks that are
+    fetched concurrently over the adapter's transport and merged. Each chunk is charged to the
+    provider's quota. Returns {} when providers answered without rates and none failed, None otherwise.
+    """
+    answered, failed = [], []
+
+    def call_provider(provider):
+        adapter = TimeSeriesAdapterFactory.get_time_series_adapter(provider.name)
+        capabilities = AdapterFactory.get_capabilities(provider.name)
+        if not adapter or not capabilities.time_series:
+            raise ProviderSkipped(f"{provider.name} has no time_series support")
+
+        chunks = split_date_range(start_date, end_date, capabilities.max_time_series_days)
+
+        def fetch():
+            time_series = {}
+            for rates in adapter.transport.map(lambda chunk: adapter.get_time_series(source_currency, *chunk), chunks):
+                time_series.update(rates)
+            return time_series
+
+        try:
+            time_series = quota_manager.call(provider, len(chunks), fetch, capabilities)
+        except Exception:
+            failed.append(provider.name)
+            raise
+        answered.append(provider.name)
+        return time_series
+
     try:
-        for provider in Provider.objects.filter(active=True).order_by("priority"):
-            adapter = TimeSeriesAdapterFactory.get_time_series_adapter(provider.name)
-            if adapter:
-                rate_data = adapter.get_time_series(source_currency, start_date, end_date)
+        providers = route_providers(Provider.objects.filter(active=True).order_by("priority"))
+        if settings.PROVIDER_DISPATCH["MODE"] == "hedged":
+            _, rate_data = dispatch(providers, call_provider)
+            if rate_data:
+                return rate_data
+        else:
+            for provider, rate_data in sequential_calls(providers, call_provider):
                 if rate_data:
-
                     return rate_data
     except Exception as e:
-        logger.error(f"Error fetching from providers: {e}")
-    return None
+        logger.error("Error fetching from providers: %s", e)
+    return {} if answered and not failed else None
 
 def filter_rate_data(source_currency: str, rate_data: dict) -> dict:
-    db_currencies = set(Currency.objects.values_list("code", flat=True))
+    db_currencies = currency_registry.codes()
     if source_currency not in db_currencies:
-        logger.warning(f"Skipping all data: source currency {source_currency} not in DB.")
+        logger.warning("Skipping all data: source currency %s not in DB.", source_currency)
         return {}
 
     filtered_rate_data = {
@@ -77,24 +411,16 @@ def filter_rate_data(source_currency: str, rate_data: dict) -> dict:
         for date, currencies in rate_data.items()
         if any(cur in db_currencies for cur in currencies)
     }
-    logger.info(f"Time Series data post filtering {filtered_rate_data}")
+    logger.debug("Time Series data post filtering: %s dates", len(filtered_rate_data))
     
     return filtered_rate_data
 
 def store_time_series(source_currency: str, start_date: str, end_date: str, filtered_data: dict):
-    try:
-        source_currency_obj = Currency.objects.get(code=source_currency)
-        for date_str, currencies in filtered_data.items():
-            valuation_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            for exchanged_currency_code, rate_value in currencies.items():
-                exchanged_currency_obj = Currency.objects.get(code=exchanged_currency_code)
-                CurrencyExchangeRate.objects.update_or_create(
-                    source_currency=source_currency_obj,
-                    exchanged_currency=exchanged_currency_obj,
-                    valuation_date=valuation_date,
-                    defaults={'rate_value': rate_value}
-                )
-                logger.info(f"Stored in DB {source_currency} -> {exchanged_currency_code} on {date_str}")
-    except Currency.DoesNotExist as e:
-        logger.error(f"Error storing time series: {e}")
+    rows = (
+        (date_str, exchanged_currency_code, rate_value)
+        for date_str, currencies in filtered_data.items()
+        for exchanged_currency_code, rate_value in currencies.items()
+    )
+    stored = bulk_store_rates(source_currency, rows)
+    logger.info("Stored %s time series rates in DB for %s from %s to %s", stored, source_currency, start_date, end_date)
 
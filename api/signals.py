@@ -0,0 +1,31 @@
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+from api.currency_registry import currency_registry
+from api.models import Currency
+from currency_exchange.db_router import apply_sqlite_pragmas, reset_pin
+
+
+def invalidate_currency_registry(sender, **kwargs):
+    currency_registry.invalidate()
+
+
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        apply_sqlite_pragmas(connection)
+
+
+def unpin_primary(sender, **kwargs):
+    # Threads serve many requests, so a write pins the reads of its own request only
+    reset_pin()
+
+
+def connect():
+    """
+    Connect the currency registry invalidation and DB hooks; called from ApiConfig.ready().
+    """
+    post_save.connect(invalidate_currency_registry, sender=Currency, dispatch_uid="invalidate_currency_registry")
+    post_delete.connect(invalidate_currency_registry, sender=Currency, dispatch_uid="invalidate_currency_registry")
+    connection_created.connect(tune_sqlite_connection, dispatch_uid="tune_sqlite_connection")
+    request_started.connect(unpin_primary, dispatch_uid="unpin_primary")
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process leases are disabled
+    fcntl = None
+
+logger = logging.getLogger("currency_app")
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the function and
+    every caller that arrives while it is in flight receives the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def ado(self, key, coro_func):
+        """
+        Asyncio variant of `do`; calls are coalesced per event loop. When the leader is cancelled
+        (e.g. its client disconnected), the waiting callers run the call again, one of them leading.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        while (future := self._async_calls.get(loop_key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This caller was cancelled, not the leader
+
+        future = self._async_calls[loop_key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await coro_func()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._async_calls[loop_key]
+            if not future.done():
+                future.cancel()
+
+
+single_flight = SingleFlight()
+
+
+@contextmanager
+def process_lease(key: str):
+    """
+    Hold an exclusive file lock for `key` shared by all worker processes on this host.
+    Yields True if another process held the lease while we waited (so the caller should
+    re-check the DB before calling providers), False otherwise. Does nothing when
+    SINGLE_FLIGHT["LOCK_DIR"] is not set or file locks are not available.
+    """
+    lock_dir = settings.SINGLE_FLIGHT["LOCK_DIR"]
+    if not lock_dir or fcntl is None:
+        yield False
+        return
+
+    os.makedirs(lock_dir, exist_ok=True)
+    path = os.path.join(lock_dir, hashlib.sha1(key.encode()).hexdigest() + ".lock")
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT["LEASE_TIMEOUT"]
+    waited = False
+    with open(path, "a") as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    logger.warning("Timed out waiting for lease %s, continuing without it", key)
+                    yield True
+                    return
+                waited = True
+                time.sleep(0.05)
+        try:
+            yield waited
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+
+
+def render_json(source_currency: str, start_date: str, end_date: str, blocks):
+    """
+    Same document as the non-streaming time series response, emitted one date at a time.
+    """
+    yield json.dumps({"source_currency": source_currency, "start_date": start_date, "end_date": end_date})[:-1]
+    yield ', "rates": {'
+    separator = ""
+    for date_str, rates in blocks:
+        yield f"{separator}{json.dumps(date_str)}: {json.dumps(rates)}"
+        separator = ", "
+    yield "}}"
+
+
+def render_ndjson(source_currency: str, start_date: str, end_date: str, blocks):
+    """
+    One JSON object per line and date: {"date": ..., "source_currency": ..., "rates": {...}}.
+    """
+    for date_str, rates in blocks:
+        yield json.dumps({"date": date_str, "source_currency": source_currency, "rates": rates}) + "\n"
+
+
+def render_csv(source_currency: str, start_date: str, end_date: str, blocks):
+    """
+    One row per date and exchanged currency.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["valuation_date", "source_currency", "exchanged_currency", "rate_value"])
+    for date_str, rates in blocks:
+        for exchanged_currency, rate_value in rates.items():
+            writer.writerow([date_str, source_currency, exchanged_currency, rate_value])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+STREAM_RENDERERS = {
+    "json": (render_json, "application/json"),
+    "ndjson": (render_ndjson, "application/x-ndjson"),
+    "csv": (render_csv, "text/csv"),
+}
@@ -1,3 +1,1473 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from io import StringIO
+from contextvars import copy_context
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate
+
+from api.adapters.adapter_factory import AdapterFactory, TimeSeriesAdapterFactory
+from api.adapters.base_adapter import ProviderError
+from api.adapters.currencybeacon import CurrencyBeaconAdapter
+from api.adapters.registry import AdapterRegistry, ProviderCapabilities
+from api.adapters import transport as transport_module
+from api.adapters.transport import ProviderTransport
+from api.currency_registry import CurrencyRegistry, currency_registry
+from api.dispatcher import ProviderSkipped, hedged_call, timed_call
+from api.metrics import MetricsRegistry
+from api.models import Currency, CurrencyExchangeRate, MissingExchangeRate
+from api.rate_cache import DateGenerations, LocalRateCacheBackend, RateCache, rate_cache
+from api.rate_archive import RateArchive, append_archive, write_archive
+from api.rate_matrix import RateMatrixStore
+from api.services import (
+    find_cross_rate, get_exchange_rate_as_of, get_exchange_rate_from_db, get_exchange_rate_value, get_exchange_rates_bulk,
+    load_rate_graph, prior_rate_query,
+)
+from api.services_ingestion import bulk_store_rates
+from api.singleflight import SingleFlight, process_lease
+from api.services_time_series import (
+    fetch_time_series_data, get_time_series_from_db, iter_time_series_from_db, latest_rate_date,
+)
+from benchmarks.fake_provider import FakeProvider, fake_rate
+from currency_exchange.db_router import PrimaryReplicaRouter, primary_reads, reset_pin
+from providers.health import OPEN, health_registry
+from providers.models import Provider
+
+RATE_TABLE = CurrencyExchangeRate._meta.db_table
+
+
+class StubProviderServer:
+    """
+    Local keep-alive HTTP server answering every request with the next of `responses`,
+    (status, JSON body) pairs of which the last one repeats, and recording the requested paths
+    and the client ports they came from.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.paths = []
+        self.client_ports = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.paths.append(self.path)
+                stub.client_ports.add(self.client_address[1])
+                status, body = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def use_provider_url(test, provider_name, url):
+    """
+    Point the rate and time series adapters of a provider at `url` for the rest of the test.
+    """
+    transport = ProviderTransport(url, max_retries=0)
+    for adapter in (AdapterFactory.get_adapter(provider_name), TimeSeriesAdapterFactory.get_time_series_adapter(provider_name)):
+        patcher = mock.patch.object(adapter, "transport", transport)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+def rate_query_plans(service, *args):
+    """
+    Run a service and EXPLAIN every query it sent to the rate table, as sent.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        result = service(*args)
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            if RATE_TABLE in query["sql"]:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append([row[-1] for row in cursor.fetchall()])
+    return result, plans
+
+
+class RateQueryPlanTests(TestCase):
+    """
+    The hot rate queries must be answered from indexes, never by scanning the rate table.
+    The plans are those of the SQL the services actually send.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Currency.objects.create(code="USD", name="US Dollar", symbol="$")
+        Currency.objects.create(code="EUR", name="Euro", symbol="E")
+
+    def assertUsesIndex(self, service, *args, index_name=None, covering=False):
+        result, plans = rate_query_plans(service, *args)
+        self.assertTrue(plans, "no query on the rate table")
+        for plan in plans:
+            rate_steps = [step for step in plan if RATE_TABLE in step]
+            self.assertTrue(rate_steps, plan)
+            for step in rate_steps:
+                self.assertIn("USING", step, plan)
+                self.assertNotRegex(step, rf"^SCAN {RATE_TABLE}$", plan)
+            if index_name:
+                self.assertTrue(any(index_name in step for step in rate_steps), plan)
+            if covering:
+                self.assertTrue(any("COVERING INDEX" in step for step in rate_steps), plan)
+            self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+        return result
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_point_lookup_uses_unique_index(self):
+        self.assertIsNone(self.assertUsesIndex(get_exchange_rate_from_db, "USD", "EUR", "2025-03-07"))
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_time_series_range_uses_covering_index(self):
+        result = self.assertUsesIndex(
+            get_time_series_from_db, "USD", "2025-01-01", "2025-12-31", index_name="rate_source_date_idx", covering=True,
+        )
+        self.assertIsNone(result)
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_streamed_time_series_uses_covering_index(self):
+        result = self.assertUsesIndex(
+            lambda *args: list(iter_time_series_from_db(*args)), "USD", "2025-01-01", "2025-12-31",
+            index_name="rate_source_date_idx", covering=True,
+        )
+        self.assertEqual(result, [])
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_rate_matrix_rows_use_covering_index(self):
+        self.assertUsesIndex(
+            RateMatrixStore(100, 60).load, "USD", "2025-01-01", "2025-12-31", index_name="rate_source_date_idx", covering=True,
+        )
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_valuation_date_load_uses_index(self):
+        self.assertEqual(self.assertUsesIndex(load_rate_graph, date(2025, 3, 7), ["USD", "EUR"]), {})
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_as_of_lookup_scans_unique_index_backwards(self):
+        result = self.assertUsesIndex(lambda *args: prior_rate_query(*args).first(), "USD", "EUR", date(2025, 3, 9), 7)
+        self.assertIsNone(result)
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_latest_rate_date_uses_source_date_index(self):
+        result = self.assertUsesIndex(
+            latest_rate_date, "USD", date(2025, 3, 9), date(2025, 3, 2), index_name="rate_source_date_idx",
+        )
+        self.assertIsNone(result)
+
+
+class ReadRoutingTests(SimpleTestCase):
+    """
+    Rate reads go to the read alias until the context writes.
+    """
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.read_alias = settings.DATABASE_READ_ALIAS
+        # The test runner makes the read alias a mirror of the primary; outside tests it has settings of its own
+        replica = connections[self.read_alias]
+        patcher = mock.patch.object(replica, "settings_dict", dict(replica.settings_dict))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, *steps):
+        # Like a request: a context of its own, unpinned when it starts
+        def run():
+            reset_pin()
+            return [step() for step in steps][-1]
+
+        return copy_context().run(run)
+
+    def test_rate_reads_go_to_read_alias(self):
+        self.assertEqual(self.route(lambda: self.router.db_for_read(CurrencyExchangeRate)), self.read_alias)
+        self.assertEqual(self.route(lambda: self.router.db_for_read(Currency)), self.read_alias)
+        self.assertEqual(self.route(lambda: self.router.db_for_read(Provider)), DEFAULT_DB_ALIAS)
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.assertEqual(self.route(
+            lambda: self.router.db_for_write(Provider),
+            lambda: self.router.db_for_read(CurrencyExchangeRate),
+        ), DEFAULT_DB_ALIAS)
+
+    def test_primary_reads_block(self):
+        def read_in_block():
+            with primary_reads():
+                return self.router.db_for_read(CurrencyExchangeRate)
+
+        self.assertEqual(self.route(read_in_block), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.route(read_in_block, lambda: self.router.db_for_read(Currency)), self.read_alias)
+
+    def test_reads_in_a_primary_transaction_stay_on_primary(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], "in_atomic_block", True):
+            self.assertEqual(self.route(lambda: self.router.db_for_read(CurrencyExchangeRate)), DEFAULT_DB_ALIAS)
+
+    def test_unconfigured_read_alias_falls_back_to_primary(self):
+        with self.settings(DATABASE_READ_ALIAS="missing"):
+            self.assertEqual(self.route(lambda: self.router.db_for_read(CurrencyExchangeRate)), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate(self.read_alias, "api"))
+
+
+class SqlitePragmaTests(SimpleTestCase):
+    # Connections of their own to a scratch file, not to the test databases
+    databases = {DEFAULT_DB_ALIAS, settings.DATABASE_READ_ALIAS}
+
+    def connect(self, alias, path):
+        wrapper = DatabaseWrapper(dict(connections.settings[DEFAULT_DB_ALIAS], NAME=path), alias)
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper.connection
+
+    def test_new_connections_are_tuned_and_replicas_read_only(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "pragmas.sqlite3")
+
+        primary = self.connect(DEFAULT_DB_ALIAS, path)
+        self.assertEqual(primary.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(primary.execute("PRAGMA busy_timeout").fetchone()[0], settings.SQLITE_PRAGMAS["BUSY_TIMEOUT"])
+        self.assertEqual(primary.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(primary.execute("PRAGMA query_only").fetchone()[0], 0)
+        primary.execute("CREATE TABLE rates (rate TEXT)")
+
+        replica = self.connect(settings.DATABASE_READ_ALIAS, path)
+        self.assertEqual(replica.execute("PRAGMA query_only").fetchone()[0], 1)
+        self.assertEqual(replica.execute("SELECT COUNT(*) FROM rates").fetchone()[0], 0)
+        with self.assertRaisesMessage(sqlite3.OperationalError, "readonly database"):
+            replica.execute("INSERT INTO rates VALUES ('0.9')")
+
+
+class SqliteWriteLockTests(TransactionTestCase):
+    def test_concurrent_read_then_write_transactions_wait_for_each_other(self):
+        both_read = threading.Barrier(2, timeout=0.5)
+        errors = []
+
+        def read_then_write(code):
+            try:
+                with transaction.atomic():
+                    Currency.objects.count()
+                    try:
+                        # Deferred transactions both get here; immediate ones one after the other
+                        both_read.wait()
+                    except threading.BrokenBarrierError:
+                        pass
+                    Currency.objects.create(code=code, name=code, symbol=code)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=read_then_write, args=(code,)) for code in ("USD", "EUR")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Currency.objects.using(DEFAULT_DB_ALIAS).count(), 2)
+
+
+class CurrencyRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usd = Currency.objects.create(code="USD", name="US Dollar", symbol="$")
+        Currency.objects.create(code="EUR", name="Euro", symbol="E")
+
+    def test_lookups_are_served_from_one_query(self):
+        registry = CurrencyRegistry()
+        with self.assertNumQueries(1):
+            self.assertTrue(registry.exists("USD"))
+            self.assertFalse(registry.exists("XXX"))
+            self.assertEqual(registry.id_for("USD"), self.usd.id)
+            self.assertEqual(registry.codes_by_id()[self.usd.id], "USD")
+            self.assertEqual(registry.get("USD").symbol, "$")
+
+    def test_currency_changes_invalidate_the_registry(self):
+        self.assertFalse(currency_registry.exists("GBP"))
+        gbp = Currency.objects.create(code="GBP", name="Pound", symbol="P")
+        self.assertEqual(currency_registry.id_for("GBP"), gbp.id)
+
+        gbp.delete()
+        self.assertFalse(currency_registry.exists("GBP"))
+
+
+class RateCacheTests(SimpleTestCase):
+    def shared_caches(self):
+        # Two caches mapping the same invalidation file, like two worker processes
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        return [RateCache(LocalRateCacheBackend(100, 60, DateGenerations(path))) for _ in range(2)]
+
+    def test_test_runs_do_not_map_the_deployment_counters(self):
+        path = rate_cache.backend.generations.path
+        self.assertEqual(path, settings.RATE_CACHE["SHARED_PATH"])
+        self.assertNotEqual(path, f"{settings.DB_NAME}-ratecache")
+        self.assertTrue(path.startswith(tempfile.gettempdir()))
+
+    def test_invalidation_reaches_other_processes(self):
+        worker, other_worker = self.shared_caches()
+        worker.set("USD", "EUR", "2025-03-07", "0.9")
+        worker.set("USD", "EUR", "2025-03-06", "0.8")
+
+        other_worker.invalidate("USD", ["EUR"], ["2025-03-07"])
+
+        self.assertIsNone(worker.get("USD", "EUR", "2025-03-07"))
+        self.assertEqual(worker.get("USD", "EUR", "2025-03-06"), Decimal("0.8"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RateCache(LocalRateCacheBackend(2, 60))
+        cache.set("USD", "EUR", "2025-03-07", "0.9")
+        cache.set("USD", "GBP", "2025-03-07", "0.8")
+        cache.get("USD", "EUR", "2025-03-07")
+
+        cache.set("USD", "JPY", "2025-03-07", "150")
+
+        self.assertIsNone(cache.get("USD", "GBP", "2025-03-07"))
+        self.assertEqual(cache.get("USD", "EUR", "2025-03-07"), Decimal("0.9"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = RateCache(LocalRateCacheBackend(100, 60))
+        with mock.patch("api.rate_cache.time.monotonic", return_value=1000):
+            cache.set("USD", "EUR", "2025-03-07", "0.9")
+        with mock.patch("api.rate_cache.time.monotonic", return_value=1059):
+            self.assertEqual(cache.get("USD", "EUR", "2025-03-07"), Decimal("0.9"))
+        with mock.patch("api.rate_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(cache.get("USD", "EUR", "2025-03-07"))
+        self.assertEqual(len(cache.backend), 0)
+        self.assertEqual((cache.stats()["expirations"], cache.stats()["evictions"]), (1, 0))
+
+    def test_value_read_before_an_invalidation_is_not_cached(self):
+        cache = RateCache(LocalRateCacheBackend(100, 60))
+        cache.set("USD", "EUR", "2025-03-07", "0.9")
+        generation = cache.generation("2025-03-07")
+        cache.invalidate("USD", ["EUR"], ["2025-03-07"])
+
+        cache.set("USD", "EUR", "2025-03-07", "0.9", generation)
+        self.assertIsNone(cache.get("USD", "EUR", "2025-03-07"))
+        cache.set("USD", "EUR", "2025-03-07", "0.8", cache.generation("2025-03-07"))
+        self.assertEqual(cache.get("USD", "EUR", "2025-03-07"), Decimal("0.8"))
+        self.assertEqual(cache.stats()["invalidations"], 0)
+
+
+class RateLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def test_cached_rate_skips_the_database(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.5"))])
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), Decimal("0.5"))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), Decimal("0.5"))
+
+    def test_cross_rate_is_derived_without_calling_providers(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.5")), ("2025-03-07", "GBP", Decimal("0.4"))])
+
+        with mock.patch("api.services.fetch_exchange_rate_coalesced") as fetch:
+            self.assertEqual(get_exchange_rate_value("GBP", "EUR", "2025-03-07"), Decimal("1.25"))
+        fetch.assert_not_called()
+
+    @override_settings(RATE_PIVOT_CURRENCIES=["USD", "EUR"])
+    def test_cross_rates_only_go_through_pivot_currencies(self):
+        graph = {
+            "GBP": {"USD": Decimal("1.25"), "CHF": Decimal("1.1")},
+            "USD": {"EUR": Decimal("0.9")},
+            "EUR": {"JPY": Decimal("160")},
+            "CHF": {"SEK": Decimal("12")},
+        }
+        self.assertEqual(find_cross_rate(graph, "GBP", "JPY"), Decimal("180.000000"))
+        self.assertIsNone(find_cross_rate(graph, "GBP", "SEK"))
+
+    def test_restoring_a_rate_invalidates_rates_derived_from_it(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.5")), ("2025-03-07", "GBP", Decimal("0.25"))])
+        self.assertEqual(get_exchange_rate_value("EUR", "GBP", "2025-03-07"), Decimal("0.5"))
+        self.assertEqual(get_exchange_rate_value("EUR", "USD", "2025-03-07"), Decimal("2"))
+
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.4"))])
+
+        self.assertEqual(get_exchange_rate_value("EUR", "GBP", "2025-03-07"), Decimal("0.625"))
+        self.assertEqual(get_exchange_rate_value("EUR", "USD", "2025-03-07"), Decimal("2.5"))
+
+    def test_rate_stored_during_a_lookup_is_not_shadowed(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.5"))])
+        read_rate = get_exchange_rate_from_db("USD", "EUR", "2025-03-07")
+
+        def read_then_concurrent_write(*args):
+            # Another request stores the new rate after this one has read the old one
+            bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.4"))])
+            return read_rate
+
+        with mock.patch("api.services.get_exchange_rate_from_db", side_effect=read_then_concurrent_write):
+            self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), Decimal("0.5"))
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), Decimal("0.4"))
+
+
+@override_settings(RATE_ARCHIVE={"PATH": None, "RELOAD_INTERVAL": 0})
+class RateArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [
+            ("2025-03-06", "EUR", Decimal("0.9")), ("2025-03-06", "GBP", Decimal("0.8")), ("2025-03-07", "EUR", Decimal("0.912345")),
+        ])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "rates.arc")
+        self.archive = RateArchive()
+        self.addCleanup(self.archive.close)
+
+    def test_archived_rates_round_trip(self):
+        self.assertEqual(write_archive(self.path, "2025-03-07"), 2)
+        self.assertTrue(self.archive.load(self.path))
+
+        with self.assertNumQueries(1):  # the dates stored since the export, once after mapping
+            self.assertEqual(self.archive.rate("USD", "EUR", "2025-03-07"), Decimal("0.912345"))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.archive.rate("GBP", "USD", "2025-03-06"), Decimal("1.25"))
+            self.assertIsNone(self.archive.rate("USD", "GBP", "2025-03-07"))
+            self.assertEqual(self.archive.row("USD", "2025-03-06"), {"EUR": Decimal("0.9"), "GBP": Decimal("0.8")})
+            self.assertTrue(self.archive.covers("2025-03-06", "2025-03-07"))
+            self.assertFalse(self.archive.covers("2025-03-06", "2025-03-08"))
+
+    def test_appended_dates_are_picked_up_and_stored_dates_skipped(self):
+        write_archive(self.path, "2025-03-07")
+        self.archive.load(self.path)
+
+        bulk_store_rates("USD", [("2025-03-07", "GBP", Decimal("0.81")), ("2025-03-08", "EUR", Decimal("0.93"))])
+        self.archive.invalidate(["2025-03-07", "2025-03-08"])
+        self.assertIsNone(self.archive.rate("USD", "EUR", "2025-03-07"))
+
+        self.assertEqual(append_archive(self.path, "2025-03-08"), 2)
+        self.archive.load(self.path)
+        self.assertEqual(self.archive.rate("USD", "GBP", "2025-03-07"), Decimal("0.81"))
+        self.assertEqual(self.archive.rate("USD", "EUR", "2025-03-08"), Decimal("0.93"))
+
+    def test_dates_stored_by_other_processes_are_skipped(self):
+        write_archive(self.path, "2025-03-07")
+        bulk_store_rates("USD", [("2025-03-06", "EUR", Decimal("0.95"))])
+        self.archive.load(self.path)
+        self.assertIsNone(self.archive.rate("USD", "EUR", "2025-03-06"))
+        self.assertEqual(self.archive.rate("USD", "EUR", "2025-03-07"), Decimal("0.912345"))
+
+        # Another worker's archive sharing the invalidation counters
+        RateArchive().invalidate(["2025-03-07"])
+        self.assertIsNone(self.archive.rate("USD", "EUR", "2025-03-07"))
+        self.assertFalse(self.archive.covers("2025-03-07", "2025-03-07"))
+
+    def test_append_rewrites_dates_stored_since_the_export(self):
+        write_archive(self.path, "2025-03-07")
+        bulk_store_rates("USD", [("2025-03-06", "EUR", Decimal("0.95"))])
+
+        self.assertEqual(append_archive(self.path, "2025-03-07"), 2)
+        self.archive.load(self.path)
+        self.assertEqual(self.archive.rate("USD", "EUR", "2025-03-06"), Decimal("0.95"))
+
+    def test_stored_rates_are_preferred_over_archived_inverses(self):
+        write_archive(self.path, "2025-03-07")
+        self.archive.load(self.path)
+        bulk_store_rates("EUR", [("2025-03-07", "USD", Decimal("1.1"))])
+        # As if the store had not reached the invalidation counters
+        CurrencyExchangeRate.objects.filter(source_currency__code="EUR").update(updated_at="2000-01-01T00:00:00Z")
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+        self.archive.load(self.path)
+
+        self.assertEqual(self.archive.rate("EUR", "USD", "2025-03-07"), Decimal("1.096077"))
+        with mock.patch("api.services.rate_archive", self.archive):
+            self.assertEqual(get_exchange_rate_value("EUR", "USD", "2025-03-07"), Decimal("1.1"))
+
+
+class BulkStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP", "JPY"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def stored(self):
+        return {
+            (str(valuation_date), code): rate_value
+            for valuation_date, code, rate_value in CurrencyExchangeRate.objects.values_list(
+                "valuation_date", "exchanged_currency__code", "rate_value",
+            )
+        }
+
+    def test_rows_are_inserted_in_batches(self):
+        rows = [(f"2025-03-0{day}", code, Decimal(day)) for day in (6, 7) for code in ("EUR", "GBP", "JPY")]
+        rows.append(("2025-03-07", "XXX", Decimal("1")))
+
+        with CaptureQueriesContext(connection) as queries:
+            written = bulk_store_rates("USD", rows, batch_size=4)
+
+        self.assertEqual(written, 6)
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("INSERT")]), 2)
+        self.assertEqual(len(self.stored()), 6)
+
+    def test_existing_rates_are_updated_in_place(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.9")), ("2025-03-07", "GBP", Decimal("0.8"))])
+
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.95"))])
+
+        self.assertEqual(self.stored(), {("2025-03-07", "EUR"): Decimal("0.95"), ("2025-03-07", "GBP"): Decimal("0.8")})
+
+
+class RateMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-03-06", "EUR", Decimal("0.5")), ("2025-03-07", "EUR", Decimal("0.4"))])
+        bulk_store_rates("GBP", [("2025-03-07", "EUR", Decimal("1.2"))])
+
+    def test_range_loads_only_the_source_rows(self):
+        store = RateMatrixStore(100, 60)
+        with CaptureQueriesContext(connection) as queries:
+            rows = store.rows("USD", "2025-03-06", "2025-03-08")
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"source_currency_id" =', queries[0]["sql"])
+        self.assertEqual(rows, [
+            (date(2025, 3, 6), {"EUR": Decimal("0.5")}),
+            (date(2025, 3, 7), {"EUR": Decimal("0.4")}),
+            (date(2025, 3, 8), {}),
+        ])
+        with self.assertNumQueries(0):
+            store.rows("USD", "2025-03-06", "2025-03-08")
+
+    def test_point_lookup_derives_inverse_and_follows_stores(self):
+        store = RateMatrixStore(100, 60)
+        self.assertEqual(store.rate("EUR", "USD", "2025-03-07"), Decimal("2.5"))
+
+        store.apply("USD", [("2025-03-07", "EUR", Decimal("0.25"))])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(store.rate("USD", "EUR", "2025-03-07"), Decimal("0.25"))
+        # Other sources' rows of the stored date are reloaded, as a write to the date invalidates it everywhere
+        with self.assertNumQueries(1):
+            self.assertEqual(store.rate("EUR", "USD", "2025-03-07"), Decimal("4"))
+
+    def test_rows_round_trip_the_column_scale_exactly(self):
+        bulk_store_rates("USD", [("2025-03-08", "GBP", Decimal("123456.654321"))])
+        store = RateMatrixStore(100, 60)
+
+        self.assertEqual(store.rates("USD", ["GBP", "EUR"], "2025-03-08"), [Decimal("123456.654321"), None])
+        self.assertEqual(store.row("USD", "2025-03-07"), {"EUR": Decimal("0.4")})
+
+    def test_stores_in_another_process_invalidate_loaded_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratecache")
+            reader = RateMatrixStore(100, 60, DateGenerations(path))
+            writer = RateMatrixStore(100, 60, DateGenerations(path))
+            reader.rows("USD", "2025-03-06", "2025-03-07")
+
+            CurrencyExchangeRate.objects.filter(
+                source_currency__code="USD", valuation_date="2025-03-07",
+            ).update(rate_value=Decimal("0.3"))
+            writer.apply("USD", [("2025-03-07", "EUR", Decimal("0.3"))])
+
+            with self.assertNumQueries(1):
+                self.assertEqual(reader.rate("USD", "EUR", "2025-03-07"), Decimal("0.3"))
+            with self.assertNumQueries(0):
+                self.assertEqual(reader.rate("USD", "EUR", "2025-03-06"), Decimal("0.5"))
+
+
+class BatchConversionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "JPY"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def test_default_date_matches_single_conversion(self):
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.9")), (date.today(), "EUR", Decimal("0.8"))])
+
+        single = self.client.get("/api/convert_amount/", {"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10"})
+        batch = self.client.post("/api/convert_amount_batch/", {
+            "conversions": [{"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10"}],
+        }, content_type="application/json")
+
+        result = batch.json()["results"][0]
+        self.assertEqual(result["valuation_date"], single.json()["valuation_date"])
+        self.assertEqual(result["converted_amount"], single.json()["converted_amount"])
+
+    def test_provider_rates_have_the_stored_scale(self):
+        with mock.patch("api.services.fetch_exchange_rate_coalesced", return_value={"JPY": 21.228512345678}):
+            rates = get_exchange_rates_bulk([("USD", "JPY", "2025-03-07")])
+
+        self.assertEqual(str(rates[("USD", "JPY", "2025-03-07")]), "21.228512")
+
+
+class ConversionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "JPY", "BHD"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-03-07", "JPY", Decimal("149")), ("2025-03-07", "BHD", Decimal("0.3765"))])
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def convert(self, exchanged_currency, amount, url="/api/convert_amount/"):
+        return self.client.get(url, {
+            "source_currency": "USD", "exchanged_currency": exchanged_currency, "amount": amount, "valuation_date": "2025-03-07",
+        })
+
+    def test_rounds_once_to_the_minor_unit(self):
+        self.assertEqual(self.convert("JPY", "0.5").json()["converted_amount"], "74")  # 74.5, half to even
+        self.assertEqual(self.convert("JPY", "1.5").json()["converted_amount"], "224")  # 223.5
+        self.assertEqual(self.convert("BHD", "1.0005").json()["converted_amount"], "0.377")  # 0.37668825
+
+    def test_amounts_beyond_the_limits_are_rejected(self):
+        for amount in ("1e60", "1e999999999", "1000000000000000000000000", "0.0000001", "NaN"):
+            for url in ("/api/convert_amount/", "/api/async/convert_amount/"):
+                with self.subTest(amount=amount, url=url):
+                    self.assertEqual(self.convert("JPY", amount, url).status_code, 400)
+
+        largest = self.convert("BHD", "999999999999999999999999.999999")
+        self.assertEqual(largest.json()["converted_amount"], "376500000000000000000000.000")
+
+    def test_batch_rounds_like_single_conversions(self):
+        conversions = [
+            {"source_currency": "USD", "exchanged_currency": "JPY", "amount": "0.5", "valuation_date": "2025-03-07"},
+            {"source_currency": "USD", "exchanged_currency": "BHD", "amount": "1.0005", "valuation_date": "2025-03-07"},
+        ]
+        response = self.client.post("/api/convert_amount_batch/", {"conversions": conversions}, content_type="application/json")
+        self.assertEqual([result["converted_amount"] for result in response.json()["results"]], ["74", "0.377"])
+
+        conversions[0]["amount"] = "0.0000001"
+        response = self.client.post("/api/convert_amount_batch/", {"conversions": conversions}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class RateAsOfTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "JPY"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.9"))])  # a Friday
+        bulk_store_rates("JPY", [("2025-03-07", "USD", Decimal("0.0067"))])
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+        # Providers have no rates for the weekend either
+        for patcher in (
+            mock.patch("api.services.fetch_exchange_rate_coalesced", return_value={}),
+            mock.patch("api.services_async.afetch_exchange_rate_coalesced", new=mock.AsyncMock(return_value={})),
+            mock.patch("api.services_time_series.fetch_time_series_coalesced", return_value={}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_weekend_conversion_uses_the_latest_earlier_rate(self):
+        params = {"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-03-09"}
+        self.assertEqual(self.client.get("/api/convert_amount/", params).status_code, 404)
+
+        for url in ("/api/convert_amount/", "/api/async/convert_amount/"):
+            with self.subTest(url=url):
+                body = self.client.get(url, dict(params, as_of="true")).json()
+                self.assertEqual((body["valuation_date"], body["requested_date"]), ("2025-03-07", "2025-03-09"))
+                self.assertEqual(body["converted_amount"], "9.00")
+
+    def test_fallback_is_bounded_by_the_staleness(self):
+        self.assertEqual(get_exchange_rate_as_of("USD", "EUR", "2025-03-09", 2), (date(2025, 3, 7), Decimal("0.9")))
+        self.assertIsNone(get_exchange_rate_as_of("USD", "EUR", "2025-03-09", 1))
+        self.assertEqual(get_exchange_rate_as_of("USD", "EUR", "2025-03-07", 0), (date(2025, 3, 7), Decimal("0.9")))
+
+    def test_time_series_fills_dates_from_before_the_window(self):
+        body = self.client.get("/api/time_series_exchange_rate/", {
+            "source_currency": "USD", "start_date": "2025-03-08", "end_date": "2025-03-09", "as_of": "true",
+        }).json()
+
+        self.assertEqual(body["rates"], {"2025-03-08": {"EUR": "0.900000"}, "2025-03-09": {"EUR": "0.900000"}})
+        self.assertEqual(body["effective_dates"], {"2025-03-08": "2025-03-07", "2025-03-09": "2025-03-07"})
+
+    def test_fallback_derives_inverse_and_cross_rates(self):
+        for source_currency, exchanged_currency in (("EUR", "USD"), ("EUR", "JPY")):
+            with self.subTest(pair=(source_currency, exchanged_currency)):
+                friday_rate = get_exchange_rate_value(source_currency, exchanged_currency, "2025-03-07")
+                self.assertEqual(get_exchange_rate_as_of(source_currency, exchanged_currency, "2025-03-09"),
+                                 (date(2025, 3, 7), friday_rate))
+                body = self.client.get("/api/async/convert_amount/", {
+                    "source_currency": source_currency, "exchanged_currency": exchanged_currency, "amount": "1",
+                    "valuation_date": "2025-03-09", "as_of": "true",
+                }).json()
+                self.assertEqual(body["valuation_date"], "2025-03-07")
+
+    def test_missing_rates_are_shared_and_kept_out_of_the_cache(self):
+        self.assertIsNone(get_exchange_rate_value("USD", "EUR", "2025-03-08"))
+        self.assertTrue(MissingExchangeRate.objects.filter(valuation_date="2025-03-08").exists())
+        self.assertEqual(len(rate_cache.backend), 0)
+
+        # Like a request served by another worker, with a cold cache
+        rate_cache.clear()
+        with mock.patch("api.services.fetch_exchange_rate_coalesced") as fetch:
+            self.assertIsNone(get_exchange_rate_value("USD", "EUR", "2025-03-08"))
+        fetch.assert_not_called()
+
+        bulk_store_rates("USD", [("2025-03-08", "EUR", Decimal("0.91"))])
+        self.assertFalse(MissingExchangeRate.objects.exists())
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-08"), Decimal("0.91"))
+
+    def test_empty_time_series_dates_are_not_requested_again(self):
+        self.client.get("/api/time_series_exchange_rate/", {
+            "source_currency": "USD", "start_date": "2025-03-07", "end_date": "2025-03-10",
+        })
+        rate_cache.clear()
+        with mock.patch("api.services_time_series.fetch_time_series_coalesced") as fetch:
+            self.client.get("/api/time_series_exchange_rate/", {
+                "source_currency": "USD", "start_date": "2025-03-07", "end_date": "2025-03-10",
+            })
+        fetch.assert_not_called()
+
+
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-01-02", "EUR", Decimal("0.9")), ("2025-01-02", "GBP", Decimal("0.8"))])
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    async def test_async_endpoints_answer_like_the_sync_ones(self):
+        requests = [
+            ("convert_amount/", {"source_currency": "USD", "exchanged_currency": "GBP", "amount": "10", "valuation_date": "2025-01-02"}),
+            ("convert_amount/", {"source_currency": "EUR", "exchanged_currency": "USD", "amount": "9", "valuation_date": "2025-01-02"}),
+            ("time_series_exchange_rate/", {"source_currency": "USD", "start_date": "2025-01-02", "end_date": "2025-01-02"}),
+        ]
+        for path, params in requests:
+            with self.subTest(path=path, params=params):
+                expected = await self.async_client.get(f"/api/{path}", params)
+                response = await self.async_client.get(f"/api/async/{path}", params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_provider_miss_is_fetched_without_blocking(self):
+        with mock.patch("api.services_async.afetch_exchange_rate_coalesced",
+                        new=mock.AsyncMock(return_value={"EUR": 0.95})) as fetch:
+            response = await self.async_client.get("/api/async/convert_amount/", {
+                "source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-01-03",
+            })
+
+        self.assertEqual(response.json()["converted_amount"], "9.50")
+        fetch.assert_awaited_once_with("USD", ["EUR"], date(2025, 1, 3))
+
+    async def test_missing_ranges_are_fetched_concurrently(self):
+        in_flight = []
+        overlapped = asyncio.Event()
+
+        async def fetch(source_currency, start_date, end_date):
+            in_flight.append(start_date)
+            if len(in_flight) == 2:
+                overlapped.set()
+            await asyncio.wait_for(overlapped.wait(), 1)
+            return {start_date: {"EUR": "0.91", "GBP": "0.81"}}
+
+        with mock.patch("api.services_async.afetch_time_series_coalesced", new=fetch), \
+                mock.patch("api.services_time_series.provider_chunk_days", return_value=1):
+            response = await self.async_client.get("/api/async/time_series_exchange_rate/", {
+                "source_currency": "USD", "start_date": "2025-01-01", "end_date": "2025-01-03",
+            })
+
+        self.assertEqual(sorted(in_flight), ["2025-01-01", "2025-01-03"])
+        self.assertEqual(sorted(response.json()["rates"]), ["2025-01-01", "2025-01-02", "2025-01-03"])
+
+    async def test_concurrent_range_fetches_are_bounded(self):
+        running, peak = 0, 0
+
+        async def fetch(source_currency, start_date, end_date):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+
+        # Every other day stored: 7 separate gaps
+        await sync_to_async(bulk_store_rates)("USD", [
+            (date(2025, 1, 2) + timedelta(days=2 * n), code, Decimal("0.9")) for n in range(8) for code in ("EUR", "GBP")
+        ])
+        with mock.patch("api.services_async.afetch_time_series_coalesced", new=fetch), \
+                mock.patch("api.services_async.MAX_CONCURRENCY", 2), \
+                mock.patch("api.services_time_series.provider_chunk_days", return_value=1), \
+                mock.patch("api.services_time_series.WEEKEND", ()):
+            await self.async_client.get("/api/async/time_series_exchange_rate/", {
+                "source_currency": "USD", "start_date": "2025-01-02", "end_date": "2025-01-16",
+            })
+
+        self.assertEqual(peak, 2)
+
+
+@override_settings(TIME_SERIES_STREAM_CHUNK_SIZE=1)
+class StreamingTimeSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [
+            ("2025-03-06", "EUR", Decimal("0.9")), ("2025-03-06", "GBP", Decimal("0.8")), ("2025-03-07", "EUR", Decimal("0.91")),
+        ])
+
+    def stream(self, stream_format):
+        response = self.client.get("/api/time_series_exchange_rate/", {
+            "source_currency": "USD", "start_date": "2025-03-06", "end_date": "2025-03-08", "stream": stream_format,
+        })
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_json_stream_is_the_time_series_document(self):
+        response, content = self.stream("json")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(content), {
+            "source_currency": "USD", "start_date": "2025-03-06", "end_date": "2025-03-08",
+            "rates": {"2025-03-06": {"EUR": "0.900000", "GBP": "0.800000"}, "2025-03-07": {"EUR": "0.910000"}},
+        })
+
+    def test_ndjson_and_csv_streams(self):
+        _, content = self.stream("ndjson")
+        self.assertEqual([json.loads(line) for line in content.splitlines()], [
+            {"date": "2025-03-06", "source_currency": "USD", "rates": {"EUR": "0.900000", "GBP": "0.800000"}},
+            {"date": "2025-03-07", "source_currency": "USD", "rates": {"EUR": "0.910000"}},
+        ])
+
+        response, content = self.stream("csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="USD_2025-03-06_2025-03-08.csv"')
+        self.assertEqual(content.splitlines(), [
+            "valuation_date,source_currency,exchanged_currency,rate_value",
+            "2025-03-06,USD,EUR,0.900000",
+            "2025-03-06,USD,GBP,0.800000",
+            "2025-03-07,USD,EUR,0.910000",
+        ])
+
+    def test_unknown_stream_format_is_rejected(self):
+        response = self.client.get("/api/time_series_exchange_rate/", {
+            "source_currency": "USD", "start_date": "2025-03-06", "end_date": "2025-03-08", "stream": "xml",
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class HttpCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-03-06", "EUR", Decimal("0.9")), ("2025-03-07", "EUR", Decimal("0.91"))])
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def time_series(self, etag=None):
+        return self.client.get("/api/time_series_exchange_rate/", {
+            "source_currency": "USD", "start_date": "2025-03-06", "end_date": "2025-03-07",
+        }, headers={"If-None-Match": etag} if etag else {})
+
+    def test_time_series_revalidates_until_a_rate_changes(self):
+        response = self.time_series()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f"max-age={settings.RATE_HTTP_CACHE['HISTORICAL_MAX_AGE']}", response["Cache-Control"])
+
+        with self.assertNumQueries(1):  # the validators' aggregate query only
+            self.assertEqual(self.time_series(response["ETag"]).status_code, 304)
+
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.92"))])
+        changed = self.time_series(response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+    def test_conversion_revalidates(self):
+        params = {"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-03-07"}
+        response = self.client.get("/api/convert_amount/", params)
+        self.assertEqual(response.status_code, 200)
+
+        headers = {"If-None-Match": response["ETag"]}
+        self.assertEqual(self.client.get("/api/convert_amount/", params, headers=headers).status_code, 304)
+        params["amount"] = "11"
+        self.assertEqual(self.client.get("/api/convert_amount/", params, headers=headers).status_code, 200)
+
+    def test_conversion_revalidation_does_not_call_providers(self):
+        params = {"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-03-08", "as_of": "true"}
+        # Providers failing, so the date is not recorded missing and plain requests keep asking them
+        with mock.patch("api.services.fetch_exchange_rate_coalesced", return_value=None) as fetch:
+            response = self.client.get("/api/convert_amount/", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["valuation_date"], "2025-03-07")
+            fetch.assert_called_once()
+            fetch.reset_mock()
+
+            headers = {"If-None-Match": response["ETag"]}
+            self.assertEqual(self.client.get("/api/convert_amount/", params, headers=headers).status_code, 304)
+        fetch.assert_not_called()
+
+    async def test_async_conversion_revalidation_does_not_call_providers(self):
+        params = {"source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-03-08", "as_of": "true"}
+        with mock.patch("api.services_async.afetch_exchange_rate_coalesced", return_value=None) as fetch:
+            response = await self.async_client.get("/api/async/convert_amount/", params)
+            self.assertEqual(response.status_code, 200)
+            fetch.assert_called_once()
+            fetch.reset_mock()
+
+            revalidated = await self.async_client.get(
+                "/api/async/convert_amount/", params, headers={"If-None-Match": response["ETag"]},
+            )
+        self.assertEqual(revalidated.status_code, 304)
+        fetch.assert_not_called()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        bulk_store_rates("USD", [("2025-03-07", "EUR", Decimal("0.9"))])
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def test_requests_report_their_stages_and_are_counted(self):
+        response = self.client.get("/api/convert_amount/", {
+            "source_currency": "USD", "exchanged_currency": "EUR", "amount": "10", "valuation_date": "2025-03-07",
+        })
+        stages = [stage.split(";")[0] for stage in response["Server-Timing"].split(", ")]
+        self.assertIn("db", stages)
+        self.assertEqual(stages[-1], "total")
+
+        exposition = self.client.get("/metrics").content.decode()
+        self.assertIn('currency_http_requests_total{view="convert_amount",method="GET",status="200"}', exposition)
+        self.assertIn('currency_rate_lookups_total{source="db"}', exposition)
+
+    def test_histograms_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("stub_seconds", "Stub durations.", ("stage",), buckets=(0.1, 1))
+        for seconds in (0.05, 0.5, 0.7, 3):
+            histogram.observe(seconds, stage="db")
+
+        self.assertEqual(registry.render().splitlines(), [
+            "# HELP stub_seconds Stub durations.",
+            "# TYPE stub_seconds histogram",
+            'stub_seconds_bucket{stage="db",le="0.1"} 1',
+            'stub_seconds_bucket{stage="db",le="1"} 3',
+            'stub_seconds_bucket{stage="db",le="+Inf"} 4',
+            'stub_seconds_sum{stage="db"} 4.25',
+            'stub_seconds_count{stage="db"} 4',
+        ])
+
+
+class TimeSeriesAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        closes = {3: "1.0", 4: "1.2", 5: "0.9", 6: "1.1", 7: "1.05", 10: "1.1", 11: "1.21"}
+        bulk_store_rates("USD", [(f"2025-03-{day:02d}", "EUR", Decimal(rate)) for day, rate in closes.items()])
+        bulk_store_rates("USD", [("2025-03-07", "GBP", Decimal("0.8"))])
+
+    def analytics(self, **params):
+        return self.client.get("/api/time_series_analytics/", {
+            "source_currency": "USD", "start_date": "2025-03-01", "end_date": "2025-03-31", **params,
+        })
+
+    def test_weekly_bars_with_moving_average(self):
+        response = self.analytics(symbols="EUR", interval="week", moving_average=2)
+
+        eur = response.json()["currencies"]["EUR"]
+        self.assertEqual(list(response.json()["currencies"]), ["EUR"])
+        self.assertEqual(eur["summary"], {
+            "min": "0.900000", "max": "1.210000", "mean": "1.080000", "count": 7,
+            "first": "1.000000", "last": "1.210000", "change_pct": "21.0000",
+        })
+        self.assertEqual(eur["series"], [
+            {"period": "2025-03-03", "open": "1.000000", "high": "1.200000", "low": "0.900000", "close": "1.050000",
+             "change_pct": None, "moving_average": None},
+            {"period": "2025-03-10", "open": "1.100000", "high": "1.210000", "low": "1.100000", "close": "1.210000",
+             "change_pct": "15.2381", "moving_average": "1.130000"},
+        ])
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.analytics(interval="year").status_code, 400)
+        self.assertEqual(self.analytics(moving_average="-1").status_code, 400)
+        self.assertEqual(self.analytics(symbols="XXX").status_code, 400)
+
+
+class PrefetchRatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def test_only_dates_without_stored_rates_are_fetched(self):
+        today = localdate()
+        bulk_store_rates("USD", [(today, "EUR", Decimal("0.9")), (today, "GBP", Decimal("0.8"))])
+
+        with mock.patch("api.management.commands.prefetch_rates.fetch_exchange_rate_coalesced", return_value={"EUR": 1}) as fetch:
+            call_command("prefetch_rates", "--base", "USD", "EUR", "--days", "1", "--concurrency", "2", stdout=StringIO())
+
+        self.assertEqual(sorted(call.args for call in fetch.call_args_list), [
+            ("EUR", ["GBP", "USD"], today - timedelta(days=1)),
+            ("EUR", ["GBP", "USD"], today),
+            ("USD", ["EUR", "GBP"], today - timedelta(days=1)),
+        ])
+
+    def test_unknown_base_currency_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, "Unknown base currencies: XXX"):
+            call_command("prefetch_rates", "--base", "XXX", stdout=StringIO())
+
+
+class TimeSeriesFetchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+
+    def setUp(self):
+        rate_cache.clear()
+        self.addCleanup(rate_cache.clear)
+
+    def test_only_missing_ranges_are_fetched(self):
+        bulk_store_rates("USD", [("2025-01-02", "EUR", Decimal("0.9")), ("2025-01-02", "GBP", Decimal("0.8"))])
+        fetched = {"2025-01-01": {"EUR": "0.91", "GBP": "0.81"}, "2025-01-03": {"EUR": "0.93", "GBP": "0.83"}}
+        with mock.patch("api.services_time_series.fetch_time_series_coalesced", side_effect=lambda source, start, end: {
+            date_str: rates for date_str, rates in fetched.items() if start <= date_str <= end
+        }) as fetch, mock.patch("api.services_time_series.provider_chunk_days", return_value=1):
+            time_series = fetch_time_series_data("USD", "2025-01-01", "2025-01-03")
+            fetch_time_series_data("USD", "2025-01-01", "2025-01-03")
+
+        self.assertEqual([call.args[1:] for call in fetch.call_args_list], [
+            ("2025-01-01", "2025-01-01"), ("2025-01-03", "2025-01-03"),
+        ])
+        self.assertEqual(sorted(time_series["rates"]), ["2025-01-01", "2025-01-02", "2025-01-03"])
+
+    def test_stored_weekday_series_needs_no_provider_calls(self):
+        weekdays = [day for day in (date(2024, 1, 1) + timedelta(days=n) for n in range(366)) if day.weekday() < 5]
+        bulk_store_rates("USD", [(day, "EUR", Decimal("0.9")) for day in weekdays])
+        rate_cache.clear()
+
+        with mock.patch("api.services_time_series.fetch_time_series_coalesced") as fetch:
+            time_series = fetch_time_series_data("USD", "2024-01-01", "2024-12-31")
+
+        fetch.assert_not_called()
+        self.assertEqual(len(time_series["rates"]), len(weekdays))
+
+    def test_gaps_are_merged_into_one_request_per_provider_chunk(self):
+        Provider.objects.create(name="CurrencyBeacon", priority=1)
+        holidays = {date(2024, 1, 1), date(2024, 2, 19), date(2024, 12, 25)}
+        bulk_store_rates("USD", [
+            (day, "EUR", Decimal("0.9")) for day in (date(2024, 1, 1) + timedelta(days=n) for n in range(366))
+            if day.weekday() < 5 and day not in holidays
+        ])
+
+        with mock.patch("api.services_time_series.fetch_time_series_coalesced", return_value={}) as fetch:
+            fetch_time_series_data("USD", "2024-01-01", "2024-12-31")
+
+        # CurrencyBeacon serves up to 90 days per call
+        self.assertEqual([call.args[1:] for call in fetch.call_args_list], [
+            ("2024-01-01", "2024-02-19"), ("2024-12-25", "2024-12-25"),
+        ])
+
+    def test_currency_a_provider_does_not_publish_is_not_refetched(self):
+        bulk_store_rates("USD", [("2025-01-01", "EUR", Decimal("0.9")), ("2025-01-01", "GBP", Decimal("0.8"))])
+        with mock.patch("api.services_time_series.fetch_time_series_coalesced",
+                        return_value={"2025-01-02": {"EUR": "0.91"}}) as fetch:
+            for _ in range(3):
+                time_series = fetch_time_series_data("USD", "2025-01-01", "2025-01-02")
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(time_series["rates"]["2025-01-02"], {"EUR": "0.910000"})
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_threads_share_one_call_and_its_error(self):
+        single_flight = SingleFlight()
+        calls, outcomes = [], []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(1)
+            raise ProviderError("Stub", 500)
+
+        def caller():
+            try:
+                single_flight.do("key", fetch)
+            except ProviderError as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            threading.Event().wait(0.001)
+        threading.Event().wait(0.02)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(outcomes), 5)
+        self.assertEqual(len({id(error) for error in outcomes}), 1)
+
+    def test_process_lease_tells_a_waiting_worker(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        held, released = threading.Event(), threading.Event()
+
+        def other_worker():
+            with process_lease("rate:USD:EUR:2025-03-07"):
+                held.set()
+                released.wait(1)
+
+        with self.settings(SINGLE_FLIGHT={"LOCK_DIR": lock_dir.name, "LEASE_TIMEOUT": 5}):
+            thread = threading.Thread(target=other_worker)
+            thread.start()
+            held.wait(1)
+            threading.Timer(0.1, released.set).start()
+            with process_lease("rate:USD:EUR:2025-03-07") as waited:
+                self.assertTrue(waited)
+            thread.join()
+            with process_lease("rate:USD:EUR:2025-03-07") as waited:
+                self.assertFalse(waited)
+
+    def test_concurrent_calls_share_one_result(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "rates"
+
+        async def main():
+            single_flight = SingleFlight()
+            return await asyncio.gather(*(single_flight.ado("key", fetch) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["rates"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_followers_take_over_when_the_leader_is_cancelled(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "rates"
+
+        async def main():
+            single_flight = SingleFlight()
+            leader = asyncio.create_task(single_flight.ado("key", fetch))
+            await asyncio.sleep(0)
+            followers = asyncio.gather(*(single_flight.ado("key", fetch) for _ in range(3)))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await asyncio.wait_for(followers, timeout=1)
+
+        self.assertEqual(asyncio.run(main()), ["rates"] * 3)
+        self.assertEqual(len(calls), 2)
+
+
+class ProviderTransportTests(SimpleTestCase):
+    def test_requests_reuse_pooled_connections(self):
+        with StubProviderServer([(200, {"rates": {}})]) as stub:
+            transport = ProviderTransport(stub.url)
+            for _ in range(3):
+                self.assertEqual(transport.get("historical").status_code, 200)
+            transport.close()
+
+        self.assertEqual(len(stub.paths), 3)
+        self.assertEqual(len(stub.client_ports), 1)
+
+    def test_transient_statuses_are_retried_a_bounded_number_of_times(self):
+        with StubProviderServer([(502, {}), (200, {"rates": {}})]) as stub:
+            self.assertEqual(ProviderTransport(stub.url, max_retries=2, backoff_factor=0).get("historical").status_code, 200)
+        self.assertEqual(len(stub.paths), 2)
+
+        with StubProviderServer([(503, {})]) as stub:
+            self.assertEqual(ProviderTransport(stub.url, max_retries=2, backoff_factor=0).get("historical").status_code, 503)
+        self.assertEqual(len(stub.paths), 3)
+
+    def test_map_bounds_concurrency_and_keeps_order(self):
+        transport = ProviderTransport("", max_concurrency=2)
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def call(item):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            threading.Event().wait(0.01)
+            with lock:
+                running[0] -= 1
+            return item * 2
+
+        self.assertEqual(transport.map(call, range(6)), [0, 2, 4, 6, 8, 10])
+        self.assertEqual(peak[0], 2)
+
+    def test_async_requests_retry_transient_statuses(self):
+        with StubProviderServer([(503, {}), (200, {"rates": {}})]) as stub:
+            transport = ProviderTransport(stub.url, max_retries=1, backoff_factor=0)
+            response = asyncio.run(transport.asynchronous.get("historical", params={"base": "USD"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stub.paths, ["/historical?base=USD"] * 2)
+
+    @skipIf(transport_module.httpx is None, "httpx is not installed")
+    def test_async_pool_limits_reach_the_connection_pool(self):
+        async def pool_limits():
+            client = transport_module.AsyncProviderTransport(ProviderTransport("http://127.0.0.1/"), pool_size=7)._client()
+            try:
+                return client._transport._pool._max_connections, client._transport._pool._max_keepalive_connections
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(pool_limits()), (7, 7))
+
+
+class AdapterRegistryTests(SimpleTestCase):
+    def test_adapters_are_created_once_and_shared(self):
+        registry = AdapterRegistry()
+        created = []
+
+        @registry.register("Stub", "rate", ProviderCapabilities(multi_symbol=False, requests_per_minute=60))
+        class StubAdapter:
+            def __init__(self):
+                created.append(self)
+
+        threads = [threading.Thread(target=registry.get, args=("Stub", "rate")) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertIs(registry.get("Stub", "rate"), created[0])
+        self.assertIsNone(registry.get("Stub", "time_series"))
+        self.assertEqual(registry.capabilities("Stub").requests_per_minute, 60)
+        self.assertEqual(registry.capabilities("Unknown"), ProviderCapabilities())
+
+    def test_bundled_providers_are_registered(self):
+        self.assertIs(AdapterFactory.get_adapter("CurrencyBeacon"), AdapterFactory.get_adapter("CurrencyBeacon"))
+        self.assertIsInstance(AdapterFactory.get_adapter("CurrencyBeacon"), CurrencyBeaconAdapter)
+        self.assertIsNotNone(TimeSeriesAdapterFactory.get_time_series_adapter("OtherProvider"))
+        self.assertTrue(all(AdapterFactory.get_capabilities(name).multi_symbol for name in ("CurrencyBeacon", "OtherProvider")))
+
+
+@override_settings(PROVIDER_DISPATCH={"MODE": "hedged", "HEDGE_DELAY": 0.05, "HEDGE_PERCENTILE": 95, "MIN_SAMPLES": 20})
+class HedgedDispatchTests(SimpleTestCase):
+    def setUp(self):
+        health_registry.reset()
+        self.addCleanup(health_registry.reset)
+        self.providers = [SimpleNamespace(name="Primary", priority=1), SimpleNamespace(name="Secondary", priority=2)]
+        self.calls = []
+
+    def dispatch(self, answers):
+        # answers: {provider name: (seconds, result or exception)}
+        async def call(provider):
+            self.calls.append(provider.name)
+            delay, answer = answers[provider.name]
+            await asyncio.sleep(delay)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        return asyncio.run(hedged_call(self.providers, call))
+
+    def test_slow_provider_is_hedged(self):
+        provider, result = self.dispatch({"Primary": (1, "slow"), "Secondary": (0, "fast")})
+        self.assertEqual((provider.name, result), ("Secondary", "fast"))
+
+    def test_fast_provider_is_not_hedged(self):
+        provider, result = self.dispatch({"Primary": (0, "fast"), "Secondary": (0, "unused")})
+        self.assertEqual((provider.name, result), ("Primary", "fast"))
+        self.assertEqual(self.calls, ["Primary"])
+
+    @override_settings(PROVIDER_DISPATCH={"MODE": "hedged", "HEDGE_DELAY": 10, "HEDGE_PERCENTILE": 95, "MIN_SAMPLES": 20})
+    def test_failure_moves_on_without_waiting(self):
+        provider, result = self.dispatch({"Primary": (0, ProviderError("Primary", 500)), "Secondary": (0, "rates")})
+        self.assertEqual((provider.name, result), ("Secondary", "rates"))
+        self.assertEqual(self.dispatch({"Primary": (0, {}), "Secondary": (0, {})}), (None, None))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        health_registry.reset()
+        self.addCleanup(health_registry.reset)
+
+    def test_server_errors_open_the_circuit(self):
+        provider = SimpleNamespace(name="CurrencyBeacon", priority=1)
+        adapter = CurrencyBeaconAdapter()
+        with StubProviderServer([(500, {"error": "internal"})]) as stub:
+            adapter.transport = ProviderTransport(stub.url, max_retries=0)
+            for _ in range(settings.PROVIDER_HEALTH["MIN_CALLS"]):
+                with self.assertRaises(ProviderError):
+                    timed_call(provider, lambda provider: adapter.get_exchange_rate("USD", ["EUR"], "2025-03-07"))
+            # Once open, the provider is not called at all
+            with self.assertRaises(ProviderSkipped):
+                timed_call(provider, lambda provider: adapter.get_exchange_rate("USD", ["EUR"], "2025-03-07"))
+            self.assertEqual(len(stub.paths), settings.PROVIDER_HEALTH["MIN_CALLS"])
+
+        health = health_registry.get("CurrencyBeacon")
+        self.assertEqual(health.state, OPEN)
+        self.assertEqual(health.error_rate, 1.0)
+        self.assertFalse(health.allow_request())
+
+    def test_skipped_calls_are_not_recorded_and_keep_the_trial(self):
+        provider = SimpleNamespace(name="CurrencyBeacon", priority=1)
+        health = health_registry.get("CurrencyBeacon")
+        health.state, health.opened_at = OPEN, 0
+
+        def unsupported(provider):
+            raise ProviderSkipped("no time_series support")
+
+        with self.assertRaises(ProviderSkipped):
+            timed_call(provider, unsupported)
+
+        self.assertEqual(health.sample_count, 0)
+        self.assertTrue(health.allow_request())
+
+
+class ProviderOutageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        Provider.objects.create(name="OtherProvider", priority=1)
+        Provider.objects.create(name="CurrencyBeacon", priority=2)
+
+    def setUp(self):
+        rate_cache.clear()
+        health_registry.reset()
+        self.addCleanup(rate_cache.clear)
+        self.addCleanup(health_registry.reset)
+
+    def serve(self, provider_name, responses):
+        stub = StubProviderServer(responses).__enter__()
+        self.addCleanup(stub.__exit__, None, None, None)
+        use_provider_url(self, provider_name, stub.url)
+        return stub
+
+    def test_outage_is_not_remembered_as_a_missing_rate(self):
+        other = self.serve("OtherProvider", [(500, {}), (200, {"exchange_rates": {"EUR": 0.9}})])
+        self.serve("CurrencyBeacon", [(200, {"rates": {}})])
+
+        self.assertIsNone(get_exchange_rate_value("USD", "EUR", "2025-03-07"))
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), Decimal("0.9"))
+        self.assertEqual(len(other.paths), 2)
+
+    def test_time_series_outage_is_not_remembered_as_empty_dates(self):
+        other = self.serve("OtherProvider", [(500, {}), (200, {"rates": {"2025-03-07": {"EUR": 0.9}}})])
+        self.serve("CurrencyBeacon", [(200, {"response": {}})])
+
+        self.assertEqual(fetch_time_series_data("USD", "2025-03-07", "2025-03-07")["rates"], {})
+        self.assertEqual(fetch_time_series_data("USD", "2025-03-07", "2025-03-07")["rates"], {"2025-03-07": {"EUR": "0.900000"}})
+        self.assertEqual(len(other.paths), 2)
+
+    def test_genuine_empty_answer_is_remembered(self):
+        other = self.serve("OtherProvider", [(200, {"exchange_rates": {}})])
+        beacon = self.serve("CurrencyBeacon", [(200, {"rates": {}})])
+
+        self.assertIsNone(get_exchange_rate_value("USD", "EUR", "2025-03-07"))
+        self.assertIsNone(get_exchange_rate_value("USD", "EUR", "2025-03-07"))
+        self.assertEqual((len(other.paths), len(beacon.paths)), (1, 1))
+
+    def test_one_call_serves_every_symbol(self):
+        other = self.serve("OtherProvider", [(200, {"exchange_rates": {"EUR": 0.9, "GBP": 0.8, "JPY": 150}})])
+
+        rates = get_exchange_rates_bulk([("USD", "EUR", "2025-03-07"), ("USD", "GBP", "2025-03-07")])
+
+        self.assertEqual(rates, {("USD", "EUR", "2025-03-07"): Decimal("0.9"), ("USD", "GBP", "2025-03-07"): Decimal("0.8")})
+        self.assertEqual(len(other.paths), 1)
+
+
+class FakeProviderTests(TestCase):
+    """
+    The services end to end against the benchmarks' fake CurrencyBeacon.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for code in ("USD", "EUR", "GBP"):
+            Currency.objects.create(code=code, name=code, symbol=code)
+        Provider.objects.create(name="CurrencyBeacon", priority=1)
+
+    def setUp(self):
+        rate_cache.clear()
+        health_registry.reset()
+        self.addCleanup(rate_cache.clear)
+        self.addCleanup(health_registry.reset)
+        self.fake = FakeProvider(["USD", "EUR", "GBP"], skip_weekends=True).start()
+        self.addCleanup(self.fake.stop)
+        use_provider_url(self, "CurrencyBeacon", self.fake.base_url)
+
+    def test_rates_are_fetched_once_and_stored(self):
+        expected = Decimal(f"{fake_rate('USD', 'EUR', '2025-03-07'):.6f}")
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), expected)
+        self.assertEqual(get_exchange_rate_value("USD", "EUR", "2025-03-07"), expected)
+        self.assertEqual(self.fake.requests, 1)
+
+    def test_weekends_are_not_requested_again(self):
+        time_series = fetch_time_series_data("USD", "2025-03-07", "2025-03-10")
+        self.assertEqual(sorted(time_series["rates"]), ["2025-03-07", "2025-03-10"])
+        self.assertEqual(time_series["rates"]["2025-03-10"]["GBP"], f"{fake_rate('USD', 'GBP', '2025-03-10'):.6f}")
+
+        requests = self.fake.requests
+        fetch_time_series_data("USD", "2025-03-07", "2025-03-10")
+        self.assertEqual(self.fake.requests, requests)
 
-# Create your tests here.
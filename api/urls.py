@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from api.views import  convert_amount, CurrencyViewSet
-from api.views import TimeSeriesExchangeRatesView
+from api.views import  convert_amount, convert_amount_batch, CurrencyViewSet, rate_cache_stats
+from api.views import TimeSeriesExchangeRatesView, TimeSeriesAnalyticsView
+from api.views import convert_amount_async, time_series_exchange_rate_async
 
 router = DefaultRouter()
 router.register(r'currencies', CurrencyViewSet, basename='currency')
@@ -9,7 +10,12 @@ router.register(r'currencies', CurrencyViewSet, basename='currency')
 urlpatterns = [
     #path('currency_rates_list/', currency_rates_list, name='currency_rates_list'),
     path('convert_amount/', convert_amount, name='convert_amount'),
+    path('convert_amount_batch/', convert_amount_batch, name='convert_amount_batch'),
+    path('rate_cache_stats/', rate_cache_stats, name='rate_cache_stats'),
     path('', include(router.urls)),  # Includes all Currency CRUD routes
     path('time_series_exchange_rate/', TimeSeriesExchangeRatesView.as_view(), name='time_series_exchange_rate'),
+    path('time_series_analytics/', TimeSeriesAnalyticsView.as_view(), name='time_series_analytics'),
+    path('async/convert_amount/', convert_amount_async, name='convert_amount_async'),
+    path('async/time_series_exchange_rate/', time_series_exchange_rate_async, name='time_series_exchange_rate_async'),
 
 ]
\ No newline at end of file
@@ -2,14 +2,25 @@ from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
-from api.models import CurrencyExchangeRate, Currency
-from api.services import get_exchange_rate
-from api.services_time_series import fetch_time_series_data
-from datetime import date
-from api.serializers import CurrencySerializer
-from django.db.models import Q
-import requests
-from django.http import JsonResponse
+from api.models import Currency
+from api.services import (
+    fetch_exchange_rate_value, get_exchange_rate_as_of, get_exchange_rates_bulk, get_stored_exchange_rate,
+)
+from api.conversion import convert, convert_many, parse_amount
+from api.rate_cache import rate_cache
+from api.currency_registry import currency_registry
+from api.services_async import (
+    afetch_exchange_rate_value, afetch_time_series_data, aget_exchange_rate_as_of, aget_stored_exchange_rate,
+)
+from api.services_time_series import fetch_time_series_data, iter_time_series_from_db
+from api.services_analytics import INTERVALS, get_time_series_analytics
+from api.streaming import STREAM_RENDERERS
+from api.http_cache import atime_series_validators, make_etag, not_modified, set_cache_headers, time_series_validators
+from api.metrics import registry
+from datetime import date, datetime
+from api.serializers import CurrencySerializer, BatchConversionSerializer
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 
 
 class CurrencyViewSet(viewsets.ModelViewSet):
@@ -23,45 +34,176 @@ class CurrencyViewSet(viewsets.ModelViewSet):
     
 
 
+# Rates of the conversions without a valuation_date
+DEFAULT_CONVERSION_DATE = '2025-03-07'
+
+
+def as_of_requested(request) -> bool:
+    return request.GET.get("as_of", "").lower() in ("1", "true", "yes")
+
+
+def conversion_body(source_currency, exchanged_currency, amount, rate_value, effective_date, requested_date, as_of):
+    body = {
+        "source_currency": source_currency,
+        "exchanged_currency": exchanged_currency,
+        "valuation_date": effective_date,
+        "rate_value": str(rate_value),
+        "converted_amount": str(convert(amount, rate_value, exchanged_currency))
+    }
+    if as_of:
+        body["requested_date"] = requested_date
+    return body
+
+
+def conversion_etag(source_currency, exchanged_currency, requested_date, resolved, amount, as_of) -> str:
+    effective_date, rate_value = resolved
+    return make_etag(source_currency, exchanged_currency, requested_date, effective_date, rate_value, amount, as_of)
+
+
 @api_view(['GET'])
 def convert_amount(request):
     """
-    API to convert an amount from one currency to another.
+    API to convert an amount from one currency to another, with the rate of valuation_date
+    (YYYY-MM-DD). With as_of=true a date without a rate (weekend, holiday) uses the latest
+    earlier rate; valuation_date in the response is the date of the rate used.
     """
     source_currency = request.GET.get("source_currency")
     exchanged_currency = request.GET.get("exchanged_currency")
     amount = request.GET.get("amount")
+    rate_date = request.GET.get("valuation_date", DEFAULT_CONVERSION_DATE)
+    as_of = as_of_requested(request)
 
     if not all([source_currency, exchanged_currency, amount]):
         return Response({"error": "Missing required parameters"}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        amount = parse_amount(amount)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        rate_date = datetime.strptime(rate_date, "%Y-%m-%d").date()
+    except ValueError:
+        return Response({"error": "valuation_date must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+
     # Check if currencies exist in the database
-    if not Currency.objects.filter(code=source_currency).exists():
+    if not currency_registry.exists(source_currency):
         return JsonResponse({"error": f"Unsupported currency: {source_currency}"}, status=400)
 
-    if not Currency.objects.filter(code=exchanged_currency).exists():
+    if not currency_registry.exists(exchanged_currency):
         return JsonResponse({"error": f"Unsupported currency: {exchanged_currency}"}, status=400)
 
-    rate_data = get_exchange_rate(source_currency, exchanged_currency, '2025-03-07')
-    if rate_data:
-        converted_amount = float(amount) * float(rate_data["rate_value"])
-        return Response({
-            "source_currency": source_currency,
-            "exchanged_currency": exchanged_currency,
-            "valuation_date": date.today(),
-            "rate_value": rate_data["rate_value"],
-            "converted_amount": str(converted_amount)
-        }, status=status.HTTP_200_OK)
+    # The validator is built from stored rates, so revalidation answers 304 without calling providers
+    stored = get_stored_exchange_rate(source_currency, exchanged_currency, rate_date, as_of)
+    if stored is not None:
+        response = not_modified(request, conversion_etag(source_currency, exchanged_currency, rate_date, stored, amount, as_of),
+                                last_date=rate_date)
+        if response is not None:
+            return response
+
+    if stored is not None and stored[0] == rate_date:
+        resolved = stored
+    elif as_of:
+        # An earlier rate is only used once providers have no rate for the date itself
+        resolved = get_exchange_rate_as_of(source_currency, exchanged_currency, rate_date)
+    else:
+        rate_value = fetch_exchange_rate_value(source_currency, exchanged_currency, rate_date)
+        resolved = None if rate_value is None else (rate_date, rate_value)
+
+    if resolved is not None:
+        effective_date, rate_value = resolved
+        etag = conversion_etag(source_currency, exchanged_currency, rate_date, resolved, amount, as_of)
+        if stored != resolved:
+            response = not_modified(request, etag, last_date=rate_date)
+            if response is not None:
+                return response
+
+        response = Response(
+            conversion_body(source_currency, exchanged_currency, amount, rate_value, effective_date, rate_date, as_of),
+            status=status.HTTP_200_OK,
+        )
+        return set_cache_headers(response, etag, last_date=rate_date)
 
     return Response({"error": "Exchange rate not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+def convert_amount_batch(request):
+    """
+    API to convert many amounts, possibly across different pairs and dates, in one request.
+    Results are returned in the order of the submitted conversions.
+    """
+    serializer = BatchConversionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    conversions = serializer.validated_data["conversions"]
+    for conversion in conversions:
+        conversion.setdefault("valuation_date", date.fromisoformat(DEFAULT_CONVERSION_DATE))
+
+    # Check if currencies exist in the database
+    requested_codes = {conversion[field] for conversion in conversions for field in ("source_currency", "exchanged_currency")}
+    unsupported = requested_codes - currency_registry.codes()
+    if unsupported:
+        return JsonResponse({"error": f"Unsupported currency: {', '.join(sorted(unsupported))}"}, status=400)
+
+    rates = get_exchange_rates_bulk(
+        (conversion["source_currency"], conversion["exchanged_currency"], conversion["valuation_date"])
+        for conversion in conversions
+    )
+
+    conversion_rates = [
+        rates.get((conversion["source_currency"], conversion["exchanged_currency"], conversion["valuation_date"]))
+        for conversion in conversions
+    ]
+    converted_amounts = convert_many(
+        [conversion["amount"] for conversion in conversions],
+        conversion_rates,
+        [conversion["exchanged_currency"] for conversion in conversions],
+    )
+
+    results = []
+    for conversion, rate_value, converted_amount in zip(conversions, conversion_rates, converted_amounts):
+        result = {
+            "source_currency": conversion["source_currency"],
+            "exchanged_currency": conversion["exchanged_currency"],
+            "valuation_date": conversion["valuation_date"],
+            "amount": str(conversion["amount"]),
+        }
+        if rate_value is None:
+            result["error"] = "Exchange rate not found"
+        else:
+            result["rate_value"] = str(rate_value)
+            result["converted_amount"] = str(converted_amount)
+        results.append(result)
+
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+def metrics(request):
+    """
+    Counters and latency histograms of this worker process in the Prometheus text format.
+    """
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_view(['GET'])
+def rate_cache_stats(request):
+    """
+    API to expose the hit/miss/eviction counters of the exchange rate cache.
+    """
+    return Response(rate_cache.stats(), status=status.HTTP_200_OK)
+
+
 
 class TimeSeriesExchangeRatesView(APIView):
     """
     API to fetch a time series list of exchange rates for the source currency.
     It returns only those exchanged currencies that are stored in the DB.
     The user only passes source_currency, start_date, and end_date.
+    With as_of=true dates without rates get the rates of the latest earlier date, listed in
+    effective_dates. With stream=json|ndjson|csv the stored rates are streamed date by date
+    instead, without fetching missing dates from providers.
     """
 
     def get(self, request):
@@ -76,12 +218,43 @@ class TimeSeriesExchangeRatesView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        try:
+            if datetime.strptime(start_date, "%Y-%m-%d") > datetime.strptime(end_date, "%Y-%m-%d"):
+                return Response({"error": "start_date must not be after end_date"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+
         # Check if currency exist in the database
-        if not Currency.objects.filter(code=source_currency).exists():
+        if not currency_registry.exists(source_currency):
             return JsonResponse({"error": f"Unsupported currency: {source_currency}"}, status=400)
 
+        stream_format = request.GET.get("stream")
+        if stream_format and stream_format not in STREAM_RENDERERS:
+            return Response(
+                {"error": f"stream must be one of: {', '.join(STREAM_RENDERERS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        as_of = as_of_requested(request)
+        if as_of and stream_format:
+            return Response({"error": "as_of cannot be combined with stream"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Validators of the stored window; a client holding them gets a 304 without the rates being read
+        etag, last_modified = time_series_validators(source_currency, start_date, end_date, stream_format, as_of)
+        response = not_modified(request, etag, last_modified, end_date)
+        if response is not None:
+            return response
+
+        if stream_format:
+            render, content_type = STREAM_RENDERERS[stream_format]
+            blocks = iter_time_series_from_db(source_currency, start_date, end_date)
+            response = StreamingHttpResponse(render(source_currency, start_date, end_date, blocks), content_type=content_type)
+            if stream_format == "csv":
+                response["Content-Disposition"] = f'attachment; filename="{source_currency}_{start_date}_{end_date}.csv"'
+            return set_cache_headers(response, etag, last_modified, end_date)
+
         # Fetch time series data (from DB or external provider)
-        rate_data = fetch_time_series_data(source_currency, start_date, end_date)
+        rate_data = fetch_time_series_data(source_currency, start_date, end_date, as_of)
 
         if not rate_data:
             return Response(
@@ -89,4 +262,167 @@ class TimeSeriesExchangeRatesView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        return Response(rate_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        # Missing dates may just have been fetched and stored, which changes the validators
+        etag, last_modified = time_series_validators(source_currency, start_date, end_date, stream_format, as_of)
+        return set_cache_headers(Response(rate_data, status=status.HTTP_200_OK), etag, last_modified, end_date)
+
+
+class TimeSeriesAnalyticsView(APIView):
+    """
+    API to fetch aggregates and resampled series of the stored exchange rates of a source currency:
+    a min/max/mean/percent change summary and day, week or month OHLC bars per exchanged currency,
+    optionally with a moving average of the closes. Only the reduced result is returned.
+    Optional parameters: symbols (comma separated), interval (day|week|month), moving_average (periods).
+    """
+
+    def get(self, request):
+        source_currency = request.GET.get("source_currency")
+        start_date = request.GET.get("start_date")
+        end_date = request.GET.get("end_date")
+        interval = request.GET.get("interval", "day")
+        symbols = [code for code in request.GET.get("symbols", "").split(",") if code]
+
+        if not source_currency or not start_date or not end_date:
+            return Response(
+                {"error": "Missing required parameters: source_currency, start_date, end_date"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            if datetime.strptime(start_date, "%Y-%m-%d") > datetime.strptime(end_date, "%Y-%m-%d"):
+                return Response({"error": "start_date must not be after end_date"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if interval not in INTERVALS:
+            return Response({"error": f"interval must be one of: {', '.join(INTERVALS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            moving_average = int(request.GET.get("moving_average", 0)) or None
+        except ValueError:
+            moving_average = -1
+        if moving_average is not None and moving_average < 1:
+            return Response({"error": "moving_average must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Check if currencies exist in the database
+        unsupported = {source_currency, *symbols} - currency_registry.codes()
+        if unsupported:
+            return JsonResponse({"error": f"Unsupported currency: {', '.join(sorted(unsupported))}"}, status=400)
+
+        etag, last_modified = time_series_validators(
+            source_currency, start_date, end_date, "analytics", ",".join(sorted(symbols)), interval, moving_average,
+        )
+        response = not_modified(request, etag, last_modified, end_date)
+        if response is not None:
+            return response
+
+        analytics = get_time_series_analytics(source_currency, start_date, end_date, symbols, interval, moving_average)
+        if not analytics:
+            return Response(
+                {"error": "Exchange rate data not available"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return set_cache_headers(Response(analytics, status=status.HTTP_200_OK), etag, last_modified, end_date)
+
+
+
+# Async variants of convert_amount and TimeSeriesExchangeRatesView, served natively under ASGI
+# (DRF views are synchronous). A request waiting on a provider does not hold a thread, so a
+# single worker can keep many provider misses in flight.
+
+@require_GET
+async def convert_amount_async(request):
+    """
+    Async variant of convert_amount.
+    """
+    source_currency = request.GET.get("source_currency")
+    exchanged_currency = request.GET.get("exchanged_currency")
+    amount = request.GET.get("amount")
+    rate_date = request.GET.get("valuation_date", DEFAULT_CONVERSION_DATE)
+    as_of = as_of_requested(request)
+
+    if not all([source_currency, exchanged_currency, amount]):
+        return JsonResponse({"error": "Missing required parameters"}, status=400)
+
+    try:
+        amount = parse_amount(amount)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        rate_date = datetime.strptime(rate_date, "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"error": "valuation_date must be in YYYY-MM-DD format"}, status=400)
+
+    await currency_registry.aload()
+    for currency in (source_currency, exchanged_currency):
+        if not currency_registry.exists(currency):
+            return JsonResponse({"error": f"Unsupported currency: {currency}"}, status=400)
+
+    # The validator is built from stored rates, so revalidation answers 304 without calling providers
+    stored = await aget_stored_exchange_rate(source_currency, exchanged_currency, rate_date, as_of)
+    if stored is not None:
+        response = not_modified(request, conversion_etag(source_currency, exchanged_currency, rate_date, stored, amount, as_of),
+                                last_date=rate_date)
+        if response is not None:
+            return response
+
+    if stored is not None and stored[0] == rate_date:
+        resolved = stored
+    elif as_of:
+        resolved = await aget_exchange_rate_as_of(source_currency, exchanged_currency, rate_date)
+    else:
+        rate_value = await afetch_exchange_rate_value(source_currency, exchanged_currency, rate_date)
+        resolved = None if rate_value is None else (rate_date, rate_value)
+    if resolved is None:
+        return JsonResponse({"error": "Exchange rate not found"}, status=404)
+
+    effective_date, rate_value = resolved
+    etag = conversion_etag(source_currency, exchanged_currency, rate_date, resolved, amount, as_of)
+    if stored != resolved:
+        response = not_modified(request, etag, last_date=rate_date)
+        if response is not None:
+            return response
+
+    response = JsonResponse(
+        conversion_body(source_currency, exchanged_currency, amount, rate_value, effective_date, rate_date, as_of),
+    )
+    return set_cache_headers(response, etag, last_date=rate_date)
+
+
+@require_GET
+async def time_series_exchange_rate_async(request):
+    """
+    Async variant of TimeSeriesExchangeRatesView, without the stream option.
+    """
+    source_currency = request.GET.get("source_currency")
+    start_date = request.GET.get("start_date")
+    end_date = request.GET.get("end_date")
+
+    if not source_currency or not start_date or not end_date:
+        return JsonResponse({"error": "Missing required parameters: source_currency, start_date, end_date"}, status=400)
+
+    try:
+        if datetime.strptime(start_date, "%Y-%m-%d") > datetime.strptime(end_date, "%Y-%m-%d"):
+            return JsonResponse({"error": "start_date must not be after end_date"}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "Dates must be in YYYY-MM-DD format"}, status=400)
+
+    await currency_registry.aload()
+    if not currency_registry.exists(source_currency):
+        return JsonResponse({"error": f"Unsupported currency: {source_currency}"}, status=400)
+
+    as_of = as_of_requested(request)
+    etag, last_modified = await atime_series_validators(source_currency, start_date, end_date, "async", as_of)
+    response = not_modified(request, etag, last_modified, end_date)
+    if response is not None:
+        return response
+
+    rate_data = await afetch_time_series_data(source_currency, start_date, end_date, as_of)
+    if not rate_data:
+        return JsonResponse({"error": "Exchange rate data not available"}, status=404)
+
+    # Missing dates may just have been fetched and stored, which changes the validators
+    etag, last_modified = await atime_series_validators(source_currency, start_date, end_date, "async", as_of)
+    return set_cache_headers(JsonResponse(rate_data), etag, last_modified, end_date)
@@ -0,0 +1,169 @@
+"""
+Throughput and latency of the API endpoints, end to end through the Django
+stack, against a seeded SQLite database and a local fake CurrencyBeacon.
+
+    python -m benchmarks.bench_api --currencies 150 --years 2 --requests 500 --output results.json
+
+Scenarios:
+  convert_cold          convert_amount with an empty rate cache (DB lookups)
+  convert_warm          the same requests again (rate cache hits)
+  time_series_db        time_series_exchange_rate over stored ranges
+  time_series_stream    the same ranges streamed as JSON
+  time_series_provider  ranges of an unseeded base currency, filled from the fake provider
+  time_series_refetch   the same ranges again, now served from the DB
+  ingestion             store_time_series of a provider-sized payload
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.fake_provider import FakeProvider
+from benchmarks.utils import (
+    currency_codes, emit, environment, latency_summary, make_time_series, measure, seed_currencies, seed_rates,
+    setup_django,
+)
+
+# convert_amount looks rates up on this date
+CONVERSION_DATE = date(2025, 3, 7)
+
+
+def run_requests(path: str, params_list: list, concurrency: int) -> dict:
+    """
+    Issue GET requests through the Django test client and summarize their latencies.
+    """
+    from django.db import connections
+    from django.test import Client
+
+    def call(params):
+        client = Client()
+        started = time.perf_counter()
+        response = client.get(path, params)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+        if concurrency > 1:
+            connections.close_all()
+        return elapsed, response.status_code >= 400
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(call, params_list))
+    else:
+        outcomes = [call(params) for params in params_list]
+    elapsed = time.perf_counter() - started
+
+    return latency_summary(
+        [seconds for seconds, _ in outcomes], elapsed, errors=sum(failed for _, failed in outcomes),
+    )
+
+
+def time_series_params(source: str, end: date, span_days: int, count: int, history_days: int) -> list:
+    """
+    `count` windows of `span_days` days, sliding backwards from `end` within the history.
+    """
+    params_list = []
+    for index in range(count):
+        window_end = end - timedelta(days=(index * 7) % max(1, history_days - span_days))
+        params_list.append({
+            "source_currency": source,
+            "start_date": (window_end - timedelta(days=span_days - 1)).isoformat(),
+            "end_date": window_end.isoformat(),
+        })
+    return params_list
+
+
+def run(args, provider: FakeProvider) -> dict:
+    from api.rate_cache import rate_cache
+    from api.services_time_series import store_time_series
+    from providers.models import Provider
+
+    codes = seed_currencies(args.currencies)
+    Provider.objects.get_or_create(name="CurrencyBeacon", defaults={"priority": 1})
+    base = codes[0]
+
+    history_days = args.years * 365
+    history_end = CONVERSION_DATE + timedelta(days=30)
+    history_start = history_end - timedelta(days=history_days - 1)
+    _, seed_seconds = measure(seed_rates, [base], codes, history_start, history_days)
+
+    results = {
+        "benchmark": "api",
+        "environment": environment(),
+        "parameters": {
+            "currencies": args.currencies,
+            "years": args.years,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "span_days": args.span_days,
+            "provider_latency": args.provider_latency,
+            "provider_error_rate": args.provider_error_rate,
+        },
+        "seed": {"rows": history_days * (len(codes) - 1), "seconds": seed_seconds},
+        "scenarios": {},
+    }
+    scenarios = results["scenarios"]
+
+    conversions = [
+        {"source_currency": base, "exchanged_currency": codes[1 + index % (len(codes) - 1)], "amount": str(index + 1)}
+        for index in range(args.requests)
+    ]
+    rate_cache.clear()
+    scenarios["convert_cold"] = run_requests("/api/convert_amount/", conversions, args.concurrency)
+    scenarios["convert_warm"] = run_requests("/api/convert_amount/", conversions, args.concurrency)
+
+    ranges = time_series_params(base, history_end, args.span_days, max(1, args.requests // 10), history_days)
+    scenarios["time_series_db"] = run_requests("/api/time_series_exchange_rate/", ranges, args.concurrency)
+    scenarios["time_series_stream"] = run_requests(
+        "/api/time_series_exchange_rate/", [dict(params, stream="json") for params in ranges], args.concurrency,
+    )
+
+    # An unseeded base currency makes every window a provider fetch, then a DB read
+    provider_ranges = time_series_params(codes[1], history_end, args.span_days, max(1, args.requests // 50), history_days)
+    requests_before = provider.requests
+    scenarios["time_series_provider"] = run_requests("/api/time_series_exchange_rate/", provider_ranges, args.concurrency)
+    scenarios["time_series_provider"]["provider_requests"] = provider.requests - requests_before
+    scenarios["time_series_refetch"] = run_requests("/api/time_series_exchange_rate/", provider_ranges, args.concurrency)
+
+    ingestion_source = codes[2]
+    payload = make_time_series(
+        [code for code in codes if code != ingestion_source], history_end + timedelta(days=1), args.span_days,
+    )
+    rows = sum(len(currencies) for currencies in payload.values())
+    _, ingestion_seconds = measure(
+        store_time_series, ingestion_source, min(payload), max(payload), payload,
+    )
+    scenarios["ingestion"] = {"rows": rows, "seconds": ingestion_seconds, "rows_per_sec": rows / ingestion_seconds}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--currencies", type=int, default=150)
+    parser.add_argument("--years", type=int, default=2, help="Years of stored history for the base currency")
+    parser.add_argument("--requests", type=int, default=500, help="Conversions per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--span-days", type=int, default=30, help="Days per time series request")
+    parser.add_argument("--provider-latency", type=float, default=0.05, help="Seconds added by the fake provider")
+    parser.add_argument("--provider-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    provider = FakeProvider(currency_codes(args.currencies), args.provider_latency, args.provider_error_rate).start()
+    # Read by the adapter module on import, so it must be set before Django is set up
+    os.environ["CURRENCY_BEACON_BASE_URL"] = provider.base_url
+    os.environ.setdefault("CURRENCY_BEACON_API_KEY", "benchmark")
+
+    db_path = setup_django()
+    try:
+        emit(run(args, provider), args.output)
+    finally:
+        provider.stop()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Provider misses under load in WSGI and ASGI modes, end to end through the
+Django stack against a local fake CurrencyBeacon with a fixed latency.
+
+    python -m benchmarks.bench_async --requests 100 --provider-latency 0.1 --threads 8 --output results.json
+
+Modes:
+  wsgi        the sync endpoints through the WSGI handler from --threads threads,
+              like one threaded WSGI worker
+  asgi_sync   the same sync endpoints through the ASGI handler (each request is
+              handed to the single thread Django runs sync views in under ASGI)
+  asgi        the async endpoints (/api/async/...) through the ASGI handler, with
+              up to --concurrency requests in flight on one event loop
+
+Every request misses the DB and the rate cache, so each one waits on a provider
+call. "max_threads" is the peak number of threads of the process while a scenario
+runs (the fake provider's own threads excluded). Install httpx for the native
+async provider calls; without it the async adapters run the blocking calls in
+the default thread pool.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.fake_provider import FakeProvider
+from benchmarks.utils import currency_codes, emit, environment, latency_summary, seed_currencies, setup_django
+
+MODES = ("wsgi", "asgi_sync", "asgi")
+# convert_amount looks rates up on this date
+CONVERSION_DATE = date(2025, 3, 7)
+
+
+class ThreadSampler:
+    """
+    Peak number of threads of the process while the block runs.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _count(self) -> int:
+        return sum(1 for thread in threading.enumerate() if "process_request_thread" not in thread.name)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        # The sampler's own thread is not part of the measurement
+        self.peak -= 1
+
+
+def run_wsgi(path: str, params_list: list, threads: int) -> dict:
+    from django.db import connections
+    from django.test import Client
+
+    def call(params):
+        started = time.perf_counter()
+        response = Client().get(path, params)
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return elapsed, response.status_code >= 400
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=threads) as executor:
+        outcomes = list(executor.map(call, params_list))
+    return summarize(outcomes, time.perf_counter() - started, sampler.peak)
+
+
+def run_asgi(path: str, params_list: list, concurrency: int) -> dict:
+    from django.test import AsyncClient
+
+    async def call(client, semaphore, params):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, params)
+            return time.perf_counter() - started, response.status_code >= 400
+
+    async def run_all():
+        client, semaphore = AsyncClient(), asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(call(client, semaphore, params) for params in params_list))
+
+    started = time.perf_counter()
+    with ThreadSampler() as sampler:
+        outcomes = asyncio.run(run_all())
+    return summarize(outcomes, time.perf_counter() - started, sampler.peak)
+
+
+def summarize(outcomes: list, elapsed: float, max_threads: int) -> dict:
+    summary = latency_summary(
+        [seconds for seconds, _ in outcomes], elapsed, errors=sum(failed for _, failed in outcomes),
+    )
+    summary["max_threads"] = max_threads
+    return summary
+
+
+def time_series_misses(codes: list, end: date, count: int) -> list:
+    """
+    One-day windows that are all distinct (base currency, date) pairs, so none is stored.
+    """
+    return [
+        {
+            "source_currency": codes[index % len(codes)],
+            "start_date": (end - timedelta(days=index // len(codes))).isoformat(),
+            "end_date": (end - timedelta(days=index // len(codes))).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def conversion_misses(codes: list) -> list:
+    """
+    Conversions between disjoint pairs, so no rate can be derived from another pair's.
+    """
+    return [
+        {"source_currency": codes[index], "exchanged_currency": codes[index + 1], "amount": "100"}
+        for index in range(0, len(codes) - 1, 2)
+    ]
+
+
+def run(args, provider: FakeProvider) -> dict:
+    from api.rate_cache import rate_cache
+    from api.adapters.transport import httpx
+    from providers.models import Provider
+
+    codes = seed_currencies(args.currencies)
+    Provider.objects.get_or_create(name="CurrencyBeacon", defaults={"priority": 1})
+
+    results = {
+        "benchmark": "async",
+        "environment": environment(),
+        "parameters": {
+            "currencies": args.currencies,
+            "requests": args.requests,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "provider_latency": args.provider_latency,
+            "async_http_client": "httpx" if httpx else "thread pool",
+        },
+        "modes": {},
+    }
+
+    # Every mode gets its own dates and currencies, so it never reads what another one stored
+    conversion_codes = len(codes) // len(args.modes)
+    for position, mode in enumerate(args.modes):
+        prefix = "/api/async" if mode == "asgi" else "/api"
+        end = CONVERSION_DATE - timedelta(days=365 * (position + 1))
+        pair_codes = codes[position * conversion_codes:(position + 1) * conversion_codes]
+        scenarios = {
+            "convert_miss": (f"{prefix}/convert_amount/", conversion_misses(pair_codes)[:args.requests]),
+            "time_series_miss": (f"{prefix}/time_series_exchange_rate/", time_series_misses(codes, end, args.requests)),
+        }
+
+        results["modes"][mode] = {}
+        for name, (path, params_list) in scenarios.items():
+            rate_cache.clear()
+            requests_before = provider.requests
+            if mode == "wsgi":
+                summary = run_wsgi(path, params_list, args.threads)
+            else:
+                summary = run_asgi(path, params_list, args.concurrency)
+            summary["provider_requests"] = provider.requests - requests_before
+            results["modes"][mode][name] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--currencies", type=int, default=600, help="Also bounds the conversions per mode")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the WSGI worker")
+    parser.add_argument("--concurrency", type=int, default=500, help="Requests in flight in ASGI modes")
+    parser.add_argument("--provider-latency", type=float, default=0.1, help="Seconds added by the fake provider")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    provider = FakeProvider(currency_codes(args.currencies), args.provider_latency).start()
+    # Read by the adapter module on import, so it must be set before Django is set up
+    os.environ["CURRENCY_BEACON_BASE_URL"] = provider.base_url
+    os.environ.setdefault("CURRENCY_BEACON_API_KEY", "benchmark")
+
+    db_path = setup_django()
+    try:
+        emit(run(args, provider), args.output)
+    finally:
+        provider.stop()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
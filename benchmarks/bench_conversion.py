@@ -0,0 +1,92 @@
+"""
+Per-conversion cost of the Decimal conversion engine (`api.conversion`)
+against the former float path of `convert_amount`, with a warm rate cache.
+
+    python -m benchmarks.bench_conversion --iterations 200000
+
+"arithmetic" times the multiplication alone; "lookup_and_convert" includes the
+rate lookup (cache hit) the view does for every request.
+"""
+
+import argparse
+import os
+import timeit
+from datetime import date
+from decimal import Decimal
+
+from benchmarks.utils import emit, environment, seed_currencies, setup_django
+
+VALUATION_DATE = date(2025, 3, 7)
+
+
+def legacy_convert(get_exchange_rate, source, target, amount: str) -> str:
+    """
+    What convert_amount did before: Decimal -> str -> float and an unrounded float result.
+    """
+    rate_data = get_exchange_rate(source, target, VALUATION_DATE)
+    return str(float(amount) * float(rate_data["rate_value"]))
+
+
+def engine_convert(get_exchange_rate_value, parse_amount, convert, source, target, amount: str) -> str:
+    rate_value = get_exchange_rate_value(source, target, VALUATION_DATE)
+    return str(convert(parse_amount(amount), rate_value, target))
+
+
+def per_call_ns(func, iterations: int) -> float:
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e9
+
+
+def run(iterations: int) -> dict:
+    from api.conversion import convert, parse_amount
+    from api.services import get_exchange_rate, get_exchange_rate_value
+    from api.services_ingestion import bulk_store_rates
+
+    source, target = seed_currencies(2)
+    bulk_store_rates(source, [(VALUATION_DATE, target, Decimal("0.912345"))])
+    # Warm the rate cache so both paths measure a cache hit
+    get_exchange_rate_value(source, target, VALUATION_DATE)
+
+    amount = "1234.56"
+    rate_value = get_exchange_rate_value(source, target, VALUATION_DATE)
+    decimal_amount = Decimal(amount)
+
+    results = {
+        "benchmark": "conversion",
+        "environment": environment(),
+        "iterations": iterations,
+        "arithmetic": {
+            "legacy_float_ns": per_call_ns(lambda: str(float(amount) * float(str(rate_value))), iterations),
+            "decimal_engine_ns": per_call_ns(lambda: str(convert(decimal_amount, rate_value, target)), iterations),
+        },
+        "lookup_and_convert": {
+            "legacy_float_ns": per_call_ns(
+                lambda: legacy_convert(get_exchange_rate, source, target, amount), iterations,
+            ),
+            "decimal_engine_ns": per_call_ns(
+                lambda: engine_convert(get_exchange_rate_value, parse_amount, convert, source, target, amount),
+                iterations,
+            ),
+        },
+        "results": {
+            "legacy_float": legacy_convert(get_exchange_rate, source, target, amount),
+            "decimal_engine": engine_convert(get_exchange_rate_value, parse_amount, convert, source, target, amount),
+        },
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        emit(run(args.iterations), args.output)
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
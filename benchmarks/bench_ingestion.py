@@ -0,0 +1,83 @@
+"""
+Compare time series ingestion throughput on SQLite: the former per-cell
+`update_or_create` loop against the bulk upsert in `api.services_ingestion`.
+
+    python -m benchmarks.bench_ingestion --days 365 --currencies 150
+"""
+
+import argparse
+import os
+from datetime import date, datetime
+
+from benchmarks.utils import emit, make_time_series, measure, seed_currencies, setup_django
+
+
+def store_time_series_per_row(source_currency: str, filtered_data: dict):
+    """
+    The storage loop `store_time_series` used before the bulk upsert path.
+    """
+    from api.models import Currency, CurrencyExchangeRate
+
+    source_currency_obj = Currency.objects.get(code=source_currency)
+    for date_str, currencies in filtered_data.items():
+        valuation_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        for exchanged_currency_code, rate_value in currencies.items():
+            exchanged_currency_obj = Currency.objects.get(code=exchanged_currency_code)
+            CurrencyExchangeRate.objects.update_or_create(
+                source_currency=source_currency_obj,
+                exchanged_currency=exchanged_currency_obj,
+                valuation_date=valuation_date,
+                defaults={'rate_value': rate_value}
+            )
+
+
+def run(days: int, currency_count: int, batch_size: int) -> dict:
+    from api.models import CurrencyExchangeRate
+    from api.services_ingestion import bulk_store_rates
+
+    codes = seed_currencies(currency_count)
+    source, targets = codes[0], codes[1:]
+    payload = make_time_series(targets, date(2024, 1, 1), days)
+    rows = days * len(targets)
+
+    _, per_row_seconds = measure(store_time_series_per_row, source, payload)
+    CurrencyExchangeRate.objects.all().delete()
+
+    def bulk_insert():
+        return bulk_store_rates(source, (
+            (date_str, code, rate)
+            for date_str, currencies in payload.items()
+            for code, rate in currencies.items()
+        ), batch_size=batch_size)
+
+    _, bulk_insert_seconds = measure(bulk_insert)
+    # Second pass hits the ON CONFLICT DO UPDATE branch for every row.
+    _, bulk_update_seconds = measure(bulk_insert)
+
+    return {
+        "benchmark": "ingestion",
+        "rows": rows,
+        "batch_size": batch_size,
+        "per_row": {"seconds": per_row_seconds, "rows_per_sec": rows / per_row_seconds},
+        "bulk_insert": {"seconds": bulk_insert_seconds, "rows_per_sec": rows / bulk_insert_seconds},
+        "bulk_update": {"seconds": bulk_update_seconds, "rows_per_sec": rows / bulk_update_seconds},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--currencies", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        emit(run(args.days, args.currencies, args.batch_size), args.output)
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
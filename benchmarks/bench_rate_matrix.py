@@ -0,0 +1,103 @@
+"""
+Stored rate reads from the in-memory rate matrix rows (`api.rate_matrix`, enabled with
+RATE_MATRIX_ENABLED) against the ORM queries they replace, with the rows already loaded.
+
+    python -m benchmarks.bench_rate_matrix --currencies 150 --days 90
+
+"point_lookup" reads one stored rate; "batch_row" reads the rates of one source to every
+other currency on one date (the rate misses of a batch conversion); "time_series_window"
+builds a `--days` time series response. "check" confirms both paths return the same Decimals.
+"""
+
+import argparse
+import os
+import timeit
+from datetime import date, timedelta
+
+from benchmarks.utils import emit, environment, seed_currencies, seed_rates, setup_django
+
+START_DATE = date(2025, 1, 1)
+
+
+def per_call_us(func, iterations: int) -> float:
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def run(currencies: int, days: int, iterations: int) -> dict:
+    from api.currency_registry import currency_registry
+    from api.models import CurrencyExchangeRate
+    from api.rate_cache import DateGenerations
+    from api.rate_matrix import RateMatrixStore
+    from api.services import get_exchange_rate_from_db
+    from api.services_time_series import get_time_series_from_db, get_time_series_from_matrix
+
+    codes = seed_currencies(currencies)
+    source, targets = codes[0], codes[1:]
+    seed_rates([source], codes, START_DATE, days)
+    valuation_date = START_DATE + timedelta(days=days - 1)
+    start_date, end_date = START_DATE.isoformat(), valuation_date.isoformat()
+
+    # Process-local counters, so the benchmark never bumps a deployment's shared file
+    store = RateMatrixStore(days + 1, 3600, DateGenerations())
+    store.rows(source, start_date, end_date)
+
+    def orm_batch_row():
+        stored = dict(CurrencyExchangeRate.objects.filter(
+            source_currency_id=currency_registry.id_for(source),
+            exchanged_currency_id__in=[currency_registry.id_for(code) for code in targets],
+            valuation_date=valuation_date,
+        ).values_list("exchanged_currency_id", "rate_value"))
+        return [stored.get(currency_registry.id_for(code)) for code in targets]
+
+    def matrix_time_series():
+        import api.services_time_series as services_time_series
+        original, services_time_series.rate_matrix_store = services_time_series.rate_matrix_store, store
+        try:
+            return get_time_series_from_matrix(source, start_date, end_date)
+        finally:
+            services_time_series.rate_matrix_store = original
+
+    target = targets[0]
+    return {
+        "benchmark": "rate_matrix",
+        "environment": environment(),
+        "currencies": currencies,
+        "days": days,
+        "point_lookup": {
+            "orm_us": per_call_us(lambda: get_exchange_rate_from_db(source, target, valuation_date), iterations),
+            "matrix_us": per_call_us(lambda: store.rate(source, target, valuation_date), iterations),
+        },
+        "batch_row": {
+            "rates": len(targets),
+            "orm_us": per_call_us(orm_batch_row, iterations),
+            "matrix_us": per_call_us(lambda: store.rates(source, targets, valuation_date), iterations),
+        },
+        "time_series_window": {
+            "orm_us": per_call_us(lambda: get_time_series_from_db(source, start_date, end_date), max(1, iterations // 50)),
+            "matrix_us": per_call_us(matrix_time_series, max(1, iterations // 50)),
+        },
+        "check": {
+            "point_lookup": get_exchange_rate_from_db(source, target, valuation_date).rate_value == store.rate(source, target, valuation_date),
+            "batch_row": orm_batch_row() == store.rates(source, targets, valuation_date),
+            "time_series_window": get_time_series_from_db(source, start_date, end_date) == matrix_time_series(),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--currencies", type=int, default=150)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        emit(run(args.currencies, args.days, args.iterations), args.output)
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the CurrencyBeacon API, for benchmarks and load tests.
+
+Serves the `historical` and `timeseries` endpoints with deterministic rates,
+an optional artificial latency and a configurable share of 500/429 answers.
+With --skip-weekends, like real providers, it has no rates for Saturdays and Sundays:
+
+    python -m benchmarks.fake_provider --port 8081 --latency 0.05 --error-rate 0.01
+
+and point the project at it with CURRENCY_BEACON_BASE_URL=http://127.0.0.1:8081/
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.utils import currency_codes
+
+
+def fake_rate(base: str, symbol: str, valuation_date: str) -> float:
+    """
+    Deterministic rate for a base/symbol/date, so repeated runs see the same data.
+    """
+    seed = zlib.crc32(f"{base}:{symbol}:{valuation_date}".encode())
+    return round(0.01 + (seed % 2_000_000) / 10_000, 6)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    server_version = "FakeCurrencyBeacon/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        config = self.server.config
+        with self.server.lock:
+            self.server.requests += 1
+
+        if config["latency"]:
+            time.sleep(config["latency"])
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            if config["rate_limit_errors"]:
+                return self.respond(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+            return self.respond(500, {"error": "Internal Server Error"})
+
+        base = params.get("base", "USD")
+        symbols = params["symbols"].split(",") if params.get("symbols") else config["codes"]
+        symbols = [symbol for symbol in symbols if symbol != base]
+        endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+
+        if endpoint == "historical":
+            valuation_date = params.get("date", date.today().isoformat())
+            if config["skip_weekends"] and date.fromisoformat(valuation_date).weekday() >= 5:
+                symbols = []
+            return self.respond(200, {
+                "date": valuation_date,
+                "base": base,
+                "rates": {symbol: fake_rate(base, symbol, valuation_date) for symbol in symbols},
+            })
+
+        if endpoint == "timeseries":
+            start = date.fromisoformat(params["start_date"])
+            end = date.fromisoformat(params["end_date"])
+            series = {}
+            current = start
+            while current <= end:
+                day = current.isoformat()
+                if not (config["skip_weekends"] and current.weekday() >= 5):
+                    series[day] = {symbol: fake_rate(base, symbol, day) for symbol in symbols}
+                current += timedelta(days=1)
+            return self.respond(200, {"base": base, "response": series})
+
+        return self.respond(404, {"error": f"Unknown endpoint {url.path}"})
+
+    def respond(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProvider:
+    """
+    The stub server running in a background thread; usable as a context manager.
+    `base_url` is what CURRENCY_BEACON_BASE_URL must be set to.
+    """
+
+    def __init__(self, codes: list, latency: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_errors: bool = False, host: str = "127.0.0.1", port: int = 0,
+                 skip_weekends: bool = False):
+        self.server = ThreadingHTTPServer((host, port), FakeProviderHandler)
+        self.server.daemon_threads = True
+        self.server.config = {
+            "codes": list(codes),
+            "latency": latency,
+            "error_rate": error_rate,
+            "rate_limit_errors": rate_limit_errors,
+            "skip_weekends": skip_weekends,
+        }
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--currencies", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--rate-limit-errors", action="store_true", help="Answer errors with 429 instead of 500")
+    parser.add_argument("--skip-weekends", action="store_true", help="No rates for Saturdays and Sundays")
+    args = parser.parse_args()
+
+    provider = FakeProvider(currency_codes(args.currencies), args.latency, args.error_rate,
+                            args.rate_limit_errors, args.host, args.port, args.skip_weekends)
+    print(f"Fake CurrencyBeacon listening on {provider.base_url}")
+    try:
+        provider.server.serve_forever()
+    except KeyboardInterrupt:
+        provider.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Each benchmark runs against a throwaway SQLite database so it never touches
+the database configured for the project.
+"""
+
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from itertools import product
+from pathlib import Path
+from string import ascii_uppercase
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+REAL_CURRENCY_CODES = [
+    "USD", "EUR", "GBP", "JPY", "INR", "CHF", "CAD", "AUD", "CNY", "HKD",
+    "SGD", "SEK", "NOK", "DKK", "NZD", "ZAR", "MXN", "BRL", "KRW", "TRY",
+]
+
+
+def setup_django(db_path: str = None) -> str:
+    """
+    Configure Django against a fresh SQLite file and run the migrations.
+    Returns the path of the database file.
+    """
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    if db_path is None:
+        handle, db_path = tempfile.mkstemp(prefix="currency_bench_", suffix=".sqlite3")
+        os.close(handle)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "currency_exchange.settings")
+    os.environ["DB_NAME"] = db_path
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+
+    # Per-row INFO logging would dominate every measurement.
+    for name in ("currency_app", "django"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return db_path
+
+
+def currency_codes(count: int) -> list:
+    """
+    Real ISO codes first, then synthetic three-letter codes up to `count`.
+    """
+    codes = list(REAL_CURRENCY_CODES[:count])
+    for letters in product(ascii_uppercase, repeat=3):
+        if len(codes) >= count:
+            break
+        code = "".join(letters)
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def seed_currencies(count: int) -> list:
+    from api.models import Currency
+
+    codes = currency_codes(count)
+    Currency.objects.bulk_create(
+        [Currency(code=code, name=code, symbol=code) for code in codes],
+        ignore_conflicts=True,
+    )
+    return codes
+
+
+def make_time_series(codes: list, start: date, days: int, seed: int = 0) -> dict:
+    """
+    Build a provider-shaped {date: {currency: rate}} payload.
+    """
+    rng = random.Random(seed)
+    return {
+        (start + timedelta(days=offset)).strftime("%Y-%m-%d"): {
+            code: round(rng.uniform(0.01, 200), 6) for code in codes
+        }
+        for offset in range(days)
+    }
+
+
+def seed_rates(source_codes: list, codes: list, start: date, days: int) -> int:
+    """
+    Store `days` days of rates from each source currency to every other code.
+    """
+    from api.services_ingestion import bulk_store_rates
+
+    written = 0
+    for source in source_codes:
+        payload = make_time_series([code for code in codes if code != source], start, days, seed=sum(map(ord, source)))
+        written += bulk_store_rates(source, (
+            (date_str, code, rate) for date_str, currencies in payload.items() for code, rate in currencies.items()
+        ))
+    return written
+
+
+def latency_summary(samples: list, elapsed: float, errors: int = 0) -> dict:
+    """
+    Throughput and latency percentiles (milliseconds) of a list of per-request seconds.
+    """
+    ordered = sorted(samples)
+
+    def percentile(share):
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_sec": len(samples) / elapsed if elapsed else None,
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else None,
+        "p50_ms": percentile(0.50) if samples else None,
+        "p95_ms": percentile(0.95) if samples else None,
+        "p99_ms": percentile(0.99) if samples else None,
+        "max_ms": ordered[-1] * 1000 if samples else None,
+    }
+
+
+def environment() -> dict:
+    """
+    Commit and interpreter the results were produced with, to compare runs across commits.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def measure(func, *args, **kwargs):
+    """
+    Run `func` once and return (result, elapsed seconds).
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def emit(results: dict, output: str = None):
+    payload = json.dumps(results, indent=2, default=str)
+    if output:
+        Path(output).write_text(payload)
+    print(payload)
@@ -0,0 +1,77 @@
+"""
+Read/write routing between the primary database ("default") and DATABASE_READ_ALIAS.
+
+Reads of exchange rates and currencies (the conversion and time series read path and
+currency validation) go to the read alias; every write, and every other read, goes to the
+primary. Once a request (or any other context) has written, its reads stay on the primary
+for the rest of it, so it reads back what it stored even when the read alias lags behind.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_MODELS = {"api.currency", "api.currencyexchangerate"}
+
+# Set by the first write of a context; reset when a request starts
+_pinned = ContextVar("pinned_to_primary", default=False)
+
+
+def reset_pin():
+    _pinned.set(False)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Send the reads of the block to the primary, e.g. to re-check rates another worker just stored.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in READ_MODELS or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        alias = settings.DATABASE_READ_ALIAS
+        if alias not in settings.DATABASES:
+            return DEFAULT_DB_ALIAS
+        primary = connections[DEFAULT_DB_ALIAS]
+        # Inside a transaction on the primary the read alias would not see its writes. A test
+        # mirror shares the primary's settings, so tests keep reading their own transaction.
+        if primary.in_atomic_block or connections[alias].settings_dict is primary.settings_dict:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The read alias is the primary's file or a copy of it, never migrated on its own
+        return db == DEFAULT_DB_ALIAS
+
+
+def apply_sqlite_pragmas(connection):
+    """
+    Apply SQLITE_PRAGMAS to a new SQLite connection; connections of the read alias are made read-only.
+    """
+    pragmas = settings.SQLITE_PRAGMAS
+    with connection.cursor() as cursor:
+        # The busy timeout comes first, so switching the journal mode waits for other connections
+        cursor.execute(f"PRAGMA busy_timeout = {int(pragmas['BUSY_TIMEOUT'])}")
+        cursor.execute(f"PRAGMA journal_mode = {pragmas['JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {pragmas['SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA mmap_size = {int(pragmas['MMAP_SIZE'])}")
+        if connection.alias == settings.DATABASE_READ_ALIAS:
+            cursor.execute("PRAGMA query_only = ON")
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +81,58 @@ WSGI_APPLICATION = 'currency_exchange.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+#
+# Reads of exchange rates and currencies go to the "replica" alias, everything else to
+# "default" (see currency_exchange/db_router.py). Without DB_REPLICA_NAME the replica is a
+# second, read-only connection to the same file, which WAL lets read while "default" writes.
+# DB_REPLICA_NAME points it at a copy kept up to date outside Django instead.
+
+DB_NAME = os.getenv('DB_NAME',os.path.join(BASE_DIR, "db.sqlite3"))  # Uses default if env variable is missing
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))  # seconds, 0 closes connections after each request
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
-        'NAME': os.getenv('DB_NAME',os.path.join(BASE_DIR, "db.sqlite3")),  # Uses default if env variable is missing
-    }
+        'NAME': DB_NAME,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Transactions take the write lock when they begin, waiting up to the busy timeout of
+            # SQLITE_PRAGMAS for it. A deferred transaction that reads and then writes cannot
+            # wait: in WAL mode its write fails at once with "database is locked" when another
+            # connection wrote since its read.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Tests run on a file as well: concurrent writers to Django's shared-cache in-memory
+        # test database fail with "database table is locked" instead of waiting for the lock.
+        'TEST': {
+            'NAME': f"{DB_NAME}-test",
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_REPLICA_NAME', DB_NAME),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['currency_exchange.db_router.PrimaryReplicaRouter']
+DATABASE_READ_ALIAS = os.getenv('DB_READ_ALIAS', 'replica')
+
+# Applied to every new SQLite connection. In WAL mode readers never block the writer (and
+# the other way round), and synchronous=NORMAL only syncs at checkpoints. MMAP_SIZE bytes of
+# the file are read through a memory map; BUSY_TIMEOUT milliseconds are waited for a lock.
+
+SQLITE_PRAGMAS = {
+    'JOURNAL_MODE': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'SYNCHRONOUS': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'MMAP_SIZE': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'BUSY_TIMEOUT': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
 }
 
 
@@ -129,6 +177,135 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Exchange rate cache in front of the DB lookups in api.services.
+# RATE_CACHE_BACKEND is either "local" (process-local LRU) or the alias of an
+# entry in CACHES (e.g. a locmem or file based cache). Storing rates invalidates
+# the "local" caches of every worker process through the memory-mapped file at
+# RATE_CACHE_SHARED_PATH; set it to an empty string for process-local invalidation.
+
+RATE_CACHE = {
+    'BACKEND': os.getenv('RATE_CACHE_BACKEND', 'local'),
+    'MAX_SIZE': int(os.getenv('RATE_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.getenv('RATE_CACHE_TTL', 3600)),  # seconds
+    'SHARED_PATH': os.getenv('RATE_CACHE_SHARED_PATH', f"{DB_NAME}-ratecache"),
+}
+
+# Test runs map invalidation counters of their own, removed when the run ends, instead of
+# bumping those of the workers serving DB_NAME.
+
+if sys.argv[1:2] == ['test']:
+    _test_dir = tempfile.TemporaryDirectory(prefix='currency-exchange-test-')
+    RATE_CACHE['SHARED_PATH'] = os.path.join(_test_dir.name, 'ratecache')
+
+# Number of rows written per INSERT ... ON CONFLICT statement when storing rates.
+
+RATE_INGESTION_BATCH_SIZE = int(os.getenv('RATE_INGESTION_BATCH_SIZE', 500))
+
+# Upper bound on the number of conversions accepted by /api/convert_amount_batch/.
+
+BATCH_CONVERSION_MAX_ITEMS = int(os.getenv('BATCH_CONVERSION_MAX_ITEMS', 1000))
+
+# Currencies a cross rate may be triangulated through when a pair is not stored.
+
+RATE_PIVOT_CURRENCIES = os.getenv('RATE_PIVOT_CURRENCIES', 'USD,EUR').split(',')
+
+# How provider loops call the active providers: "sequential" walks them in priority
+# order, "hedged" starts the next provider whenever the previous one has not answered
+# within its p95 latency (HEDGE_DELAY seconds until MIN_SAMPLES calls are recorded).
+
+PROVIDER_DISPATCH = {
+    'MODE': os.getenv('PROVIDER_DISPATCH_MODE', 'sequential'),
+    'HEDGE_DELAY': float(os.getenv('PROVIDER_HEDGE_DELAY', 0.5)),
+    'HEDGE_PERCENTILE': float(os.getenv('PROVIDER_HEDGE_PERCENTILE', 95)),
+    'MIN_SAMPLES': int(os.getenv('PROVIDER_HEDGE_MIN_SAMPLES', 20)),
+}
+
+# Concurrent provider fetches for the same key are coalesced within a process. Setting
+# SINGLE_FLIGHT_LOCK_DIR also coalesces them across worker processes with file locks.
+
+SINGLE_FLIGHT = {
+    'LOCK_DIR': os.getenv('SINGLE_FLIGHT_LOCK_DIR'),
+    'LEASE_TIMEOUT': float(os.getenv('SINGLE_FLIGHT_LEASE_TIMEOUT', 30)),  # seconds
+}
+
+# Provider circuit breaker: the circuit opens once FAILURE_THRESHOLD of the last WINDOW
+# calls failed (after at least MIN_CALLS calls) and lets a trial call through after
+# OPEN_SECONDS. A non-zero LATENCY_WEIGHT adds that many priority points per second of
+# p95 latency when ordering providers.
+
+PROVIDER_HEALTH = {
+    'WINDOW': int(os.getenv('PROVIDER_HEALTH_WINDOW', 50)),
+    'FAILURE_THRESHOLD': float(os.getenv('PROVIDER_FAILURE_THRESHOLD', 0.5)),
+    'MIN_CALLS': int(os.getenv('PROVIDER_HEALTH_MIN_CALLS', 5)),
+    'OPEN_SECONDS': float(os.getenv('PROVIDER_CIRCUIT_OPEN_SECONDS', 30)),
+    'LATENCY_WEIGHT': float(os.getenv('PROVIDER_LATENCY_WEIGHT', 0)),
+}
+
+# Provider rate limiting: a call waits up to MAX_WAIT seconds for token bucket budget before
+# it is shed. A 429 without Retry-After blocks the provider for RATE_LIMITED_BACKOFF seconds.
+
+PROVIDER_QUOTA = {
+    'MAX_WAIT': float(os.getenv('PROVIDER_QUOTA_MAX_WAIT', 1.0)),
+    'RATE_LIMITED_BACKOFF': float(os.getenv('PROVIDER_RATE_LIMITED_BACKOFF', 60)),
+}
+
+# As-of lookups resolve a date without rates (weekend, holiday) to the latest rate at most
+# MAX_STALENESS_DAYS earlier that is stored or derivable from stored rates. Dates providers had
+# no rates for are recorded in the DB (api.missing_rates) and not requested again.
+
+RATE_AS_OF = {
+    'MAX_STALENESS_DAYS': int(os.getenv('RATE_AS_OF_MAX_STALENESS_DAYS', 7)),
+}
+
+# Defaults of the prefetch_rates management command. An empty base currency list
+# prefetches every stored currency as base.
+
+RATE_PREFETCH = {
+    'BASE_CURRENCIES': [code for code in os.getenv('RATE_PREFETCH_BASE_CURRENCIES', '').split(',') if code],
+    'BACKFILL_DAYS': int(os.getenv('RATE_PREFETCH_BACKFILL_DAYS', 0)),
+    'CONCURRENCY': int(os.getenv('RATE_PREFETCH_CONCURRENCY', 2)),
+}
+
+# In-memory rate matrix rows (the rates of one source currency on one valuation date as scaled
+# int64 arrays, up to MAX_ROWS) serving conversions and time series. Rows are reloaded after TTL
+# seconds, or as soon as any process stores rates of their date (RATE_CACHE SHARED_PATH counters).
+
+RATE_MATRIX = {
+    'ENABLED': os.getenv('RATE_MATRIX_ENABLED', 'False') == 'True',
+    'MAX_ROWS': int(os.getenv('RATE_MATRIX_MAX_ROWS', 4000)),
+    'TTL': int(os.getenv('RATE_MATRIX_TTL', 300)),
+}
+
+# Rows fetched per round trip when streaming time series (?stream=json|ndjson|csv).
+
+TIME_SERIES_STREAM_CHUNK_SIZE = int(os.getenv('TIME_SERIES_STREAM_CHUNK_SIZE', 2000))
+
+# Memory-mapped archive of historical rates (written by the export_rate_archive command),
+# loaded at startup when RATE_ARCHIVE_PATH is set. Workers check every RELOAD_INTERVAL
+# seconds whether the file was appended to or replaced.
+
+RATE_ARCHIVE = {
+    'PATH': os.getenv('RATE_ARCHIVE_PATH'),
+    'RELOAD_INTERVAL': int(os.getenv('RATE_ARCHIVE_RELOAD_INTERVAL', 60)),
+}
+
+# Seconds before the in-process currency registry is reloaded even without a change signal.
+
+CURRENCY_REGISTRY_TTL = int(os.getenv('CURRENCY_REGISTRY_TTL', 300))
+
+# Rounding of converted amounts to the minor unit of the exchanged currency (a decimal
+# module rounding mode, e.g. ROUND_HALF_EVEN or ROUND_HALF_UP).
+
+CONVERSION_ROUNDING = os.getenv('CONVERSION_ROUNDING', 'ROUND_HALF_EVEN')
+
+# Cache-Control max-age (seconds) of rate responses: HISTORICAL_MAX_AGE when every date is
+# in the past, CURRENT_MAX_AGE when the response covers today.
+
+RATE_HTTP_CACHE = {
+    'HISTORICAL_MAX_AGE': int(os.getenv('RATE_HTTP_HISTORICAL_MAX_AGE', 86400)),
+    'CURRENT_MAX_AGE': int(os.getenv('RATE_HTTP_CURRENT_MAX_AGE', 60)),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
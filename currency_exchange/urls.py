@@ -16,8 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from api.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("api/", include("api.urls"))
+    path('metrics', metrics),
+    path("api/", include("api.urls")),
+    path("api/providers/", include("providers.urls")),
 ]
@@ -1,7 +1,35 @@
 from django.contrib import admin
-from .models import Provider
+from .models import Provider, ProviderUsage
+from .health import health_registry
+from .quota import quota_manager
 # Register your models here.
 @admin.register(Provider)
 class ProviderAdmin(admin.ModelAdmin):
-    list_display = ('name', 'priority', 'active')
+    list_display = ('name', 'priority', 'active', 'circuit_state', 'error_rate', 'p95_latency', 'requests_today')
     list_editable = ('priority', 'active')
+    readonly_fields = ('tokens', 'tokens_updated_at', 'blocked_until')
+
+    @admin.display(description='Circuit')
+    def circuit_state(self, obj):
+        return health_registry.get(obj.name).state
+
+    @admin.display(description='Error rate')
+    def error_rate(self, obj):
+        return f"{health_registry.get(obj.name).error_rate:.0%}"
+
+    @admin.display(description='p95 latency (s)')
+    def p95_latency(self, obj):
+        p95_latency = health_registry.get(obj.name).latency_percentile(95)
+        return "-" if p95_latency is None else f"{p95_latency:.3f}"
+
+    @admin.display(description='Requests today')
+    def requests_today(self, obj):
+        used = quota_manager.used(obj)
+        return f"{used} / {obj.daily_quota}" if obj.daily_quota else used
+
+
+@admin.register(ProviderUsage)
+class ProviderUsageAdmin(admin.ModelAdmin):
+    list_display = ('provider', 'date', 'requests', 'throttled', 'rate_limited')
+    list_filter = ('provider',)
+    date_hierarchy = 'date'
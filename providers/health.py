@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """
+    Rolling error rate, latency samples and circuit breaker state of one provider.
+
+    The circuit opens when the error rate over the window reaches the failure threshold.
+    After OPEN_SECONDS one trial call is let through (half-open): success closes the
+    circuit again, failure re-opens it. Routing only checks `is_available`; the trial is
+    claimed by `allow_request` right before the provider is called.
+    """
+
+    def __init__(self, name: str, window: int, failure_threshold: float, min_calls: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_started_at = None
+        self._outcomes = deque(maxlen=window)  # (succeeded, latency seconds)
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """
+        Whether `allow_request` would let a call through now, without claiming the trial.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                return now - self.opened_at >= self.open_seconds
+            if self.state == HALF_OPEN:
+                return self.trial_started_at is None or now - self.trial_started_at >= self.open_seconds
+            return True
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self.trial_started_at = None
+            if self.state == HALF_OPEN:
+                # A trial that never reported back expires like an open circuit does
+                if self.trial_started_at is None or now - self.trial_started_at >= self.open_seconds:
+                    self.trial_started_at = now
+                    return True
+                return False
+            return self.state == CLOSED
+
+    def release_trial(self):
+        """
+        Hand back a claimed trial when the call was not made after all.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.trial_started_at = None
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._outcomes.append((True, latency))
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._outcomes.append((True, latency))
+
+    def record_failure(self, latency: float):
+        with self._lock:
+            self._outcomes.append((False, latency))
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and self._error_rate() >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for succeeded, _ in self._outcomes if not succeeded) / len(self._outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._outcomes)
+
+    def latency_percentile(self, percentile: float):
+        with self._lock:
+            latencies = sorted(latency for _, latency in self._outcomes)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "provider": self.name,
+            "state": self.state,
+            "calls": self.sample_count,
+            "error_rate": round(self.error_rate, 4),
+            "p50_latency": self.latency_percentile(50),
+            "p95_latency": self.latency_percentile(95),
+            "p99_latency": self.latency_percentile(99),
+        }
+
+
+class HealthRegistry:
+    """
+    Process-wide ProviderHealth instances keyed by provider name.
+    """
+
+    def __init__(self):
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> ProviderHealth:
+        with self._lock:
+            health = self._providers.get(name)
+            if health is None:
+                config = settings.PROVIDER_HEALTH
+                health = self._providers[name] = ProviderHealth(
+                    name,
+                    window=config["WINDOW"],
+                    failure_threshold=config["FAILURE_THRESHOLD"],
+                    min_calls=config["MIN_CALLS"],
+                    open_seconds=config["OPEN_SECONDS"],
+                )
+            return health
+
+    def snapshot(self) -> list:
+        with self._lock:
+            providers = list(self._providers.values())
+        return [health.snapshot() for health in providers]
+
+    def reset(self):
+        with self._lock:
+            self._providers.clear()
+
+
+health_registry = HealthRegistry()
+
+
+def route_providers(providers, cost=None) -> list:
+    """
+    Drop providers whose circuit is open and order the rest for calling.
+    With PROVIDER_HEALTH["LATENCY_WEIGHT"] set, the static priority is blended with the
+    measured p95 latency (weight = priority points per second of latency).
+    `cost(provider)`, the number of requests the call would take, breaks ties in favour of
+    the cheaper provider.
+    """
+    latency_weight = settings.PROVIDER_HEALTH["LATENCY_WEIGHT"]
+
+    def score(provider):
+        p95_latency = health_registry.get(provider.name).latency_percentile(95) or 0
+        return provider.priority + latency_weight * p95_latency
+
+    routed = [provider for provider in providers if health_registry.get(provider.name).is_available()]
+    if cost:
+        routed.sort(key=lambda provider: (score(provider) if latency_weight else provider.priority, cost(provider)))
+    elif latency_weight:
+        routed.sort(key=score)
+    return routed
@@ -5,8 +5,34 @@ class Provider(models.Model):
     priority = models.IntegerField(default=1)  # Lower number means higher priority
     active = models.BooleanField(default=True)  # Allows dynamic activation/deactivation
 
+    # Rate limits and quotas; empty means the adapter's declared capabilities (or no limit) apply
+    requests_per_second = models.FloatField(null=True, blank=True)
+    burst_size = models.PositiveIntegerField(default=1)
+    daily_quota = models.PositiveIntegerField(null=True, blank=True)
+    monthly_quota = models.PositiveIntegerField(null=True, blank=True)
+
+    # Token bucket shared by every worker process
+    tokens = models.FloatField(null=True, blank=True)
+    tokens_updated_at = models.DateTimeField(null=True, blank=True)
+    blocked_until = models.DateTimeField(null=True, blank=True)  # set from a 429 Retry-After
+
     class Meta:
         ordering = ['priority']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class ProviderUsage(models.Model):
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name='usage')
+    date = models.DateField()
+    requests = models.PositiveIntegerField(default=0)  # provider calls made
+    throttled = models.PositiveIntegerField(default=0)  # calls shed for lack of budget
+    rate_limited = models.PositiveIntegerField(default=0)  # 429 answers
+
+    class Meta:
+        unique_together = ('provider', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.provider.name} {self.date}: {self.requests}"
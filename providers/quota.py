@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from api.adapters.base_adapter import RateLimited
+from .models import Provider, ProviderUsage
+
+logger = logging.getLogger("currency_app")
+
+
+class QuotaExceeded(Exception):
+    """
+    The provider call was shed because its rate limit or quota budget is exhausted.
+    """
+
+
+class QuotaManager:
+    """
+    Token bucket rate limiting and daily/monthly quotas per provider.
+
+    The bucket and usage counters live in the Provider and ProviderUsage rows, so every worker
+    process draws from the same budget. Limits set on the Provider override the adapter's
+    declared capabilities. A call that would wait longer than PROVIDER_QUOTA["MAX_WAIT"]
+    seconds for tokens, or that exceeds a quota, is shed.
+    """
+
+    def call(self, provider, cost: int, func, capabilities=None):
+        """
+        Run `func()` once `cost` provider requests are granted. Raises QuotaExceeded when shed;
+        a 429 answer blocks the provider for its Retry-After.
+        """
+        if not self.acquire(provider, cost, capabilities):
+            raise QuotaExceeded(f"{provider.name} quota exhausted, {cost} request(s) shed")
+        try:
+            return func()
+        except RateLimited as e:
+            self.record_rate_limited(provider, e.retry_after)
+            raise
+
+    def acquire(self, provider, cost: int = 1, capabilities=None) -> bool:
+        deadline = time.monotonic() + settings.PROVIDER_QUOTA["MAX_WAIT"]
+        while True:
+            wait = self._take(provider, cost, capabilities)
+            if wait == 0:
+                return True
+            if wait is None or time.monotonic() + wait > deadline:
+                self._count(provider, "throttled", cost)
+                logger.warning("Shedding %s request(s) to %s: budget exhausted", cost, provider.name)
+                return False
+            time.sleep(wait)
+
+    async def acall(self, provider, cost: int, coro_func, capabilities=None):
+        """
+        Asyncio variant of `call` that awaits `coro_func()`.
+        """
+        if not await self.aacquire(provider, cost, capabilities):
+            raise QuotaExceeded(f"{provider.name} quota exhausted, {cost} request(s) shed")
+        try:
+            return await coro_func()
+        except RateLimited as e:
+            await sync_to_async(self.record_rate_limited)(provider, e.retry_after)
+            raise
+
+    async def aacquire(self, provider, cost: int = 1, capabilities=None) -> bool:
+        """
+        Asyncio variant of `acquire`: waiting for tokens sleeps on the event loop, not in a thread.
+        """
+        deadline = time.monotonic() + settings.PROVIDER_QUOTA["MAX_WAIT"]
+        while True:
+            wait = await sync_to_async(self._take)(provider, cost, capabilities)
+            if wait == 0:
+                return True
+            if wait is None or time.monotonic() + wait > deadline:
+                await sync_to_async(self._count)(provider, "throttled", cost)
+                logger.warning("Shedding %s request(s) to %s: budget exhausted", cost, provider.name)
+                return False
+            await asyncio.sleep(wait)
+
+    def _take(self, provider, cost: int, capabilities):
+        """
+        Take `cost` tokens: 0 on success, seconds until enough tokens are available,
+        or None if a quota is used up.
+
+        The bucket is taken with a single conditional UPDATE on the state that was read, not
+        a locked read-modify-write: SQLite ignores select_for_update(), and a read transaction
+        upgraded to a write one fails with "database is locked" instead of waiting. A worker
+        whose UPDATE matched no row lost the race and re-reads the bucket.
+        """
+        while True:
+            row = Provider.objects.get(pk=provider.pk)
+            now = timezone.now()
+            if row.blocked_until and row.blocked_until > now:
+                return (row.blocked_until - now).total_seconds()
+
+            daily_quota = row.daily_quota or (capabilities and capabilities.requests_per_day)
+            if daily_quota and self.used(row, now) + cost > daily_quota:
+                return None
+            if row.monthly_quota and self.used(row, now, month=True) + cost > row.monthly_quota:
+                return None
+
+            rate = row.requests_per_second
+            if rate is None and capabilities and capabilities.requests_per_minute:
+                rate = capabilities.requests_per_minute / 60
+            if rate:
+                # A call costing more than the burst size still goes through once the bucket is full
+                capacity = max(row.burst_size, cost)
+                tokens = capacity
+                if row.tokens is not None and row.tokens_updated_at:
+                    tokens = min(capacity, row.tokens + (now - row.tokens_updated_at).total_seconds() * rate)
+                if tokens < cost:
+                    return (cost - tokens) / rate
+                taken = Provider.objects.filter(
+                    pk=row.pk, tokens=row.tokens, tokens_updated_at=row.tokens_updated_at,
+                ).update(tokens=tokens - cost, tokens_updated_at=now)
+                if not taken:
+                    continue
+
+            self._count(row, "requests", cost)
+            return 0
+
+    def record_rate_limited(self, provider, retry_after: float = None):
+        """
+        Empty the bucket and block the provider until the 429's Retry-After has passed.
+        """
+        retry_after = retry_after or settings.PROVIDER_QUOTA["RATE_LIMITED_BACKOFF"]
+        now = timezone.now()
+        Provider.objects.filter(pk=provider.pk).update(
+            tokens=0, tokens_updated_at=now, blocked_until=now + timedelta(seconds=retry_after),
+        )
+        self._count(provider, "rate_limited", 1)
+        logger.warning("%s answered 429, blocked for %ss", provider.name, retry_after)
+
+    @staticmethod
+    def used(provider, now=None, month: bool = False) -> int:
+        """
+        Requests made today, or this month.
+        """
+        today = timezone.localdate(now)
+        usage = ProviderUsage.objects.filter(provider_id=provider.pk)
+        if month:
+            usage = usage.filter(date__gte=today.replace(day=1), date__lte=today)
+        else:
+            usage = usage.filter(date=today)
+        return usage.aggregate(total=Sum("requests"))["total"] or 0
+
+    @staticmethod
+    def _count(provider, field: str, amount: int):
+        usage = ProviderUsage.objects.filter(provider_id=provider.pk, date=timezone.localdate())
+        if usage.update(**{field: F(field) + amount}):
+            return
+        try:
+            with transaction.atomic():
+                ProviderUsage.objects.create(provider_id=provider.pk, date=timezone.localdate(), **{field: amount})
+        except IntegrityError:
+            # Created concurrently by another worker
+            usage.update(**{field: F(field) + amount})
+
+
+quota_manager = QuotaManager()
@@ -1,3 +1,129 @@
-from django.test import TestCase
+import threading
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.adapters.base_adapter import RateLimited
+from api.adapters.registry import ProviderCapabilities
+from .health import CLOSED, HALF_OPEN, OPEN, ProviderHealth, health_registry, route_providers
+from .models import Provider, ProviderUsage
+from .quota import QuotaExceeded, QuotaManager
+
+
+class ProviderHealthTests(SimpleTestCase):
+    def setUp(self):
+        health_registry.reset()
+        self.addCleanup(health_registry.reset)
+
+    def test_open_circuit_lets_one_trial_call_through(self):
+        health = ProviderHealth("Stub", window=10, failure_threshold=0.5, min_calls=2, open_seconds=30)
+        with mock.patch("providers.health.time.monotonic", return_value=100):
+            health.record_success(0.1)
+            health.record_failure(0.1)
+            self.assertEqual(health.state, OPEN)
+            self.assertFalse(health.allow_request())
+
+        with mock.patch("providers.health.time.monotonic", return_value=131):
+            self.assertTrue(health.allow_request())
+            self.assertEqual(health.state, HALF_OPEN)
+            self.assertFalse(health.allow_request())
+            health.record_success(0.1)
+
+        self.assertEqual(health.state, CLOSED)
+        self.assertTrue(health.allow_request())
+
+    @override_settings(PROVIDER_HEALTH={
+        "WINDOW": 10, "FAILURE_THRESHOLD": 0.5, "MIN_CALLS": 2, "OPEN_SECONDS": 30, "LATENCY_WEIGHT": 1,
+    })
+    def test_routing_skips_open_circuits_and_weighs_latency(self):
+        fast = SimpleNamespace(name="Fast", priority=2)
+        slow = SimpleNamespace(name="Slow", priority=1)
+        failing = SimpleNamespace(name="Failing", priority=0)
+        for _ in range(3):
+            health_registry.get("Fast").record_success(0.1)
+            health_registry.get("Slow").record_success(2.0)
+            health_registry.get("Failing").record_failure(0.1)
+
+        self.assertEqual(route_providers([failing, slow, fast]), [fast, slow])
+
+    def test_routing_leaves_the_half_open_trial_to_the_call(self):
+        primary = SimpleNamespace(name="Primary", priority=0)
+        backup = SimpleNamespace(name="Backup", priority=1)
+        health = health_registry.get("Backup")
+        health.state, health.opened_at = OPEN, 0
+
+        self.assertEqual(route_providers([primary, backup]), [primary, backup])
+        self.assertEqual(route_providers([primary, backup]), [primary, backup])
+        self.assertTrue(health.allow_request())
+        self.assertEqual(route_providers([primary, backup]), [primary])
+
+
+@override_settings(PROVIDER_QUOTA={"MAX_WAIT": 0, "RATE_LIMITED_BACKOFF": 60})
+class QuotaTests(TestCase):
+    def test_daily_quota_sheds_calls(self):
+        provider = Provider.objects.create(name="Stub")
+        quota = QuotaManager()
+        capabilities = ProviderCapabilities(requests_per_day=3)
+
+        self.assertEqual(quota.call(provider, 2, lambda: "rates", capabilities), "rates")
+        with self.assertRaises(QuotaExceeded):
+            quota.call(provider, 2, lambda: "rates", capabilities)
+        self.assertEqual(quota.call(provider, 1, lambda: "rates", capabilities), "rates")
+
+        usage = ProviderUsage.objects.get(provider=provider)
+        self.assertEqual((usage.requests, usage.throttled), (3, 2))
+
+    def test_provider_limit_overrides_declared_capabilities(self):
+        provider = Provider.objects.create(name="Stub", daily_quota=1)
+        quota = QuotaManager()
+
+        self.assertTrue(quota.acquire(provider, 1, ProviderCapabilities(requests_per_day=10)))
+        self.assertFalse(quota.acquire(provider, 1, ProviderCapabilities(requests_per_day=10)))
+
+    def test_rate_limited_answer_blocks_the_provider(self):
+        provider = Provider.objects.create(name="Stub")
+        quota = QuotaManager()
+
+        def rate_limited():
+            raise RateLimited("Stub", retry_after=120)
+
+        with self.assertRaises(RateLimited):
+            quota.call(provider, 1, rate_limited)
+        self.assertFalse(quota.acquire(provider))
+
+        provider.refresh_from_db()
+        self.assertEqual(provider.usage.get().rate_limited, 1)
+        self.assertAlmostEqual((provider.blocked_until - timezone.now()).total_seconds(), 120, delta=5)
+
+
+class TokenBucketTests(TransactionTestCase):
+    @override_settings(PROVIDER_QUOTA={"MAX_WAIT": 0, "RATE_LIMITED_BACKOFF": 60})
+    def test_concurrent_workers_share_the_bucket(self):
+        # A bucket of 50 tokens that practically does not refill, drawn on by 8 workers
+        provider = Provider.objects.create(name="Stub", requests_per_second=0.0001, burst_size=50)
+        quota = QuotaManager()
+        granted, errors = [], []
+
+        def worker():
+            try:
+                for _ in range(25):
+                    if quota.acquire(provider):
+                        granted.append(1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(granted), 50)
+        usage = ProviderUsage.objects.get(provider=provider)
+        self.assertEqual((usage.requests, usage.throttled), (50, 150))
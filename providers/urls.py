@@ -0,0 +1,6 @@
+from django.urls import path
+from providers.views import provider_health
+
+urlpatterns = [
+    path('health/', provider_health, name='provider_health'),
+]
@@ -1,3 +1,25 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework import status
+from .health import health_registry
+from .quota import quota_manager
+from .models import Provider
 
-# Create your views here.
+
+@api_view(['GET'])
+def provider_health(request):
+    """
+    API to expose circuit breaker state, error rate and latency percentiles of every provider
+    as seen by the worker process serving the request, with the requests made today.
+    """
+    providers = Provider.objects.order_by('priority')
+    return Response([
+        dict(
+            health_registry.get(provider.name).snapshot(),
+            priority=provider.priority,
+            active=provider.active,
+            requests_today=quota_manager.used(provider),
+            daily_quota=provider.daily_quota,
+        )
+        for provider in providers
+    ], status=status.HTTP_200_OK)